@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Paginação, exportação e retenção do histórico de atividades.
+
+A tabela ``activity_history`` é percorrida por paginação keyset
+(``created_at``, ``id``), sem OFFSET, usando o índice por usuário. A rotina
+de retenção consolida as linhas antigas em agregados diários
+(``activity_daily``), grava as linhas originais em arquivos NDJSON
+compactados e as remove da tabela principal.
+
+Uso:
+    python activity_archive.py --days 90
+"""
+
+import os
+import csv
+import json
+import gzip
+import time
+import base64
+import argparse
+from io import StringIO
+from typing import Iterator, List, Optional, Tuple
+
+# Limites de paginação da API
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Linhas lidas por lote na exportação e no arquivamento
+BATCH_SIZE = 1000
+
+CSV_FIELDS = ['id', 'title', 'type', 'duration', 'date']
+
+
+def encode_cursor(created_at: str, activity_id: int) -> str:
+    """Gera o cursor opaco que aponta para depois da atividade informada."""
+    raw = json.dumps([created_at, activity_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> Tuple[str, int]:
+    """Decodifica um cursor gerado por ``encode_cursor``.
+
+    Raises:
+        ValueError: se o cursor for inválido
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, activity_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(created_at), int(activity_id)
+    except Exception as e:
+        raise ValueError('Cursor inválido') from e
+
+
+def fetch_page(cursor, user_id: int, after: Optional[Tuple[str, int]], limit: int) -> List[tuple]:
+    """Retorna até ``limit`` atividades, da mais recente para a mais antiga."""
+    columns = 'id, title, activity_type, duration, created_at'
+    if after is None:
+        cursor.execute(
+            f'SELECT {columns} FROM activity_history WHERE user_id = ? '
+            'ORDER BY created_at DESC, id DESC LIMIT ?',
+            (user_id, limit)
+        )
+    else:
+        cursor.execute(
+            f'SELECT {columns} FROM activity_history WHERE user_id = ? AND (created_at, id) < (?, ?) '
+            'ORDER BY created_at DESC, id DESC LIMIT ?',
+            (user_id, after[0], after[1], limit)
+        )
+    return cursor.fetchall()
+
+
+def to_dict(row) -> dict:
+    activity_id, title, activity_type, duration, created_at = row
+    return {'id': activity_id, 'title': title, 'type': activity_type,
+            'duration': duration, 'date': created_at}
+
+
+def iter_activity(conn, user_id: int) -> Iterator[dict]:
+    """Percorre todo o histórico do usuário em lotes, sem carregá-lo na memória."""
+    cursor = conn.cursor()
+    after = None
+    while True:
+        rows = fetch_page(cursor, user_id, after, BATCH_SIZE)
+        for row in rows:
+            yield to_dict(row)
+        if len(rows) < BATCH_SIZE:
+            break
+        after = (rows[-1][4], rows[-1][0])
+
+
+def stream_ndjson(activities: Iterator[dict]) -> Iterator[str]:
+    for activity in activities:
+        yield json.dumps(activity, ensure_ascii=False) + '\n'
+
+
+def stream_csv(activities: Iterator[dict]) -> Iterator[str]:
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for activity in activities:
+        writer.writerow(activity)
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _fsync_directory(directory: str):
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def archive_activity(conn, archive_dir: str, older_than_days: int) -> dict:
+    """Consolida e arquiva as atividades mais antigas que ``older_than_days``.
+
+    Cada lote é acrescentado ao arquivo como um membro gzip completo e
+    sincronizado em disco (fsync) antes que a transação que o agrega e
+    remove seja confirmada, de modo que uma interrupção nunca perde linhas:
+    no pior caso um lote aparece em dois arquivos, ou o último membro fica
+    truncado com linhas que continuam na tabela.
+
+    Returns:
+        Dicionário com o número de linhas arquivadas e o arquivo gerado
+    """
+    cursor = conn.cursor()
+    cutoff = cursor.execute("SELECT datetime('now', ?)", (f'-{int(older_than_days)} days',)).fetchone()[0]
+
+    os.makedirs(archive_dir, exist_ok=True)
+    archive_path = os.path.join(
+        archive_dir, f"activity_{cutoff[:10]}_{time.strftime('%Y%m%d%H%M%S')}.ndjson.gz")
+
+    archived = 0
+    last_id = 0
+    with open(archive_path, 'wb') as archive:
+        _fsync_directory(archive_dir)
+        while True:
+            cursor.execute(
+                'SELECT id, user_id, title, activity_type, duration, created_at FROM activity_history '
+                'WHERE id > ? AND created_at < ? ORDER BY id LIMIT ?',
+                (last_id, cutoff, BATCH_SIZE)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            lines = ''.join(json.dumps(dict(zip(
+                ('id', 'user_id', 'title', 'type', 'duration', 'date'), row)), ensure_ascii=False) + '\n'
+                for row in rows)
+            # Membros gzip concatenados formam um arquivo válido (gzip.open lê todos)
+            archive.write(gzip.compress(lines.encode('utf-8')))
+            archive.flush()
+            os.fsync(archive.fileno())
+
+            last_id = rows[-1][0]
+            cursor.execute(
+                'INSERT INTO activity_daily (user_id, day, activity_type, activity_count, total_duration) '
+                'SELECT user_id, date(created_at), activity_type, COUNT(*), SUM(duration) FROM activity_history '
+                'WHERE id BETWEEN ? AND ? AND created_at < ? GROUP BY user_id, date(created_at), activity_type '
+                'ON CONFLICT (user_id, day, activity_type) DO UPDATE SET '
+                'activity_count = activity_count + excluded.activity_count, '
+                'total_duration = total_duration + excluded.total_duration',
+                (rows[0][0], last_id, cutoff)
+            )
+            cursor.execute('DELETE FROM activity_history WHERE id BETWEEN ? AND ? AND created_at < ?',
+                           (rows[0][0], last_id, cutoff))
+            conn.commit()
+            archived += len(rows)
+
+    if archived == 0:
+        os.remove(archive_path)
+        archive_path = None
+    return {'archived': archived, 'cutoff': cutoff, 'file': archive_path}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Arquiva o histórico de atividades antigo')
+    parser.add_argument('--days', type=int, default=90, help='manter na tabela apenas os últimos N dias')
+    args = parser.parse_args()
+
+    import app
+    import shards
+    app.init_db()
+    for name in app.shard_router.shard_names():
+        archive_dir = os.path.join(app.DATA_DIR, 'archive')
+        if name != shards.MAIN:
+            archive_dir = os.path.join(archive_dir, name)
+        connection = app.shard_router.connect(name)
+        print(name, json.dumps(archive_activity(connection, archive_dir, args.days)))
+        connection.close()
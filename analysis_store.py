@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Armazenamento dos resultados de análise de texto.
+
+Cada resultado (``analyze_text`` + ``detect_patterns``) é gravado uma única
+vez em ``analysis_results``, identificado pelo hash do conteúdo e pela
+versão do analisador; textos repetidos reaproveitam o resultado. A tabela
+``analysis_links`` liga os resultados a usuários e exercícios, permitindo
+acompanhar a evolução de tom e estilo ao longo do tempo.
+
+A rotina de backfill analisa os textos já gravados em ``exercises.data``
+em lotes processados em paralelo.
+
+Uso:
+    python analysis_store.py backfill [--workers 4] [--chunk-size 200]
+"""
+
+import os
+import json
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import exercise_codec
+from cpp_bridge import negotiation_processor
+
+# Strings com menos palavras que isso em exercises.data não são analisadas
+MIN_WORDS = 8
+
+# Vínculo de análises feitas fora de um exercício (POST /api/analyze)
+NO_EXERCISE = ''
+
+
+def create_tables(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS analysis_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        content_hash TEXT NOT NULL,
+        analyzer_version TEXT NOT NULL,
+        word_count INTEGER,
+        tone_score REAL,
+        style_score REAL,
+        result BLOB NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (content_hash, analyzer_version)
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS analysis_links (
+        user_id INTEGER NOT NULL,
+        exercise_type TEXT NOT NULL,
+        source TEXT NOT NULL,
+        analysis_id INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, exercise_type, source, analysis_id),
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (analysis_id) REFERENCES analysis_results (id)
+    )
+    ''')
+    # Consulta da evolução por usuário e exercício
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_analysis_links_user_created
+    ON analysis_links (user_id, created_at)
+    ''')
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def analyze(text: str) -> Dict[str, Any]:
+    """Executa as análises do módulo C++ (ou do fallback) sobre um texto."""
+    return {
+        'analysis': negotiation_processor.analyze_text(text),
+        'patterns': negotiation_processor.detect_patterns(text)
+    }
+
+
+def _insert_result(cursor, digest: str, version: str, result: Dict[str, Any]) -> int:
+    metrics = result['analysis'].get('metrics', {})
+    cursor.execute(
+        'INSERT INTO analysis_results (content_hash, analyzer_version, word_count, tone_score, style_score, result) '
+        'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (content_hash, analyzer_version) DO NOTHING',
+        (digest, version, result['analysis'].get('word_count'), metrics.get('tone_score'),
+         metrics.get('style_score'), exercise_codec.encode(result))
+    )
+    # Em caso de conflito (gravado por outro processo) o id existente é usado
+    cursor.execute('SELECT id FROM analysis_results WHERE content_hash = ? AND analyzer_version = ?',
+                   (digest, version))
+    return cursor.fetchone()[0]
+
+
+def get_or_analyze(conn, text: str, commit: bool = True) -> Tuple[int, Dict[str, Any], bool]:
+    """Retorna ``(id, resultado, reaproveitado)`` da análise do texto.
+
+    O resultado é calculado e gravado apenas se o texto ainda não foi
+    analisado pela versão atual do analisador. Com ``commit=False`` quem
+    chama confirma a transação (uma vez por requisição).
+    """
+    digest = content_hash(text)
+    version = negotiation_processor.analyzer_version()
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, result FROM analysis_results WHERE content_hash = ? AND analyzer_version = ?',
+                   (digest, version))
+    row = cursor.fetchone()
+    if row:
+        return row[0], exercise_codec.decode(row[1]), True
+
+    result = analyze(text)
+    analysis_id = _insert_result(cursor, digest, version, result)
+    if commit:
+        conn.commit()
+    return analysis_id, result, False
+
+
+def link(conn, user_id: int, exercise_type: Optional[str], source: str, analysis_id: int, commit: bool = True):
+    """Liga um resultado a um usuário/exercício (ligações repetidas são ignoradas)."""
+    conn.execute(
+        'INSERT OR IGNORE INTO analysis_links (user_id, exercise_type, source, analysis_id) VALUES (?, ?, ?, ?)',
+        (user_id, exercise_type or NO_EXERCISE, source, analysis_id)
+    )
+    if commit:
+        conn.commit()
+
+
+def list_results(conn, user_id: int, exercise_type: Optional[str] = None, limit: int = 100) -> List[dict]:
+    """Resumo das análises do usuário, da mais recente para a mais antiga."""
+    query = ('SELECT r.id, l.exercise_type, l.source, l.created_at, r.word_count, r.tone_score, r.style_score '
+             'FROM analysis_links l JOIN analysis_results r ON r.id = l.analysis_id WHERE l.user_id = ?')
+    params: List[Any] = [user_id]
+    if exercise_type is not None:
+        query += ' AND l.exercise_type = ?'
+        params.append(exercise_type)
+    query += ' ORDER BY l.created_at DESC, r.id DESC LIMIT ?'
+    params.append(limit)
+    return [
+        {'id': row[0], 'exerciseType': row[1] or None, 'source': row[2], 'date': row[3],
+         'wordCount': row[4], 'toneScore': row[5], 'styleScore': row[6]}
+        for row in conn.execute(query, params)
+    ]
+
+
+def extract_texts(data: Any, path: str = '$') -> Iterator[Tuple[str, str]]:
+    """Percorre um payload de exercício gerando ``(caminho JSON, texto)`` analisáveis."""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from extract_texts(value, f'{path}.{key}')
+    elif isinstance(data, list):
+        for index, value in enumerate(data):
+            yield from extract_texts(value, f'{path}[{index}]')
+    elif isinstance(data, str) and len(data.split()) >= MIN_WORDS:
+        yield path, data
+
+
+def analyze_exercise(conn, user_id: int, exercise_type: str, data: Any) -> List[dict]:
+    """Analisa (ou reaproveita) todos os textos de um payload de exercício.
+
+    Resultados e vínculos são confirmados em um único commit.
+    """
+    results = []
+    for source, text in extract_texts(data):
+        analysis_id, result, cached = get_or_analyze(conn, text, commit=False)
+        link(conn, user_id, exercise_type, source, analysis_id, commit=False)
+        results.append(dict(result, source=source, analysisId=analysis_id, cached=cached))
+    conn.commit()
+    return results
+
+
+def _analyze_texts(texts: List[str]) -> List[Dict[str, Any]]:
+    # Executado nos processos do pool de backfill
+    return [analyze(text) for text in texts]
+
+
+def backfill(conn, workers: int, chunk_size: int) -> Dict[str, int]:
+    """Analisa os textos de todos os payloads de ``exercises.data``.
+
+    Os exercícios são lidos em lotes (keyset por id); os textos ainda não
+    analisados pela versão atual são enviados a um pool de processos, e os
+    resultados são gravados pelo processo principal, lote a lote, na ordem
+    em que os lotes foram enviados. Os vínculos recebem a data da última
+    atividade do exercício, e não a do backfill.
+    """
+    version = negotiation_processor.analyzer_version()
+    cursor = conn.cursor()
+    stats = {'exercises': 0, 'texts': 0, 'analyzed': 0}
+    pending = {}
+    last_id = 0
+
+    def store(future):
+        links, texts = pending.pop(future)
+        ids = {}
+        for text, result in zip(texts, future.result()):
+            ids[content_hash(text)] = _insert_result(cursor, content_hash(text), version, result)
+        for user_id, exercise_type, source, digest, last_activity in links:
+            if digest not in ids:
+                cursor.execute('SELECT id FROM analysis_results WHERE content_hash = ? AND analyzer_version = ?',
+                               (digest, version))
+                ids[digest] = cursor.fetchone()[0]
+            cursor.execute('INSERT OR IGNORE INTO analysis_links (user_id, exercise_type, source, analysis_id, created_at) '
+                           'VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))',
+                           (user_id, exercise_type, source, ids[digest], last_activity))
+        conn.commit()
+        stats['analyzed'] += len(texts)
+
+    # spawn: cada processo carrega sua própria instância do módulo C++
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        while True:
+            cursor.execute('SELECT id, user_id, exercise_type, data, last_activity FROM exercises '
+                           'WHERE id > ? ORDER BY id LIMIT ?', (last_id, chunk_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            stats['exercises'] += len(rows)
+
+            links, texts = [], {}
+            for _, user_id, exercise_type, data, last_activity in rows:
+                for source, text in extract_texts(exercise_codec.decode(data)):
+                    links.append((user_id, exercise_type, source, content_hash(text), last_activity))
+                    texts.setdefault(content_hash(text), text)
+            stats['texts'] += len(links)
+
+            # Descartar textos já analisados pela versão atual
+            for start in range(0, len(texts), 500):
+                digests = list(texts)[start:start + 500]
+                cursor.execute(
+                    f"SELECT content_hash FROM analysis_results WHERE analyzer_version = ? "
+                    f"AND content_hash IN ({','.join('?' * len(digests))})", [version] + digests)
+                for (digest,) in cursor.fetchall():
+                    texts.pop(digest, None)
+
+            # Textos repetidos em lotes ainda em andamento são analisados só uma vez
+            for _, in_flight_texts in pending.values():
+                for text in in_flight_texts:
+                    texts.pop(content_hash(text), None)
+
+            future = executor.submit(_analyze_texts, list(texts.values()))
+            pending[future] = (links, list(texts.values()))
+            # Gravar na ordem de envio: um lote pode apontar para textos de lotes anteriores
+            if len(pending) >= workers * 2:
+                store(next(iter(pending)))
+
+        for future in list(pending):
+            store(future)
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Armazenamento de resultados de análise de texto')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    backfill_parser = subparsers.add_parser('backfill', help='analisa os payloads históricos de exercises.data')
+    backfill_parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    backfill_parser.add_argument('--chunk-size', type=int, default=200)
+    args = parser.parse_args()
+
+    import app
+    app.init_db()
+    for name in app.shard_router.shard_names():
+        connection = app.shard_router.connect(name)
+        print(name, json.dumps(backfill(connection, args.workers, args.chunk_size)))
+        connection.close()
@@ -374,6 +374,31 @@ function setupEventListeners() {
     
     // Botão de exportar relatório
     document.getElementById('exportReport').addEventListener('click', exportReport);
+
+    // Alterações recebidas do servidor (outras abas ou dispositivos)
+    window.addEventListener('storage:userdata-changed', applySyncedUserData);
+}
+
+// Função para aplicar os dados sincronizados pelo Storage e atualizar as telas
+function applySyncedUserData() {
+    const synced = Storage.loadUserData();
+    if (!synced) return;
+
+    Object.entries(synced.exercises || {}).forEach(([exerciseId, exerciseData]) => {
+        userData.exercises[exerciseId] = { ...userData.exercises[exerciseId], ...exerciseData };
+    });
+    Object.entries(synced.trainingDays || {}).forEach(([day, dayData]) => {
+        userData.trainingDays[day] = { ...userData.trainingDays[day], ...dayData };
+    });
+    if (Array.isArray(synced.activityHistory)) {
+        userData.activityHistory = synced.activityHistory;
+    }
+    if (typeof synced.totalTimeSpent === 'number') {
+        userData.totalTimeSpent = synced.totalTimeSpent;
+    }
+
+    saveUserData();
+    updateUI();
 }
 
 // Função para mostrar uma seção específica
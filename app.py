@@ -6,8 +6,9 @@ import json
 import sqlite3
 import datetime
 import re
+import hmac
 import bcrypt
-from flask import Flask, request, jsonify, send_file, session
+from flask import Flask, Response, request, jsonify, send_file, session, stream_with_context
 from flask_cors import CORS
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -16,13 +17,25 @@ matplotlib.use('Agg')  # Use non-interactive backend
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
+import metrics
+import profiling
+import exercise_codec
+import activity_archive
+import analysis_store
+import events
+import static_assets
+import shards
+import write_behind
+from cpp_bridge import negotiation_processor
+from metrics import BCRYPT_DURATION, REPORT_STAGE_DURATION
 
 # Inicializar a aplicação Flask
 app = Flask(__name__)
 CORS(app, supports_credentials=True)  # Habilitar CORS para todas as rotas com suporte a credenciais
+metrics.init_app(app)  # Latência por rota e exportação em /metrics
 
 # Configuração da sessão
 app.secret_key = os.environ.get('SECRET_KEY', 'dev_secret_key_12345')
@@ -31,16 +44,50 @@ app.config['SESSION_PERMANENT'] = True
 app.config['PERMANENT_SESSION_LIFETIME'] = datetime.timedelta(days=7)
 
 # Configuração do banco de dados
-DB_PATH = os.path.join(os.path.dirname(__file__), 'data', 'negotiation_training.db')
-DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(__file__), 'data'))
+DB_PATH = os.path.join(DATA_DIR, 'negotiation_training.db')
 
 # Garantir que o diretório de dados exista
 if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
+# Token de administração (rotas administrativas ficam desativadas sem ele)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+PROFILES_DIR = os.path.join(DATA_DIR, 'profiles')
+
+# Build da interface gerado por "python static_assets.py build"
+STATIC_DIR = os.environ.get('STATIC_DIR', static_assets.DEFAULT_BUILD_DIR)
+
+# Particionamento dos dados de usuários (none, tenant ou hash; ver shards.py)
+SHARD_MODE = os.environ.get('SHARD_MODE', 'none')
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', 16))
+SHARDS_DIR = os.path.join(DATA_DIR, 'shards')
+
+# Organizações aceitas no cadastro (separadas por vírgula; vazio aceita qualquer uma).
+# Só requisições administrativas podem definir a organização de um usuário.
+TENANTS = {name.strip() for name in os.environ.get('TENANTS', '').split(',') if name.strip()}
+
+# Tempo máximo de uma consulta administrativa em cada shard (segundos)
+ADMIN_QUERY_TIMEOUT = float(os.environ.get('ADMIN_QUERY_TIMEOUT', 10))
+
+# Buffer write-behind das atualizações de progresso (desativado por padrão; ver write_behind.py)
+WRITE_BEHIND = os.environ.get('WRITE_BEHIND', '0') == '1'
+WRITE_BEHIND_INTERVAL = float(os.environ.get('WRITE_BEHIND_INTERVAL', 1.0))
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', 500))
+WRITE_BEHIND_FSYNC = os.environ.get('WRITE_BEHIND_FSYNC', '1') == '1'
+
+# Função para obter a conexão com o banco principal (diretório de usuários)
+# As conexões ficam em cache por thread; close() apenas as devolve ao cache
+def get_db_connection():
+    return shard_router.directory()
+
+# Função para obter a conexão com o shard que guarda os dados de um usuário
+def get_user_db_connection(user_id):
+    return shard_router.connect_for_user(user_id)
+
 # Função para inicializar o banco de dados
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
     
     # Criar tabela de usuários
@@ -54,6 +101,24 @@ def init_db():
     )
     ''')
     
+    # Organização do usuário (define o shard dos seus dados)
+    shards.add_column(cursor, 'users', 'organization', 'TEXT')
+    
+    conn.commit()
+    conn.close()
+    
+    # Criar as tabelas de dados nos shards existentes (novos shards são criados no primeiro uso)
+    for name in shard_router.shard_names():
+        shard_router.connect(name).close()
+    
+    # Reaplicar atualizações adiadas que processos encerrados não chegaram a gravar
+    if progress_buffer is not None:
+        progress_buffer.recover()
+
+# Função para criar as tabelas de dados de usuários em um shard
+def init_shard(conn):
+    cursor = conn.cursor()
+    
     # Criar tabela de exercícios
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS exercises (
@@ -94,8 +159,39 @@ def init_db():
     )
     ''')
     
+    # Índice para a paginação keyset do histórico por usuário
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_activity_history_user_created
+    ON activity_history (user_id, created_at, id)
+    ''')
+    
+    # Criar tabela de agregados diários do histórico arquivado
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS activity_daily (
+        user_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        activity_type TEXT NOT NULL,
+        activity_count INTEGER DEFAULT 0,
+        total_duration INTEGER DEFAULT 0,
+        PRIMARY KEY (user_id, day, activity_type),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+    
+    # Criar tabelas de resultados de análise de texto
+    analysis_store.create_tables(cursor)
+    
+    # Criar tabela de controle do buffer write-behind
+    write_behind.create_tables(cursor)
+    
     conn.commit()
-    conn.close()
+    
+    # Converter payloads de exercícios gravados em outro formato para o codec atual
+    exercise_codec.migrate_exercise_data(conn)
+
+# Roteamento dos usuários para os shards e cache de conexões por thread
+shard_router = shards.ShardRouter(DB_PATH, SHARDS_DIR, SHARD_MODE, SHARD_COUNT, init_shard=init_shard)
+shards.init_app(app, shard_router)
 
 # Inicializar o banco de dados na inicialização da aplicação
 @app.before_first_request
@@ -110,7 +206,7 @@ def login():
     if not data or 'email' not in data or 'password' not in data:
         return jsonify({'error': 'Dados incompletos'}), 400
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
@@ -123,7 +219,10 @@ def login():
         return jsonify({'error': 'Usuário não encontrado'}), 404
     
     # Verificar senha
-    if bcrypt.checkpw(data['password'].encode('utf-8'), user['password']):
+    with BCRYPT_DURATION.time(operation='checkpw'):
+        password_ok = bcrypt.checkpw(data['password'].encode('utf-8'), user['password'])
+    
+    if password_ok:
         # Criar sessão
         session['user_id'] = user['id']
         session['user_email'] = user['email']
@@ -133,6 +232,7 @@ def login():
             'id': user['id'],
             'name': user['name'],
             'email': user['email'],
+            'organization': user['organization'],
             'message': 'Login realizado com sucesso'
         }
         conn.close()
@@ -170,11 +270,158 @@ def require_auth(f):
         return f(*args, **kwargs)
     return decorated
 
+# Verifica se a requisição traz o token de administração
+def is_admin_request():
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+# Middleware para verificar acesso administrativo
+def require_admin(f):
+    from functools import wraps
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not is_admin_request():
+            return jsonify({'error': 'Acesso restrito a administradores'}), 403
+        return f(*args, **kwargs)
+    return decorated
+
+# Barramento de eventos de progresso (canal SSE por usuário)
+event_bus = events.create_event_bus()
+
+# Intervalo entre comentários de keep-alive no canal SSE (segundos)
+SSE_HEARTBEAT_SECONDS = 15
+
+# Função para notificar os clientes de um usuário; chamada depois do commit,
+# então uma falha do broker não pode transformar a gravação em erro
+def publish_event(user_id, event_type, data):
+    try:
+        event_bus.publish(events.user_channel(user_id), event_type, data)
+    except Exception:
+        app.logger.exception('Falha ao publicar o evento %s do usuário %s', event_type, user_id)
+
+# Função para notificar os clientes sobre o progresso gravado pelo buffer write-behind
+def publish_buffered_progress(kind, user_id, key, status, time_spent, last_activity):
+    if kind == 'exercise':
+        publish_event(user_id, 'exercise', {
+            'exerciseType': key,
+            'status': status,
+            'timeSpent': time_spent,
+            'lastActivity': last_activity,
+            'dataChanged': False
+        })
+    else:
+        publish_event(user_id, 'training_day', {
+            'dayNumber': key,
+            'status': status,
+            'timeSpent': time_spent,
+            'lastActivity': last_activity
+        })
+
+progress_buffer = None
+if WRITE_BEHIND:
+    progress_buffer = write_behind.WriteBehindBuffer(
+        os.path.join(DATA_DIR, 'write_behind'), shard_router, WRITE_BEHIND_INTERVAL,
+        WRITE_BEHIND_MAX_PENDING, WRITE_BEHIND_FSYNC, on_flush=publish_buffered_progress
+    )
+
+# Atualizações que só alteram status e tempo podem ser adiadas
+# (conclusões registram histórico e payloads são gravados imediatamente)
+def is_deferrable_update(data):
+    return (progress_buffer is not None and data.get('status') != 'completed'
+            and not {'data', 'dataPatch', 'dataSet'} & data.keys())
+
+# Grava as atualizações adiadas antes de uma leitura do progresso
+# (de um usuário ou, sem user_id, de todos)
+def flush_deferred_progress(user_id=None):
+    if progress_buffer is None:
+        return
+    if user_id is None:
+        progress_buffer.flush()
+    else:
+        progress_buffer.flush_user(user_id)
+
+# Coleta de perfis por amostragem ou sob demanda (cabeçalho X-Profile)
+profiling.init_app(app, PROFILES_DIR, is_admin_request)
+
+# Rota para consultar a configuração de perfilamento
+@app.route('/api/admin/profiling', methods=['GET'])
+@require_admin
+def get_profiling_settings():
+    return jsonify(profiling.get_settings())
+
+# Rota para alterar a taxa de amostragem de perfis
+@app.route('/api/admin/profiling', methods=['PUT'])
+@require_admin
+def update_profiling_settings():
+    data = request.json or {}
+    try:
+        sample_rate = data.get('sample_rate')
+        settings = profiling.update_settings(
+            sample_rate=float(sample_rate) if sample_rate is not None else None,
+            profiler=data.get('profiler')
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(settings)
+
+# Rota para listar os perfis coletados
+@app.route('/api/admin/profiles', methods=['GET'])
+@require_admin
+def list_profiles():
+    return jsonify({'profiles': profiling.list_profiles(PROFILES_DIR)})
+
+# Rota para baixar um perfil coletado
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+@require_admin
+def download_profile(profile_id):
+    profile_path = profiling.get_profile_path(PROFILES_DIR, profile_id)
+    if not profile_path:
+        return jsonify({'error': 'Perfil não encontrado'}), 404
+    return send_file(profile_path, as_attachment=True)
+
+# Rota para listar os shards de dados de usuários
+@app.route('/api/admin/shards', methods=['GET'])
+@require_admin
+def list_shards():
+    return jsonify({'mode': SHARD_MODE, 'shards': shard_router.describe()})
+
+# Rota para consultas analíticas (somente leitura) em todos os shards
+@app.route('/api/admin/shards/query', methods=['POST'])
+@require_admin
+def query_shards():
+    data = request.json or {}
+    params = data.get('params', [])
+    if not isinstance(data.get('sql'), str) or not isinstance(params, (list, dict)):
+        return jsonify({'error': 'Informe sql e, opcionalmente, params (lista ou objeto)'}), 400
+    
+    try:
+        limit = min(max(int(data.get('limit', 1000)), 1), 10000)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Parâmetros inválidos'}), 400
+    
+    flush_deferred_progress()
+    try:
+        result = shard_router.query_all(data['sql'], params, limit, ADMIN_QUERY_TIMEOUT)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
 # Rota para obter dados do usuário
 @app.route('/api/user/<int:user_id>', methods=['GET'])
 @require_auth
 def get_user_data(user_id):
-    conn = sqlite3.connect(DB_PATH)
+    include_exercise_data = request.args.get('exerciseData', 'full') != 'none'
+    user_data = load_user_data(user_id, include_exercise_data)
+    
+    if user_data is None:
+        return jsonify({'error': 'Usuário não encontrado'}), 404
+    
+    return jsonify(user_data)
+
+# Função para montar o documento do painel do usuário (None se não existir)
+def load_user_data(user_id, include_exercise_data=True):
+    flush_deferred_progress(user_id)
+    conn = get_db_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
@@ -184,10 +431,18 @@ def get_user_data(user_id):
     
     if not user:
         conn.close()
-        return jsonify({'error': 'Usuário não encontrado'}), 404
+        return None
     
-    # Obter exercícios do usuário
-    cursor.execute('SELECT * FROM exercises WHERE user_id = ?', (user_id,))
+    # Os dados de progresso ficam no shard do usuário
+    shard = get_user_db_connection(user_id)
+    shard.row_factory = sqlite3.Row
+    cursor = shard.cursor()
+    
+    # Obter exercícios do usuário (o payload JSON só é lido quando solicitado)
+    if include_exercise_data:
+        cursor.execute('SELECT exercise_type, status, time_spent, last_activity, data FROM exercises WHERE user_id = ?', (user_id,))
+    else:
+        cursor.execute('SELECT exercise_type, status, time_spent, last_activity FROM exercises WHERE user_id = ?', (user_id,))
     exercises = cursor.fetchall()
     
     # Obter dias de treinamento do usuário
@@ -195,7 +450,7 @@ def get_user_data(user_id):
     training_days = cursor.fetchall()
     
     # Obter histórico de atividades do usuário
-    cursor.execute('SELECT * FROM activity_history WHERE user_id = ? ORDER BY created_at DESC LIMIT 10', (user_id,))
+    cursor.execute('SELECT * FROM activity_history WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT 10', (user_id,))
     activity_history = cursor.fetchall()
     
     # Calcular tempo total gasto
@@ -212,6 +467,7 @@ def get_user_data(user_id):
         'id': user['id'],
         'name': user['name'],
         'email': user['email'],
+        'organization': user['organization'],
         'created_at': user['created_at'],
         'exercises': {},
         'trainingDays': {},
@@ -224,9 +480,10 @@ def get_user_data(user_id):
         user_data['exercises'][exercise['exercise_type']] = {
             'status': exercise['status'],
             'timeSpent': exercise['time_spent'],
-            'lastActivity': exercise['last_activity'],
-            'data': json.loads(exercise['data']) if exercise['data'] else {}
+            'lastActivity': exercise['last_activity']
         }
+        if include_exercise_data:
+            user_data['exercises'][exercise['exercise_type']]['data'] = exercise_codec.decode(exercise['data'])
     
     # Processar dias de treinamento
     for day in training_days:
@@ -245,8 +502,98 @@ def get_user_data(user_id):
             'date': activity['created_at']
         })
     
+    shard.close()
     conn.close()
-    return jsonify(user_data)
+    return user_data
+
+# Rota para receber alterações de progresso em tempo real (Server-Sent Events)
+@app.route('/api/user/<int:user_id>/events', methods=['GET'])
+@require_auth
+def user_events(user_id):
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('lastEventId'))
+    subscription = event_bus.subscribe(
+        events.user_channel(user_id),
+        int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    )
+    
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                event = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                yield events.format_sse(event) if event else ': keep-alive\n\n'
+        finally:
+            subscription.close()
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# Rota para paginar o histórico de atividades (cursor keyset)
+@app.route('/api/user/<int:user_id>/activity', methods=['GET'])
+@require_auth
+def get_activity_history(user_id):
+    try:
+        limit = min(max(int(request.args.get('limit', activity_archive.DEFAULT_PAGE_SIZE)), 1),
+                    activity_archive.MAX_PAGE_SIZE)
+        after = activity_archive.decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({'error': 'Parâmetros de paginação inválidos'}), 400
+    
+    conn = get_user_db_connection(user_id)
+    rows = activity_archive.fetch_page(conn.cursor(), user_id, after, limit)
+    conn.close()
+    
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = activity_archive.encode_cursor(rows[-1][4], rows[-1][0])
+    
+    return jsonify({
+        'items': [activity_archive.to_dict(row) for row in rows],
+        'nextCursor': next_cursor
+    })
+
+# Rota para exportar todo o histórico de atividades (NDJSON ou CSV em streaming)
+@app.route('/api/user/<int:user_id>/activity/export', methods=['GET'])
+@require_auth
+def export_activity_history(user_id):
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'Formato inválido'}), 400
+    
+    def generate():
+        conn = get_user_db_connection(user_id)
+        try:
+            activities = activity_archive.iter_activity(conn, user_id)
+            if export_format == 'csv':
+                yield from activity_archive.stream_csv(activities)
+            else:
+                yield from activity_archive.stream_ndjson(activities)
+        finally:
+            conn.close()
+    
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=atividades_usuario_{user_id}.{export_format}'
+    })
+
+# Rota para obter os agregados diários do histórico arquivado
+@app.route('/api/user/<int:user_id>/activity/daily', methods=['GET'])
+@require_auth
+def get_activity_daily(user_id):
+    conn = get_user_db_connection(user_id)
+    cursor = conn.cursor()
+    cursor.execute(
+        'SELECT day, activity_type, activity_count, total_duration FROM activity_daily WHERE user_id = ? ORDER BY day DESC',
+        (user_id,)
+    )
+    days = [
+        {'day': day, 'type': activity_type, 'count': count, 'duration': duration}
+        for day, activity_type, count, duration in cursor.fetchall()
+    ]
+    conn.close()
+    return jsonify({'days': days})
 
 # Rota para criar um novo usuário
 @app.route('/api/user', methods=['POST'])
@@ -265,24 +612,49 @@ def create_user():
     if len(data['password']) < 6:
         return jsonify({'error': 'A senha deve ter pelo menos 6 caracteres'}), 400
     
+    # A organização escolhe o shard do usuário: o autocadastro não pode defini-la
+    organization = data.get('organization') or None
+    if organization is not None:
+        if not is_admin_request():
+            return jsonify({'error': 'Apenas administradores podem definir a organização'}), 403
+        if not isinstance(organization, str) or (TENANTS and organization.strip() not in TENANTS):
+            return jsonify({'error': 'Organização inválida'}), 400
+        organization = organization.strip()
+    
     # Hash da senha
-    hashed_password = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt())
+    with BCRYPT_DURATION.time(operation='hashpw'):
+        hashed_password = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt())
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        # Inserir novo usuário
-        cursor.execute('INSERT INTO users (name, email, password) VALUES (?, ?, ?)', 
-                      (data['name'], data['email'], hashed_password))
+        # Inserir novo usuário no diretório
+        cursor.execute('INSERT INTO users (name, email, password, organization) VALUES (?, ?, ?, ?)', 
+                      (data['name'], data['email'], hashed_password, organization))
         user_id = cursor.lastrowid
-        
+        conn.commit()
+    
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        conn.close()
+        return jsonify({'error': 'Email já cadastrado'}), 409
+    
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+    
+    shard = get_user_db_connection(user_id)
+    cursor = shard.cursor()
+    
+    try:
         # Inicializar exercícios para o usuário
         exercise_types = ['batna', 'meso', 'concessoes', 'spin', 'ancora', 'email', 'gravacao', 'taticas', 'framing', 'pos']
         for exercise_type in exercise_types:
             cursor.execute(
                 'INSERT INTO exercises (user_id, exercise_type, data) VALUES (?, ?, ?)',
-                (user_id, exercise_type, '{}')
+                (user_id, exercise_type, exercise_codec.encode({}))
             )
         
         # Inicializar dias de treinamento para o usuário
@@ -292,20 +664,20 @@ def create_user():
                 (user_id, day)
             )
         
-        conn.commit()
+        shard.commit()
+        shard.close()
         
         # Retornar o ID do novo usuário
-        result = {'id': user_id, 'name': data['name'], 'email': data['email']}
+        result = {'id': user_id, 'name': data['name'], 'email': data['email'], 'organization': organization}
         conn.close()
         return jsonify(result), 201
     
-    except sqlite3.IntegrityError:
-        conn.rollback()
-        conn.close()
-        return jsonify({'error': 'Email já cadastrado'}), 409
-    
     except Exception as e:
-        conn.rollback()
+        # Diretório e shard são bancos distintos: desfazer o cadastro manualmente
+        shard.rollback()
+        shard.close()
+        conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
+        conn.commit()
         conn.close()
         return jsonify({'error': str(e)}), 500
 
@@ -318,10 +690,29 @@ def update_exercise(user_id, exercise_type):
     if not data:
         return jsonify({'error': 'Dados incompletos'}), 400
     
-    conn = sqlite3.connect(DB_PATH)
+    try:
+        write_behind.validate(data.get('status', 'in-progress'), data.get('timeSpent'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if 'dataSet' in data and not (isinstance(data['dataSet'], dict) and
+                                  all(exercise_codec.is_valid_path(path) for path in data['dataSet'])):
+        return jsonify({'error': 'dataSet deve mapear caminhos JSON ($.campo) para valores'}), 400
+    
+    # Gravar antes as atualizações adiadas desta chave para não sobrescrever o novo status
+    deferred = is_deferrable_update(data)
+    if progress_buffer is not None and not deferred:
+        progress_buffer.flush_pending('exercise', user_id, exercise_type)
+    
+    conn = get_user_db_connection(user_id)
     cursor = conn.cursor()
     
     try:
+        # Atualizações parciais de payload compactado leem e regravam o valor:
+        # reservar a escrita desde já para não perder alterações concorrentes
+        if ('dataPatch' in data or 'dataSet' in data) and not exercise_codec.uses_text_storage():
+            cursor.execute('BEGIN IMMEDIATE')
+        
         # Verificar se o exercício existe
         cursor.execute(
             'SELECT id FROM exercises WHERE user_id = ? AND exercise_type = ?',
@@ -333,28 +724,133 @@ def update_exercise(user_id, exercise_type):
             conn.close()
             return jsonify({'error': 'Exercício não encontrado'}), 404
         
-        # Atualizar o exercício
+        if deferred:
+            conn.close()
+            progress_buffer.add('exercise', user_id, exercise_type, data.get('status', 'in-progress'), data.get('timeSpent', 0))
+            return jsonify({'success': True, 'buffered': True})
+        
+        # Atualizar o exercício: só as colunas enviadas são alteradas, e uma
+        # atualização apenas do payload não mexe no status nem na última atividade
+        data_sql, data_params = build_exercise_data_update(cursor, exercise[0], data)
+        assignments, params = [], []
+        if 'status' in data or not {'data', 'dataPatch', 'dataSet'} & data.keys():
+            assignments.append('status = ?')
+            params.append(data.get('status', 'in-progress'))
+        if 'timeSpent' in data:
+            assignments.append('time_spent = time_spent + ?')
+            params.append(data['timeSpent'])
+        if assignments:
+            assignments.append('last_activity = CURRENT_TIMESTAMP')
+        if data_sql:
+            assignments.append(data_sql)
+            params.extend(data_params)
+        if not assignments:
+            # Nada a alterar (ex.: dataSet vazio): apenas devolver o estado atual
+            assignments.append('status = status')
         cursor.execute(
-            'UPDATE exercises SET status = ?, time_spent = time_spent + ?, last_activity = CURRENT_TIMESTAMP, data = ? WHERE user_id = ? AND exercise_type = ?',
-            (data.get('status', 'in-progress'), data.get('timeSpent', 0), json.dumps(data.get('data', {})), user_id, exercise_type)
+            f'UPDATE exercises SET {", ".join(assignments)} WHERE user_id = ? AND exercise_type = ? '
+            'RETURNING status, time_spent, last_activity',
+            (*params, user_id, exercise_type)
         )
+        status, time_spent, last_activity = cursor.fetchall()[0]
         
         # Registrar atividade no histórico
+        activity = None
         if 'status' in data and data['status'] == 'completed':
             cursor.execute(
-                'INSERT INTO activity_history (user_id, title, activity_type, duration) VALUES (?, ?, ?, ?)',
+                'INSERT INTO activity_history (user_id, title, activity_type, duration) VALUES (?, ?, ?, ?) '
+                'RETURNING id, title, activity_type, duration, created_at',
                 (user_id, f'Concluiu: {get_exercise_name(exercise_type)}', 'exercise', data.get('timeSpent', 0))
             )
+            activity = cursor.fetchall()[0]
         
         conn.commit()
         conn.close()
+        
+        # Notificar os clientes conectados apenas sobre o que mudou
+        publish_event(user_id, 'exercise', {
+            'exerciseType': exercise_type,
+            'status': status,
+            'timeSpent': time_spent,
+            'lastActivity': last_activity,
+            'dataChanged': bool(data_sql)
+        })
+        if activity:
+            publish_event(user_id, 'activity', activity_archive.to_dict(activity))
+        
         return jsonify({'success': True})
     
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        conn.close()
+        # Caminho recusado pelo json_set do SQLite
+        if 'JSON path error' in str(e):
+            return jsonify({'error': 'dataSet contém um caminho JSON inválido'}), 400
+        return jsonify({'error': str(e)}), 500
+    
     except Exception as e:
         conn.rollback()
         conn.close()
         return jsonify({'error': str(e)}), 500
 
+# Monta o trecho SQL que atualiza o payload de um exercício
+#   data:      substitui o payload inteiro
+#   dataPatch: aplica um JSON merge patch (RFC 7396)
+#   dataSet:   altera caminhos específicos ({"$.campo": valor})
+# Com payloads em texto a alteração parcial é feita pelo SQLite (json_patch/json_set);
+# com payloads compactados ela é aplicada em Python sobre o valor decodificado.
+def build_exercise_data_update(cursor, exercise_id, data):
+    if 'data' in data:
+        return 'data = ?', [exercise_codec.encode(data['data'])]
+    
+    if 'dataPatch' not in data and not data.get('dataSet'):
+        return '', []
+    
+    if exercise_codec.uses_text_storage():
+        if 'dataPatch' in data:
+            return "data = json_patch(COALESCE(data, '{}'), ?)", [json.dumps(data['dataPatch'])]
+        
+        params = []
+        for path, value in data['dataSet'].items():
+            params.extend([path, json.dumps(value)])
+        placeholders = ', '.join(['?, json(?)'] * len(data['dataSet']))
+        return f"data = json_set(COALESCE(data, '{{}}'), {placeholders})", params
+    
+    cursor.execute('SELECT data FROM exercises WHERE id = ?', (exercise_id,))
+    payload = exercise_codec.decode(cursor.fetchone()[0])
+    if 'dataPatch' in data:
+        payload = exercise_codec.apply_merge_patch(payload, data['dataPatch'])
+    else:
+        for path, value in data['dataSet'].items():
+            payload = exercise_codec.apply_json_set(payload, path, value)
+    return 'data = ?', [exercise_codec.encode(payload)]
+
+# Rota para obter o payload de um único exercício
+@app.route('/api/exercise/<int:user_id>/<exercise_type>', methods=['GET'])
+@require_auth
+def get_exercise_data(user_id, exercise_type):
+    flush_deferred_progress(user_id)
+    conn = get_user_db_connection(user_id)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'SELECT status, time_spent, last_activity, data FROM exercises WHERE user_id = ? AND exercise_type = ?',
+        (user_id, exercise_type)
+    )
+    exercise = cursor.fetchone()
+    conn.close()
+    
+    if not exercise:
+        return jsonify({'error': 'Exercício não encontrado'}), 404
+    
+    return jsonify({
+        'status': exercise['status'],
+        'timeSpent': exercise['time_spent'],
+        'lastActivity': exercise['last_activity'],
+        'data': exercise_codec.decode(exercise['data'])
+    })
+
 # Rota para atualizar o status de um dia de treinamento
 @app.route('/api/training-day/<int:user_id>/<int:day_number>', methods=['PUT'])
 def update_training_day(user_id, day_number):
@@ -363,7 +859,16 @@ def update_training_day(user_id, day_number):
     if not data:
         return jsonify({'error': 'Dados incompletos'}), 400
     
-    conn = sqlite3.connect(DB_PATH)
+    try:
+        write_behind.validate(data.get('status', 'in-progress'), data.get('timeSpent'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    deferred = is_deferrable_update(data)
+    if progress_buffer is not None and not deferred:
+        progress_buffer.flush_pending('training_day', user_id, day_number)
+    
+    conn = get_user_db_connection(user_id)
     cursor = conn.cursor()
     
     try:
@@ -378,21 +883,42 @@ def update_training_day(user_id, day_number):
             conn.close()
             return jsonify({'error': 'Dia de treinamento não encontrado'}), 404
         
+        if deferred:
+            conn.close()
+            progress_buffer.add('training_day', user_id, day_number, data.get('status', 'in-progress'), data.get('timeSpent', 0))
+            return jsonify({'success': True, 'buffered': True})
+        
         # Atualizar o dia de treinamento
         cursor.execute(
-            'UPDATE training_days SET status = ?, time_spent = time_spent + ?, last_activity = CURRENT_TIMESTAMP WHERE user_id = ? AND day_number = ?',
+            'UPDATE training_days SET status = ?, time_spent = time_spent + ?, last_activity = CURRENT_TIMESTAMP WHERE user_id = ? AND day_number = ? '
+            'RETURNING status, time_spent, last_activity',
             (data.get('status', 'in-progress'), data.get('timeSpent', 0), user_id, day_number)
         )
+        status, time_spent, last_activity = cursor.fetchall()[0]
         
         # Registrar atividade no histórico
+        activity = None
         if 'status' in data and data['status'] == 'completed':
             cursor.execute(
-                'INSERT INTO activity_history (user_id, title, activity_type, duration) VALUES (?, ?, ?, ?)',
+                'INSERT INTO activity_history (user_id, title, activity_type, duration) VALUES (?, ?, ?, ?) '
+                'RETURNING id, title, activity_type, duration, created_at',
                 (user_id, f'Concluiu: Dia {day_number} do Plano de Treino', 'training', data.get('timeSpent', 0))
             )
+            activity = cursor.fetchall()[0]
         
         conn.commit()
         conn.close()
+        
+        # Notificar os clientes conectados
+        publish_event(user_id, 'training_day', {
+            'dayNumber': day_number,
+            'status': status,
+            'timeSpent': time_spent,
+            'lastActivity': last_activity
+        })
+        if activity:
+            publish_event(user_id, 'activity', activity_archive.to_dict(activity))
+        
         return jsonify({'success': True})
     
     except Exception as e:
@@ -400,10 +926,79 @@ def update_training_day(user_id, day_number):
         conn.close()
         return jsonify({'error': str(e)}), 500
 
+# Rota para analisar um texto de negociação (tom, estilo e padrões táticos)
+@app.route('/api/analyze', methods=['POST'])
+@require_auth
+def analyze_negotiation_text():
+    data = request.json
+    
+    if not data or not isinstance(data.get('text'), str):
+        return jsonify({'error': 'Dados incompletos'}), 400
+    
+    return jsonify(run_analysis(data['text'], session['user_id'], data.get('exerciseType')))
+
+# Função para analisar um texto reaproveitando resultados já armazenados
+def run_analysis(text, user_id=None, exercise_type=None):
+    if user_id is not None:
+        conn = get_user_db_connection(user_id)
+    else:
+        conn = shard_router.connect(shard_router.default_shard())
+    try:
+        analysis_id, result, cached = analysis_store.get_or_analyze(conn, text, commit=False)
+        if user_id is not None:
+            analysis_store.link(conn, user_id, exercise_type, 'api', analysis_id, commit=False)
+        conn.commit()
+    finally:
+        conn.close()
+    return dict(result, analysisId=analysis_id, cached=cached)
+
+# Rota para analisar os textos gravados em um exercício
+@app.route('/api/exercise/<int:user_id>/<exercise_type>/analysis', methods=['GET'])
+@require_auth
+def get_exercise_analysis(user_id, exercise_type):
+    conn = get_user_db_connection(user_id)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT data FROM exercises WHERE user_id = ? AND exercise_type = ?',
+                       (user_id, exercise_type))
+        exercise = cursor.fetchone()
+        if not exercise:
+            return jsonify({'error': 'Exercício não encontrado'}), 404
+        results = analysis_store.analyze_exercise(conn, user_id, exercise_type, exercise_codec.decode(exercise[0]))
+    finally:
+        conn.close()
+    
+    return jsonify({'exerciseType': exercise_type, 'results': results})
+
+# Rota para consultar a evolução das análises do usuário
+@app.route('/api/user/<int:user_id>/analyses', methods=['GET'])
+@require_auth
+def get_analysis_history(user_id):
+    try:
+        limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+    except ValueError:
+        return jsonify({'error': 'Parâmetros inválidos'}), 400
+    
+    conn = get_user_db_connection(user_id)
+    items = analysis_store.list_results(conn, user_id, request.args.get('exerciseType'), limit)
+    conn.close()
+    
+    return jsonify({'items': items})
+
 # Rota para gerar relatório PDF
 @app.route('/api/report/<int:user_id>', methods=['GET'])
 def generate_report(user_id):
-    conn = sqlite3.connect(DB_PATH)
+    pdf_path = build_report(user_id)
+    
+    if pdf_path is None:
+        return jsonify({'error': 'Usuário não encontrado'}), 404
+    
+    return send_file(pdf_path, as_attachment=True)
+
+# Função para gerar o relatório PDF de um usuário (retorna o caminho ou None)
+def build_report(user_id):
+    flush_deferred_progress(user_id)
+    conn = get_db_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
@@ -413,7 +1008,12 @@ def generate_report(user_id):
     
     if not user:
         conn.close()
-        return jsonify({'error': 'Usuário não encontrado'}), 404
+        return None
+    
+    # Os dados de progresso ficam no shard do usuário
+    shard = get_user_db_connection(user_id)
+    shard.row_factory = sqlite3.Row
+    cursor = shard.cursor()
     
     # Obter exercícios do usuário
     cursor.execute('SELECT * FROM exercises WHERE user_id = ?', (user_id,))
@@ -433,18 +1033,21 @@ def generate_report(user_id):
     total_time_spent = exercises_time + training_days_time
     
     # Gerar gráficos para o relatório
-    generate_progress_charts(user_id)
+    with REPORT_STAGE_DURATION.time(stage='charts'):
+        generate_progress_charts(user_id)
     
     # Gerar o PDF
     pdf_path = os.path.join(DATA_DIR, f'relatorio_usuario_{user_id}.pdf')
-    generate_pdf_report(pdf_path, user, exercises, training_days, total_time_spent)
+    with REPORT_STAGE_DURATION.time(stage='pdf'):
+        generate_pdf_report(pdf_path, user, exercises, training_days, total_time_spent)
     
+    shard.close()
     conn.close()
-    return send_file(pdf_path, as_attachment=True)
+    return pdf_path
 
 # Função para gerar gráficos de progresso
 def generate_progress_charts(user_id):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_user_db_connection(user_id)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
@@ -476,7 +1079,7 @@ def generate_progress_charts(user_id):
         colors=['#48BB78', '#ECC94B', '#F56565']
     )
     plt.title('Status dos Exercícios')
-    plt.savefig(os.path.join(DATA_DIR, 'exercises_status.png'))
+    plt.savefig(os.path.join(DATA_DIR, f'exercises_status_{user_id}.png'))
     plt.close()
     
     # Gráfico de status dos dias de treinamento
@@ -488,7 +1091,7 @@ def generate_progress_charts(user_id):
         colors=['#48BB78', '#ECC94B', '#F56565']
     )
     plt.title('Status dos Dias de Treinamento')
-    plt.savefig(os.path.join(DATA_DIR, 'training_days_status.png'))
+    plt.savefig(os.path.join(DATA_DIR, f'training_days_status_{user_id}.png'))
     plt.close()
     
     # Gráfico de tempo gasto por exercício
@@ -508,7 +1111,7 @@ def generate_progress_charts(user_id):
                  f'{height}',
                  ha='center', va='bottom')
     
-    plt.savefig(os.path.join(DATA_DIR, 'exercise_time.png'))
+    plt.savefig(os.path.join(DATA_DIR, f'exercise_time_{user_id}.png'))
     plt.close()
 
 # Função para gerar relatório PDF
@@ -593,9 +1196,9 @@ def generate_pdf_report(pdf_path, user, exercises, training_days, total_time_spe
     elements.append(Paragraph('Gráficos de Progresso', styles['Heading2']))
     
     # Verificar se os gráficos existem
-    exercises_chart_path = os.path.join(DATA_DIR, 'exercises_status.png')
-    training_days_chart_path = os.path.join(DATA_DIR, 'training_days_status.png')
-    exercise_time_chart_path = os.path.join(DATA_DIR, 'exercise_time.png')
+    exercises_chart_path = os.path.join(DATA_DIR, f'exercises_status_{user["id"]}.png')
+    training_days_chart_path = os.path.join(DATA_DIR, f'training_days_status_{user["id"]}.png')
+    exercise_time_chart_path = os.path.join(DATA_DIR, f'exercise_time_{user["id"]}.png')
     
     if os.path.exists(exercises_chart_path):
         elements.append(Paragraph('Status dos Exercícios', styles['Heading3']))
@@ -631,6 +1234,16 @@ def get_exercise_name(exercise_id):
     
     return exercise_names.get(exercise_id, 'Exercício Desconhecido')
 
+# Interface (SPA) com nomes por hash, variantes compactadas e cache de longa duração
+static_assets.init_app(app, STATIC_DIR)
+
+# Rotas de API inexistentes respondem com o mesmo corpo JSON das demais rotas
+@app.errorhandler(404)
+def not_found(error):
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'Não encontrado'}), 404
+    return error
+
 # Iniciar o servidor se este arquivo for executado diretamente
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Ponto de entrada ASGI da API.
+
+As rotas mais sensíveis a concorrência são atendidas por handlers
+assíncronos, e o trabalho bloqueante é despachado explicitamente:
+
+    - acesso ao SQLite em um pool de threads (ASGI_DB_THREADS)
+    - análises do módulo C++ em outro pool de threads (ASGI_ANALYSIS_THREADS);
+      o ctypes libera o GIL durante a chamada nativa
+    - geração de relatórios (matplotlib/reportlab) em um pool de processos
+      (ASGI_REPORT_PROCESSES)
+    - o canal SSE aguarda eventos no próprio loop, sem ocupar threads,
+      permitindo milhares de conexões ociosas por worker
+
+As demais rotas são encaminhadas para a aplicação Flask via WsgiToAsgi,
+executada em um pool de threads próprio (ASGI_WSGI_THREADS): o adaptador
+padrão do asgiref roda todas as requisições WSGI do processo em uma única
+thread, uma após a outra.
+
+Uso:
+    uvicorn asgi:application --workers 4
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from itsdangerous import BadSignature
+
+import app as flask_module
+import events
+from metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+DB_THREADS = int(os.environ.get('ASGI_DB_THREADS', 16))
+ANALYSIS_THREADS = int(os.environ.get('ASGI_ANALYSIS_THREADS', 4))
+REPORT_PROCESSES = int(os.environ.get('ASGI_REPORT_PROCESSES', 2))
+WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 32))
+
+# Tamanho dos blocos enviados ao transmitir arquivos
+FILE_CHUNK_SIZE = 64 * 1024
+
+flask_app = flask_module.app
+
+_executors = {}
+_db_ready = None
+
+
+def _executor(name):
+    """Cria sob demanda os pools usados para o trabalho bloqueante."""
+    if name not in _executors:
+        if name == 'db':
+            _executors[name] = ThreadPoolExecutor(DB_THREADS, thread_name_prefix='asgi-db')
+        elif name == 'analysis':
+            _executors[name] = ThreadPoolExecutor(ANALYSIS_THREADS, thread_name_prefix='asgi-analysis')
+        elif name == 'wsgi':
+            _executors[name] = ThreadPoolExecutor(WSGI_THREADS, thread_name_prefix='asgi-wsgi')
+        else:
+            # spawn: o processo pai tem threads ativas, fork não é seguro
+            _executors[name] = ProcessPoolExecutor(REPORT_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+    return _executors[name]
+
+
+class PooledWsgiToAsgiInstance(WsgiToAsgiInstance):
+    """Requisição WSGI executada no pool 'wsgi' em vez da thread única do asgiref."""
+
+    async def run_wsgi_app(self, body):
+        run = sync_to_async(WsgiToAsgiInstance.run_wsgi_app.__wrapped__,
+                            thread_sensitive=False, executor=_executor('wsgi'))
+        await run(self, body)
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi com as requisições atendidas em paralelo (ASGI_WSGI_THREADS)."""
+
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiToAsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+wsgi_application = PooledWsgiToAsgi(flask_app)
+
+
+def _call_and_release(function, *args):
+    # As threads dos pools reaproveitam as conexões em cache (ver shards.py)
+    try:
+        return function(*args)
+    finally:
+        flask_module.shard_router.release()
+
+
+async def run_blocking(pool, function, *args):
+    """Executa ``function`` no pool informado sem bloquear o loop de eventos."""
+    if pool == 'report':
+        return await asyncio.get_running_loop().run_in_executor(_executor(pool), function, *args)
+    return await asyncio.get_running_loop().run_in_executor(_executor(pool), _call_and_release, function, *args)
+
+
+async def _ensure_database():
+    global _db_ready
+    if _db_ready is None:
+        _db_ready = asyncio.ensure_future(run_blocking('db', flask_module.init_db))
+    await _db_ready
+
+
+def _headers(scope):
+    return {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+
+
+def _session(scope):
+    """Lê a sessão assinada do Flask a partir do cookie da requisição."""
+    cookie = SimpleCookie()
+    cookie.load(_headers(scope).get('cookie', ''))
+    name = flask_app.config['SESSION_COOKIE_NAME']
+    if name not in cookie:
+        return {}
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        return serializer.loads(cookie[name].value,
+                                max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return {}
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status, 'headers': [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode()),
+    ]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_file(send, path, download_name):
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'application/pdf'),
+        (b'content-length', str(os.path.getsize(path)).encode()),
+        (b'content-disposition', f'attachment; filename={download_name}'.encode()),
+    ]})
+    with open(path, 'rb') as f:
+        while True:
+            chunk = await run_blocking('db', f.read, FILE_CHUNK_SIZE)
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': bool(chunk)})
+            if not chunk:
+                break
+
+
+async def get_user_data(scope, receive, send, user_id):
+    if 'user_id' not in _session(scope):
+        return await send_json(send, 401, {'error': 'Não autorizado'})
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    include_exercise_data = query.get('exerciseData', ['full'])[0] != 'none'
+    user_data = await run_blocking('db', flask_module.load_user_data, int(user_id), include_exercise_data)
+    if user_data is None:
+        return await send_json(send, 404, {'error': 'Usuário não encontrado'})
+    await send_json(send, 200, user_data)
+
+
+async def generate_report(scope, receive, send, user_id):
+    pdf_path = await run_blocking('report', flask_module.build_report, int(user_id))
+    if pdf_path is None:
+        return await send_json(send, 404, {'error': 'Usuário não encontrado'})
+    await send_file(send, pdf_path, os.path.basename(pdf_path))
+
+
+async def analyze_text(scope, receive, send):
+    session = _session(scope)
+    if 'user_id' not in session:
+        return await send_json(send, 401, {'error': 'Não autorizado'})
+    try:
+        data = json.loads(await _read_body(receive) or b'null')
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or not isinstance(data.get('text'), str):
+        return await send_json(send, 400, {'error': 'Dados incompletos'})
+    result = await run_blocking('analysis', flask_module.run_analysis,
+                                data['text'], session['user_id'], data.get('exerciseType'))
+    await send_json(send, 200, result)
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def user_events(scope, receive, send, user_id):
+    if 'user_id' not in _session(scope):
+        return await send_json(send, 401, {'error': 'Não autorizado'})
+
+    last_event_id = _headers(scope).get('last-event-id', '')
+    subscription = flask_module.event_bus.subscribe(
+        events.user_channel(int(user_id)),
+        int(last_event_id) if last_event_id.isdigit() else None,
+        loop=asyncio.get_running_loop()
+    )
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+        while not disconnected.done():
+            next_event = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait({next_event, disconnected},
+                                         timeout=flask_module.SSE_HEARTBEAT_SECONDS,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if next_event in done:
+                chunk = events.format_sse(next_event.result())
+            else:
+                next_event.cancel()
+                if disconnected.done():
+                    break
+                chunk = ': keep-alive\n\n'
+            await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+    finally:
+        subscription.close()
+        disconnected.cancel()
+
+
+# Rotas atendidas diretamente em modo assíncrono: (método, padrão, rótulo de métrica, handler)
+ROUTES = [
+    ('GET', re.compile(r'^/api/user/(\d+)$'), '/api/user/<int:user_id>', get_user_data),
+    ('GET', re.compile(r'^/api/user/(\d+)/events$'), '/api/user/<int:user_id>/events', user_events),
+    ('GET', re.compile(r'^/api/report/(\d+)$'), '/api/report/<int:user_id>', generate_report),
+    ('POST', re.compile(r'^/api/analyze$'), '/api/analyze', analyze_text),
+]
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                await _ensure_database()
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            for executor in _executors.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+            _executors.clear()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """Aplicação ASGI: rotas assíncronas próprias e o restante via Flask."""
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    for method, pattern, endpoint, handler in ROUTES:
+        match = pattern.match(scope['path'])
+        if match and scope['method'] == method:
+            break
+    else:
+        return await wsgi_application(scope, receive, send)
+
+    await _ensure_database()
+    start = time.perf_counter()
+    started = False
+
+    # Latência medida até o envio dos cabeçalhos (conexões SSE ficam abertas)
+    async def timed_send(message):
+        nonlocal started
+        if message['type'] == 'http.response.start':
+            started = True
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method=method, endpoint=endpoint)
+            HTTP_REQUESTS.inc(method=method, endpoint=endpoint, status=str(message['status']))
+        await send(message)
+
+    try:
+        await handler(scope, receive, timed_send, *match.groups())
+    except Exception:
+        logger.exception('Erro ao processar %s %s', method, scope['path'])
+        if not started:
+            await send_json(timed_send, 500, {'error': 'Erro interno'})
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run('asgi:application', host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Micro benchmarks do analisador de negociação (pytest-benchmark).
+
+Uso:
+    pytest benchmarks/bench_analyzer.py --benchmark-autosave
+    pytest benchmarks/bench_analyzer.py --benchmark-compare
+
+Os resultados salvos ficam em ``.benchmarks/`` e podem ser comparados entre
+commits com ``--benchmark-compare=<id>``. O backend nativo só é medido
+quando a biblioteca compartilhada estiver compilada em ``lib/``.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cpp_bridge import NegotiationProcessor  # noqa: E402
+from corpus import build_corpus  # noqa: E402
+
+CORPUS = build_corpus()
+processor = NegotiationProcessor()
+
+requires_native = pytest.mark.skipif(not processor.initialized,
+                                     reason="biblioteca C++ não compilada")
+
+
+@requires_native
+@pytest.mark.parametrize('size', list(CORPUS))
+def test_analyze_text_native(benchmark, size):
+    benchmark.group = f'analyze_text-{size}'
+    benchmark(processor.analyze_text, CORPUS[size])
+
+
+@requires_native
+@pytest.mark.parametrize('size', list(CORPUS))
+def test_detect_patterns_native(benchmark, size):
+    benchmark.group = f'detect_patterns-{size}'
+    benchmark(processor.detect_patterns, CORPUS[size])
+
+
+@pytest.mark.parametrize('size', list(CORPUS))
+def test_analyze_text_fallback(benchmark, size):
+    benchmark.group = f'analyze_text-{size}'
+    benchmark(processor._fallback_analyze_text, CORPUS[size])
+
+
+@pytest.mark.parametrize('size', list(CORPUS))
+def test_detect_patterns_fallback(benchmark, size):
+    benchmark.group = f'detect_patterns-{size}'
+    benchmark(processor._fallback_detect_patterns, CORPUS[size])
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Compara os codecs de ``exercises.data`` com o JSON em texto puro.
+
+Para cada codec grava os mesmos payloads em um banco SQLite temporário e
+mede o tamanho final do arquivo e a latência de escrita e leitura
+(incluindo codificação/decodificação).
+
+Uso:
+    python benchmarks/bench_codec.py --users 500
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from corpus import build_exercise_payloads  # noqa: E402
+import exercise_codec  # noqa: E402
+
+
+def available_codecs():
+    codecs = ['json', 'json-zlib']
+    if exercise_codec.msgpack is not None:
+        codecs.append('msgpack-zlib')
+        if exercise_codec.zstandard is not None:
+            codecs.append('msgpack-zstd')
+    return codecs
+
+
+def run_codec(codec: str, payloads, directory: str):
+    path = os.path.join(directory, f'{codec}.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE exercises (id INTEGER PRIMARY KEY, user_id INTEGER, exercise_type TEXT, data)')
+
+    start = time.perf_counter()
+    for user_id, user_payloads in enumerate(payloads, start=1):
+        for exercise_type, data in user_payloads.items():
+            conn.execute('INSERT INTO exercises (user_id, exercise_type, data) VALUES (?, ?, ?)',
+                         (user_id, exercise_type, exercise_codec.encode(data, codec)))
+        conn.commit()
+    write_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for user_id in range(1, len(payloads) + 1):
+        for (value,) in conn.execute('SELECT data FROM exercises WHERE user_id = ?', (user_id,)):
+            exercise_codec.decode(value)
+    read_seconds = time.perf_counter() - start
+
+    payload_bytes = conn.execute('SELECT SUM(LENGTH(data)) FROM exercises').fetchone()[0]
+    conn.execute('VACUUM')
+    conn.close()
+    return {
+        'size_kb': os.path.getsize(path) / 1024,
+        'payload_kb': payload_bytes / 1024,
+        'write_ms_per_user': 1000 * write_seconds / len(payloads),
+        'read_ms_per_user': 1000 * read_seconds / len(payloads),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos codecs de exercises.data')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    payloads = [build_exercise_payloads(args.seed + index) for index in range(args.users)]
+    with tempfile.TemporaryDirectory(prefix='negotiation_codec_') as directory:
+        results = {codec: run_codec(codec, payloads, directory) for codec in available_codecs()}
+
+    baseline = results['json']
+    print(f"{'codec':<16}{'arquivo KB':>12}{'vs json':>9}{'payload KB':>12}"
+          f"{'escrita ms/usuário':>20}{'leitura ms/usuário':>20}")
+    for codec, stats in results.items():
+        ratio = stats['size_kb'] / baseline['size_kb']
+        print(f"{codec:<16}{stats['size_kb']:>12.0f}{ratio:>8.0%} {stats['payload_kb']:>11.0f}"
+              f"{stats['write_ms_per_user']:>20.3f}{stats['read_ms_per_user']:>20.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Corpora determinísticos de textos de negociação em português.
+
+Os textos são montados a partir de frases típicas de e-mails, transcrições
+de reuniões e anotações pós-negociação. A mesma semente gera sempre o mesmo
+texto, de modo que resultados de benchmarks sejam comparáveis entre commits.
+
+Uso:
+    python benchmarks/corpus.py export corpus.jsonl [--count 200] [--seed 42]
+
+O arquivo exportado (um JSON por linha) é a entrada de ``test_processor
+--corpus``, o benchmark nativo definido em negotiation_processor.cpp.
+"""
+
+import json
+import random
+import argparse
+from typing import Dict, List
+
+SUBJECTS = ["Nossa empresa", "O comitê de compras", "A diretoria", "Nosso time jurídico",
+            "O fornecedor", "A equipe comercial", "Meu superior", "O cliente"]
+
+SENTENCES = [
+    "{subject} entende que a oferta inicial está acima do valor de mercado.",
+    "Precisamos de uma solução que gere benefício mútuo para ambos os lados.",
+    "{subject} não tem autorização para aprovar um desconto maior sem consultar o superior.",
+    "O prazo para aceitação é amanhã, então a decisão precisa ser imediata.",
+    "Esta é nossa oferta final e a única opção que conseguimos sustentar.",
+    "Gostaríamos de incluir um pequeno serviço adicional, além disso o frete.",
+    "Existe um risco claro de conflito se o custo continuar subindo.",
+    "Juntos podemos construir uma parceria de longo prazo com sinergia real.",
+    "Certamente é essencial garantir a qualidade exigida no contrato.",
+    "Podemos reconsiderar o volume e ajustar a flexibilidade dos pagamentos.",
+    "A referência comparável que temos aponta um valor {percent}% menor.",
+    "Entendo a situação difícil da sua família, mas precisamos de ajuda nos termos.",
+    "Vamos comparar essa alternativa com a nossa preferência inicial.",
+    "O item de suporte tem importância secundária para nós, não é prioridade.",
+    "Nossa BATNA inclui um fornecedor alternativo com entrega em {days} dias.",
+    "Houve uma perda de {percent}% na margem no último trimestre, o que gera tensão.",
+    "Propomos compartilhar o ganho de eficiência em conjunto com a sua equipe.",
+    "Não é possível melhorar o preço, mas podemos estender a garantia em {days} dias.",
+    "Precisamos de um acordo que seja vantajoso e traga sucesso para a cooperação.",
+    "O problema do atraso gerou uma disputa que precisa de uma solução rápida.",
+]
+
+FILLERS = ["Bom dia a todos.", "Conforme conversamos na última reunião,", "Obrigado pelo retorno.",
+           "Em resumo,", "Fico no aguardo.", "Sobre o ponto anterior,"]
+
+# Tamanhos aproximados (em palavras) usados pelos benchmarks
+SIZES: Dict[str, int] = {
+    'email': 120,
+    'meeting': 1500,
+    'transcript': 12000,
+}
+
+
+def build_text(word_target: int, seed: int = 42) -> str:
+    """Gera um texto com aproximadamente ``word_target`` palavras.
+
+    Args:
+        word_target: Número aproximado de palavras desejado
+        seed: Semente do gerador pseudoaleatório
+
+    Returns:
+        Texto de negociação em português
+    """
+    rng = random.Random(seed)
+    parts = []
+    words = 0
+    while words < word_target:
+        if rng.random() < 0.15:
+            sentence = rng.choice(FILLERS)
+        else:
+            sentence = rng.choice(SENTENCES).format(
+                subject=rng.choice(SUBJECTS),
+                percent=rng.randint(3, 40),
+                days=rng.choice([15, 30, 45, 60, 90]))
+        parts.append(sentence)
+        words += len(sentence.split())
+        if rng.random() < 0.2:
+            parts.append('\n\n')
+    return ' '.join(parts)
+
+
+def build_corpus(seed: int = 42) -> Dict[str, str]:
+    """Retorna um texto para cada tamanho definido em ``SIZES``."""
+    return {name: build_text(size, seed) for name, size in SIZES.items()}
+
+
+def build_documents(count: int = 200, seed: int = 42) -> List[Dict[str, str]]:
+    """Gera ``count`` documentos com os tamanhos de ``SIZES`` sorteados."""
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(count):
+        name = rng.choice(list(SIZES))
+        documents.append({'name': name, 'text': build_text(SIZES[name], rng.randint(0, 10 ** 6))})
+    return documents
+
+
+def build_exercise_payloads(seed: int = 42) -> Dict[str, dict]:
+    """Gera payloads realistas para a coluna ``exercises.data``."""
+    rng = random.Random(seed)
+    return {
+        'batna': {
+            'alternativas': [build_text(40, rng.randint(0, 10 ** 6)) for _ in range(5)],
+            'valor_reserva': rng.randint(10000, 90000),
+            'zopa': {'min': rng.randint(1000, 5000), 'max': rng.randint(6000, 20000)},
+        },
+        'email': {'rascunho': build_text(350, rng.randint(0, 10 ** 6)), 'assunto': 'Proposta revisada'},
+        'gravacao': {'transcricao': build_text(1500, rng.randint(0, 10 ** 6))},
+        'pos': {'notas': build_text(250, rng.randint(0, 10 ** 6)), 'nota_final': rng.randint(1, 10)},
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Corpora de textos para os benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='grava documentos em JSON Lines')
+    export_parser.add_argument('output')
+    export_parser.add_argument('--count', type=int, default=200)
+    export_parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    documents = build_documents(args.count, args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        for document in documents:
+            f.write(json.dumps(document, ensure_ascii=False) + '\n')
+    print(f'{len(documents)} documentos gravados em {args.output}')
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Gerador de carga local para a API Flask.
+
+Cria um banco SQLite temporário com N usuários, sobe a aplicação em um
+servidor local e dispara requisições concorrentes que imitam o uso do
+frontend (leitura do painel e atualizações de progresso). Ao final imprime
+throughput e latências p50/p90/p99 por operação.
+
+Uso:
+    python benchmarks/load_test.py --users 200 --requests 5000 --output atual.json
+    python benchmarks/load_test.py --users 200 --requests 5000 --compare atual.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.cookiejar
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from corpus import build_exercise_payloads  # noqa: E402
+import exercise_codec  # noqa: E402
+
+EXERCISE_TYPES = ['batna', 'meso', 'concessoes', 'spin', 'ancora', 'email', 'gravacao', 'taticas', 'framing', 'pos']
+PASSWORD = 'senha-benchmark'
+
+# Proporção de cada operação no cenário padrão
+SCENARIO = [
+    ('get_user', 0.5),
+    ('update_exercise', 0.3),
+    ('update_training_day', 0.2),
+]
+
+
+def seed_database(app_module, users: int, seed: int):
+    """Cria ``users`` usuários com exercícios e dias de treinamento."""
+    import bcrypt
+
+    rng = random.Random(seed)
+    payloads = build_exercise_payloads(seed)
+    # Custo reduzido apenas para acelerar a criação da base de teste
+    hashed = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds=4))
+
+    app_module.init_db()
+    conn = app_module.get_db_connection()
+    for index in range(users):
+        user_id = conn.execute('INSERT INTO users (name, email, password) VALUES (?, ?, ?)',
+                               (f'Usuário {index}', f'user{index}@benchmark.local', hashed)).lastrowid
+        conn.commit()
+        shard = app_module.get_user_db_connection(user_id)
+        cursor = shard.cursor()
+        for exercise_type in EXERCISE_TYPES:
+            data = payloads.get(exercise_type, {}) if rng.random() < 0.7 else {}
+            cursor.execute(
+                'INSERT INTO exercises (user_id, exercise_type, data) VALUES (?, ?, ?)',
+                (user_id, exercise_type, exercise_codec.encode(data))
+            )
+        for day in range(1, 15):
+            cursor.execute('INSERT INTO training_days (user_id, day_number) VALUES (?, ?)', (user_id, day))
+        for _ in range(rng.randint(0, 30)):
+            cursor.execute(
+                'INSERT INTO activity_history (user_id, title, activity_type, duration) VALUES (?, ?, ?, ?)',
+                (user_id, 'Concluiu: Exercício', 'exercise', rng.randint(1, 60))
+            )
+        shard.commit()
+        shard.close()
+    conn.close()
+
+
+def start_server(flask_app):
+    """Sobe a aplicação em uma porta livre e retorna a URL base."""
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def _request(opener, method: str, url: str, body=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    try:
+        with opener.open(req) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def run_worker(base_url: str, worker_id: int, users: int, requests: int, seed: int) -> List[tuple]:
+    """Executa ``requests`` operações como um usuário autenticado."""
+    rng = random.Random(seed + worker_id)
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    user_index = worker_id % users
+    user_id = user_index + 1
+    results = []
+
+    start = time.perf_counter()
+    status = _request(opener, 'POST', f'{base_url}/api/login',
+                      {'email': f'user{user_index}@benchmark.local', 'password': PASSWORD})
+    results.append(('login', time.perf_counter() - start, status))
+
+    operations, weights = zip(*SCENARIO)
+    for _ in range(requests):
+        operation = rng.choices(operations, weights)[0]
+        start = time.perf_counter()
+        if operation == 'get_user':
+            status = _request(opener, 'GET', f'{base_url}/api/user/{user_id}')
+        elif operation == 'update_exercise':
+            exercise_type = rng.choice(EXERCISE_TYPES)
+            status = _request(opener, 'PUT', f'{base_url}/api/exercise/{user_id}/{exercise_type}',
+                              {'status': 'in-progress', 'timeSpent': 1, 'data': {'nota': 'x' * rng.randint(10, 500)}})
+        else:
+            status = _request(opener, 'PUT', f'{base_url}/api/training-day/{user_id}/{rng.randint(1, 14)}',
+                              {'status': 'in-progress', 'timeSpent': 1})
+        results.append((operation, time.perf_counter() - start, status))
+    return results
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentil pelo método nearest-rank (valores já ordenados)."""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+
+def summarize(results: List[tuple], elapsed: float) -> Dict[str, dict]:
+    by_operation: Dict[str, List[tuple]] = {}
+    for operation, latency, status in results:
+        by_operation.setdefault(operation, []).append((latency, status))
+    by_operation['total'] = [(latency, status) for operation, latency, status in results if operation != 'login']
+
+    summary = {}
+    for operation, samples in by_operation.items():
+        latencies = sorted(latency for latency, _ in samples)
+        summary[operation] = {
+            'count': len(samples),
+            'errors': sum(1 for _, status in samples if status >= 400),
+            'throughput_rps': len(samples) / elapsed if elapsed > 0 else 0.0,
+            'mean_ms': 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            'p50_ms': 1000 * percentile(latencies, 0.50),
+            'p90_ms': 1000 * percentile(latencies, 0.90),
+            'p99_ms': 1000 * percentile(latencies, 0.99),
+        }
+    return summary
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecido'
+
+
+def print_summary(summary: Dict[str, dict], baseline: Dict[str, dict] = None):
+    header = f"{'operação':<22}{'req':>8}{'erros':>7}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print('-' * len(header))
+    for operation, stats in summary.items():
+        print(f"{operation:<22}{stats['count']:>8}{stats['errors']:>7}{stats['throughput_rps']:>10.1f}"
+              f"{stats['p50_ms']:>10.2f}{stats['p90_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+        if baseline and operation in baseline:
+            old = baseline[operation]
+            deltas = []
+            for key in ('throughput_rps', 'p50_ms', 'p99_ms'):
+                if old[key]:
+                    deltas.append(f"{key} {100 * (stats[key] - old[key]) / old[key]:+.1f}%")
+            print(f"{'':<22}vs. base: {', '.join(deltas)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga local da API de treinamento')
+    parser.add_argument('--users', type=int, default=50, help='usuários criados na base de teste')
+    parser.add_argument('--requests', type=int, default=2000, help='total de requisições')
+    parser.add_argument('--concurrency', type=int, default=16, help='clientes simultâneos')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='arquivo JSON para salvar os resultados')
+    parser.add_argument('--compare', help='arquivo JSON de uma execução anterior para comparação')
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='negotiation_bench_')
+    os.environ['DATA_DIR'] = data_dir
+    import app as app_module
+
+    seed_database(app_module, args.users, args.seed)
+    server, base_url = start_server(app_module.app)
+
+    per_worker = max(1, args.requests // args.concurrency)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(run_worker, base_url, worker_id, args.users, per_worker, args.seed)
+                   for worker_id in range(args.concurrency)]
+        results = [sample for future in futures for sample in future.result()]
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    summary = summarize(results, elapsed)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['summary']
+    print_summary(summary, baseline)
+
+    if args.output:
+        report = {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'parameters': vars(args),
+            'elapsed_seconds': elapsed,
+            'summary': summary,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,9 +4,19 @@
 import os
 import sys
 import json
+import time
 import ctypes
+import logging
+import threading
 from ctypes import c_char_p
-from typing import Dict, List, Union, Optional, Any
+from typing import Callable, Dict, List, Union, Optional, Any
+
+import profiling
+import lexicon
+import patterns
+from metrics import NATIVE_CALL_DURATION, NATIVE_CALL_ERRORS
+
+logger = logging.getLogger(__name__)
 
 # Definir o caminho para a biblioteca compartilhada
 LIB_PATH = os.path.join(os.path.dirname(__file__), 'lib', 'negotiation_processor')
@@ -19,6 +29,13 @@ elif sys.platform.startswith('darwin'):
 else:  # Linux e outros sistemas Unix
     LIB_PATH += '.so'
 
+# Intervalo mínimo entre verificações de um novo léxico compilado (segundos)
+LEXICON_CHECK_SECONDS = 5
+
+# Versão das regras de análise; altere ao mudar a pontuação (nativa e fallback),
+# pois os resultados armazenados são identificados por ela e pelo léxico
+ANALYZER_VERSION = '2'
+
 # Classe para gerenciar a interface com o módulo C++
 class NegotiationProcessor:
     _instance = None
@@ -38,11 +55,16 @@ class NegotiationProcessor:
             # Configurar os tipos de retorno e argumentos para as funções C++
             self._setup_functions()
             self.initialized = True
-            print(f"Módulo C++ carregado com sucesso: {LIB_PATH}")
+            logger.info("Módulo C++ carregado com sucesso: %s", LIB_PATH)
         except Exception as e:
             self.initialized = False
-            print(f"Erro ao carregar o módulo C++: {e}")
-            print("Usando implementação de fallback em Python")
+            logger.warning("Erro ao carregar o módulo C++: %s. Usando implementação de fallback em Python", e)
+        
+        self.lexicon = lexicon.Lexicon.builtin()
+        self._lexicon_mtime = None
+        self._lexicon_checked_at = 0.0
+        self._lexicon_lock = threading.Lock()
+        self._refresh_lexicon()
     
     def _setup_functions(self):
         """Configura os tipos de retorno e argumentos para as funções C++."""
@@ -53,6 +75,10 @@ class NegotiationProcessor:
         self.lib.analyze_negotiation_text.restype = c_char_p
         self.lib.analyze_negotiation_text.argtypes = [c_char_p]
         
+        # Função para carregar o léxico compilado
+        self.lib.load_lexicon.restype = c_char_p
+        self.lib.load_lexicon.argtypes = [c_char_p]
+        
         # Funções para cronômetro
         self.lib.start_exercise_timer.restype = c_char_p
         self.lib.start_exercise_timer.argtypes = [c_char_p]
@@ -68,6 +94,75 @@ class NegotiationProcessor:
         self.lib.get_performance_stats.restype = c_char_p
         self.lib.get_performance_stats.argtypes = [c_char_p]
     
+    def _call(self, function: str, native_call: Callable[[], bytes],
+              fallback_call: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Executa uma função do módulo C++, recorrendo ao fallback em caso de erro.
+        
+        O tempo de cada chamada é registrado por função e backend
+        (``native`` ou ``fallback``) nas métricas da aplicação e no perfil
+        da requisição em andamento, se houver.
+        """
+        if self.initialized:
+            start = time.perf_counter()
+            try:
+                result = native_call()
+                return json.loads(result.decode('utf-8'))
+            except Exception:
+                NATIVE_CALL_ERRORS.inc(function=function)
+                logger.exception("Erro na chamada nativa %s, usando fallback", function)
+            finally:
+                self._record_timing(function, 'native', time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        try:
+            return fallback_call()
+        finally:
+            self._record_timing(function, 'fallback', time.perf_counter() - start)
+    
+    def _refresh_lexicon(self):
+        """Recarrega o léxico compilado quando o arquivo é substituído.
+        
+        O módulo C++ troca o léxico atomicamente; análises em andamento
+        terminam com a versão anterior.
+        """
+        now = time.monotonic()
+        if now - self._lexicon_checked_at < LEXICON_CHECK_SECONDS:
+            return
+        with self._lexicon_lock:
+            if now - self._lexicon_checked_at < LEXICON_CHECK_SECONDS:
+                return
+            self._lexicon_checked_at = now
+            try:
+                mtime = os.stat(lexicon.DEFAULT_PATH).st_mtime_ns
+            except OSError:
+                return
+            if mtime == self._lexicon_mtime:
+                return
+            # Só adotar o novo léxico (e a nova versão) se as duas cargas funcionarem;
+            # após uma falha a carga é tentada de novo na próxima verificação
+            try:
+                loaded = lexicon.Lexicon.from_file(lexicon.DEFAULT_PATH)
+                if self.initialized:
+                    result = json.loads(self.lib.load_lexicon(lexicon.DEFAULT_PATH.encode('utf-8')).decode('utf-8'))
+                    if result.get('error'):
+                        raise ValueError(result['message'])
+            except Exception:
+                logger.exception("Erro ao carregar o léxico %s", lexicon.DEFAULT_PATH)
+                return
+            self.lexicon = loaded
+            self._lexicon_mtime = mtime
+            logger.info("Léxico carregado: %s (%d entradas)", lexicon.DEFAULT_PATH, len(loaded))
+    
+    def analyzer_version(self) -> str:
+        """Identifica as regras e o léxico em uso (resultados iguais para versões iguais)."""
+        self._refresh_lexicon()
+        return f"{ANALYZER_VERSION}+{self.lexicon.digest[:12]}"
+    
+    @staticmethod
+    def _record_timing(function: str, backend: str, elapsed: float):
+        NATIVE_CALL_DURATION.observe(elapsed, function=function, backend=backend)
+        profiling.record_span(function, backend, elapsed)
+    
     def analyze_text(self, text: str) -> Dict[str, Any]:
         """Analisa um texto de negociação e retorna métricas.
         
@@ -77,15 +172,10 @@ class NegotiationProcessor:
         Returns:
             Dicionário com métricas de análise do texto
         """
-        if not self.initialized:
-            return self._fallback_analyze_text(text)
-        
-        try:
-            result = self.lib.analyze_negotiation_text(text.encode('utf-8'))
-            return json.loads(result.decode('utf-8'))
-        except Exception as e:
-            print(f"Erro na análise de texto: {e}")
-            return self._fallback_analyze_text(text)
+        self._refresh_lexicon()
+        return self._call('analyze_text',
+                          lambda: self.lib.analyze_negotiation_text(text.encode('utf-8')),
+                          lambda: self._fallback_analyze_text(text))
     
     def start_timer(self, exercise_id: str) -> Dict[str, Any]:
         """Inicia um cronômetro para um exercício.
@@ -96,15 +186,9 @@ class NegotiationProcessor:
         Returns:
             Dicionário com status do cronômetro
         """
-        if not self.initialized:
-            return self._fallback_start_timer(exercise_id)
-        
-        try:
-            result = self.lib.start_exercise_timer(exercise_id.encode('utf-8'))
-            return json.loads(result.decode('utf-8'))
-        except Exception as e:
-            print(f"Erro ao iniciar cronômetro: {e}")
-            return self._fallback_start_timer(exercise_id)
+        return self._call('start_timer',
+                          lambda: self.lib.start_exercise_timer(exercise_id.encode('utf-8')),
+                          lambda: self._fallback_start_timer(exercise_id))
     
     def stop_timer(self) -> Dict[str, Any]:
         """Para o cronômetro atual e retorna o tempo decorrido.
@@ -112,15 +196,9 @@ class NegotiationProcessor:
         Returns:
             Dicionário com tempo decorrido e status
         """
-        if not self.initialized:
-            return self._fallback_stop_timer()
-        
-        try:
-            result = self.lib.stop_exercise_timer()
-            return json.loads(result.decode('utf-8'))
-        except Exception as e:
-            print(f"Erro ao parar cronômetro: {e}")
-            return self._fallback_stop_timer()
+        return self._call('stop_timer',
+                          lambda: self.lib.stop_exercise_timer(),
+                          self._fallback_stop_timer)
     
     def detect_patterns(self, text: str) -> Dict[str, Any]:
         """Detecta padrões de negociação em um texto.
@@ -131,15 +209,9 @@ class NegotiationProcessor:
         Returns:
             Dicionário com padrões detectados e pontuações
         """
-        if not self.initialized:
-            return self._fallback_detect_patterns(text)
-        
-        try:
-            result = self.lib.detect_negotiation_patterns(text.encode('utf-8'))
-            return json.loads(result.decode('utf-8'))
-        except Exception as e:
-            print(f"Erro na detecção de padrões: {e}")
-            return self._fallback_detect_patterns(text)
+        return self._call('detect_patterns',
+                          lambda: self.lib.detect_negotiation_patterns(text.encode('utf-8')),
+                          lambda: self._fallback_detect_patterns(text))
     
     def get_performance_stats(self, exercise_id: Optional[str] = None) -> Dict[str, Any]:
         """Obtém estatísticas de performance para um exercício ou todos.
@@ -150,52 +222,32 @@ class NegotiationProcessor:
         Returns:
             Dicionário com estatísticas de performance
         """
-        if not self.initialized:
-            return self._fallback_get_performance_stats(exercise_id)
-        
-        try:
-            if exercise_id:
-                result = self.lib.get_performance_stats(exercise_id.encode('utf-8'))
-            else:
-                result = self.lib.get_performance_stats(None)
-            
-            return json.loads(result.decode('utf-8'))
-        except Exception as e:
-            print(f"Erro ao obter estatísticas: {e}")
-            return self._fallback_get_performance_stats(exercise_id)
+        return self._call('get_performance_stats',
+                          lambda: self.lib.get_performance_stats(
+                              exercise_id.encode('utf-8') if exercise_id else None),
+                          lambda: self._fallback_get_performance_stats(exercise_id))
     
     # Implementações de fallback em Python puro para quando o módulo C++ não está disponível
     
     def _fallback_analyze_text(self, text: str) -> Dict[str, Any]:
-        """Implementação de fallback para análise de texto."""
-        import re
-        from collections import Counter
-        
-        # Listas simplificadas de palavras
-        positive_words = ["acordo", "benefício", "colaboração", "ganho", "oportunidade", 
-                         "parceria", "solução", "sucesso", "vantagem", "valor"]
-        
-        negative_words = ["conflito", "custo", "desvantagem", "disputa", "falha", 
-                         "perda", "problema", "risco", "ruptura", "tensão"]
-        
-        power_words = ["certamente", "claramente", "definitivamente", "essencial", "exatamente", 
-                      "garantido", "imperativo", "necessário", "precisamente", "vital"]
+        """Implementação de fallback para análise de texto (mesmo léxico e tokenizador do módulo C++)."""
+        active = self.lexicon
+        counts = dict.fromkeys(lexicon.CATEGORIES, 0)
+        weights = dict.fromkeys(lexicon.CATEGORIES, 0.0)
         
-        collaborative_words = ["ambos", "compartilhar", "conjunto", "cooperação", "equipe", 
-                             "juntos", "mútuo", "parceria", "reciprocidade", "sinergia"]
-        
-        # Normalizar texto
-        normalized_text = text.lower()
-        
-        # Contar palavras
-        words = re.findall(r'\b\w+\b', normalized_text)
+        # Contar palavras e ocorrências
+        words = lexicon.tokenize(text)
         word_count = len(words)
+        for word in words:
+            for category, weight in active.lookup(word):
+                if category in counts:
+                    counts[category] += 1
+                    weights[category] += weight
         
-        # Contar ocorrências
-        positive_count = sum(1 for word in words if word in positive_words)
-        negative_count = sum(1 for word in words if word in negative_words)
-        power_count = sum(1 for word in words if word in power_words)
-        collaborative_count = sum(1 for word in words if word in collaborative_words)
+        positive_count = counts['positive']
+        negative_count = counts['negative']
+        power_count = counts['power']
+        collaborative_count = counts['collaborative']
         
         # Calcular percentuais
         positive_ratio = positive_count / word_count if word_count > 0 else 0
@@ -203,14 +255,16 @@ class NegotiationProcessor:
         power_ratio = power_count / word_count if word_count > 0 else 0
         collaborative_ratio = collaborative_count / word_count if word_count > 0 else 0
         
-        # Calcular pontuações
+        # Calcular pontuações, ponderadas pelos pesos do léxico
         tone_score = 0
-        if positive_count + negative_count > 0:
-            tone_score = (positive_count - negative_count) / (positive_count + negative_count)
+        if weights['positive'] + weights['negative'] > 0:
+            tone_score = ((weights['positive'] - weights['negative'])
+                          / (weights['positive'] + weights['negative']))
         
         style_score = 0
-        if power_count + collaborative_count > 0:
-            style_score = (collaborative_count - power_count) / (power_count + collaborative_count)
+        if weights['power'] + weights['collaborative'] > 0:
+            style_score = ((weights['collaborative'] - weights['power'])
+                           / (weights['power'] + weights['collaborative']))
         
         return {
             "word_count": word_count,
@@ -225,6 +279,10 @@ class NegotiationProcessor:
                 "collaborative_ratio": collaborative_ratio,
                 "tone_score": tone_score,
                 "style_score": style_score
+            },
+            "lexicon": {
+                "source": active.source,
+                "entries": len(active)
             }
         }
     
@@ -267,52 +325,8 @@ class NegotiationProcessor:
         return result
     
     def _fallback_detect_patterns(self, text: str) -> Dict[str, Any]:
-        """Implementação de fallback para detecção de padrões."""
-        # Padrões simplificados
-        patterns = {
-            "anchoring": ["inicial", "oferta", "valor", "mercado", "comparável", "referência"],
-            "nibbling": ["adicional", "pequeno", "mais um", "também", "incluir", "além disso"],
-            "deadline_pressure": ["prazo", "tempo", "urgente", "amanhã", "hoje", "imediato"],
-            "limited_authority": ["autorização", "superior", "consultar", "permissão", "limitado"],
-            "take_it_or_leave_it": ["final", "última", "melhor", "impossível", "única", "opção"]
-        }
-        
-        # Descrições dos padrões
-        descriptions = {
-            "anchoring": "Uso de âncora inicial extrema para influenciar percepção de valor",
-            "nibbling": "Pedidos pequenos adicionais após acordo principal",
-            "deadline_pressure": "Uso de prazos para forçar concessões",
-            "limited_authority": "Alegação de autoridade limitada para decisão",
-            "take_it_or_leave_it": "Apresentação de proposta final sem negociação"
-        }
-        
-        # Normalizar texto
-        normalized_text = text.lower()
-        
-        # Calcular pontuações
-        scores = {}
-        for pattern_id, keywords in patterns.items():
-            count = sum(1 for keyword in keywords if keyword in normalized_text)
-            score = count / len(keywords) if keywords else 0
-            scores[pattern_id] = score
-        
-        # Detectar padrões com pontuação > 0.3
-        detected = []
-        for pattern_id, score in scores.items():
-            if score > 0.3:
-                detected.append({
-                    "pattern_id": pattern_id,
-                    "description": descriptions.get(pattern_id, "Padrão desconhecido"),
-                    "confidence": score
-                })
-        
-        # Ordenar por confiança
-        detected.sort(key=lambda x: x["confidence"], reverse=True)
-        
-        return {
-            "detected_patterns": detected,
-            "all_scores": scores
-        }
+        """Implementação de fallback para detecção de padrões (mesmas regras do módulo C++)."""
+        return patterns.analyze_patterns(text)
     
     def _fallback_get_performance_stats(self, exercise_id: Optional[str] = None) -> Dict[str, Any]:
         """Implementação de fallback para estatísticas de performance."""
@@ -343,41 +357,5 @@ class NegotiationProcessor:
 # Instância global para uso em toda a aplicação
 negotiation_processor = NegotiationProcessor()
 
-# Função para teste
-def test_processor():
-    """Testa as funcionalidades do processador de negociação."""
-    processor = NegotiationProcessor()
-    
-    # Testar análise de texto
-    text = """Estamos buscando uma parceria que traga benefícios mútuos. 
-    Nossa oferta inicial é competitiva com o mercado, mas estamos abertos a 
-    negociar para chegar a um acordo que seja vantajoso para ambas as partes."""
-    
-    print("\nTestando análise de texto...")
-    result = processor.analyze_text(text)
-    print(json.dumps(result, indent=2, ensure_ascii=False))
-    
-    # Testar cronômetro
-    print("\nTestando cronômetro...")
-    start_result = processor.start_timer("batna")
-    print("Cronômetro iniciado:", json.dumps(start_result, indent=2))
-    
-    # Simular algum processamento
-    import time
-    time.sleep(1.5)
-    
-    stop_result = processor.stop_timer()
-    print("Cronômetro parado:", json.dumps(stop_result, indent=2))
-    
-    # Testar detecção de padrões
-    print("\nTestando detecção de padrões...")
-    pattern_text = """Esta é nossa oferta final. O prazo para aceitação é 
-    amanhã ao meio-dia. Não podemos melhorar os termos, pois precisamos 
-    de autorização do comitê para qualquer alteração adicional."""
-    
-    pattern_result = processor.detect_patterns(pattern_text)
-    print(json.dumps(pattern_result, indent=2, ensure_ascii=False))
-
-# Executar teste se o script for executado diretamente
-if __name__ == "__main__":
-    test_processor()
+# Para medir o analisador use os benchmarks (pytest benchmarks/bench_analyzer.py)
+# ou o executável test_processor compilado pelo CMakeLists.txt
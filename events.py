@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Pub/sub de eventos de progresso para o canal Server-Sent Events.
+
+Por padrão os eventos circulam apenas dentro do processo. Com
+``EVENT_BROKER_URL=redis://...`` (e o pacote ``redis`` instalado) eles são
+publicados em um broker local, de modo que todos os workers recebam as
+alterações feitas por qualquer um deles.
+"""
+
+import os
+import json
+import time
+import queue
+import asyncio
+import logging
+import threading
+import itertools
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Eventos pendentes por assinante antes de ele ser considerado atrasado
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Eventos recentes guardados por canal para reconexões (Last-Event-ID)
+REPLAY_BUFFER_SIZE = 64
+
+# Espera entre tentativas de reconexão ao broker (dobra a cada falha, em segundos)
+BROKER_RETRY_SECONDS = 0.5
+BROKER_MAX_RETRY_SECONDS = 30.0
+
+
+class Subscription:
+    """Fila de eventos de um assinante de um canal."""
+
+    def __init__(self, bus: 'EventBus', channel: str):
+        self.bus = bus
+        self.channel = channel
+        self.queue: 'queue.Queue[Dict[str, Any]]' = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, event: Dict[str, Any]):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Assinante lento: descartar a fila e pedir ressincronização completa
+            with self.queue.mutex:
+                self.queue.queue.clear()
+            self.queue.put_nowait({'id': event['id'], 'type': 'resync', 'data': {}})
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Aguarda o próximo evento; retorna None se o tempo esgotar."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class AsyncSubscription(Subscription):
+    """Assinatura consumida por uma corrotina (modo ASGI).
+
+    Os eventos publicados por threads são entregues ao loop de eventos com
+    ``call_soon_threadsafe``, sem ocupar uma thread por conexão.
+    """
+
+    def __init__(self, bus: 'EventBus', channel: str, loop: asyncio.AbstractEventLoop):
+        self.bus = bus
+        self.channel = channel
+        self.loop = loop
+        self.queue: 'asyncio.Queue[Dict[str, Any]]' = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, event: Dict[str, Any]):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event: Dict[str, Any]):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'id': event['id'], 'type': 'resync', 'data': {}})
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Aguarda o próximo evento; retorna None se o tempo esgotar."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBus:
+    """Pub/sub em memória, com canais independentes (um por usuário)."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Subscription]] = {}
+        self._recent: Dict[str, deque] = {}
+        self._evicted: Dict[str, int] = {}
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str, last_event_id: Optional[int] = None,
+                  loop: Optional[asyncio.AbstractEventLoop] = None) -> Subscription:
+        """Assina um canal, reenviando os eventos posteriores a ``last_event_id``.
+
+        Com ``loop`` informado a assinatura é assíncrona (``await get()``).
+        """
+        subscription = AsyncSubscription(self, channel, loop) if loop else Subscription(self, channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(subscription)
+            if last_event_id is not None:
+                self._replay(subscription, last_event_id)
+        return subscription
+
+    def _replay(self, subscription: Subscription, last_event_id: int):
+        """Reenvia os eventos do buffer posteriores a ``last_event_id`` (com o lock)."""
+        recent = self._recent.get(subscription.channel, ())
+        if last_event_id > self._last_id:
+            # Id emitido antes de o processo reiniciar (os ids recomeçam do 1)
+            subscription.put({'id': self._last_id, 'type': 'resync', 'data': {}})
+        elif last_event_id < self._evicted.get(subscription.channel, 0):
+            # Parte dos eventos perdidos já saiu do buffer
+            subscription.put({'id': recent[-1]['id'], 'type': 'resync', 'data': {}})
+        else:
+            for event in recent:
+                if event['id'] > last_event_id:
+                    subscription.put(event)
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.channel, None)
+
+    def publish(self, channel: str, event_type: str, data: Dict[str, Any]):
+        """Publica um evento para todos os assinantes do canal."""
+        self._deliver(channel, event_type, data)
+
+    def _deliver(self, channel: str, event_type: str, data: Dict[str, Any], event_id: Optional[int] = None):
+        with self._lock:
+            event = {'id': next(self._ids) if event_id is None else event_id, 'type': event_type, 'data': data}
+            self._last_id = max(self._last_id, event['id'])
+            recent = self._recent.setdefault(channel, deque(maxlen=REPLAY_BUFFER_SIZE))
+            if len(recent) == recent.maxlen:
+                self._evicted[channel] = recent[0]['id']
+            recent.append(event)
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+class RedisEventBus(EventBus):
+    """Distribui os eventos entre processos via pub/sub do Redis.
+
+    A publicação vai para o broker; uma thread em segundo plano recebe as
+    mensagens de todos os processos e as entrega aos assinantes locais.
+    Os ids são sequenciais por canal e gerados no próprio broker, de modo
+    que o ``Last-Event-ID`` vale em qualquer worker após uma reconexão. Se
+    a conexão com o broker cair, a thread reconecta com espera crescente e
+    pede ressincronização aos assinantes locais.
+    """
+
+    CHANNEL_PREFIX = 'negotiation:events:'
+    ID_PREFIX = 'negotiation:event-ids:'
+
+    # Numera e publica em um único passo atômico: a ordem de entrega segue os ids
+    PUBLISH_SCRIPT = """
+    local id = redis.call('INCR', KEYS[1])
+    redis.call('PUBLISH', KEYS[2], '{"id": ' .. id .. ', ' .. string.sub(ARGV[1], 2))
+    return id
+    """
+
+    def __init__(self, url: str):
+        import redis
+
+        super().__init__()
+        self._redis = redis.Redis.from_url(url)
+        self._publish_script = self._redis.register_script(self.PUBLISH_SCRIPT)
+        self._pubsub = self._subscribe_broker()
+        self._thread = threading.Thread(target=self._listen, name='event-bus-listener', daemon=True)
+        self._thread.start()
+
+    def publish(self, channel: str, event_type: str, data: Dict[str, Any]):
+        message = json.dumps({'type': event_type, 'data': data})
+        self._publish_script(keys=[f'{self.ID_PREFIX}{channel}', f'{self.CHANNEL_PREFIX}{channel}'], args=[message])
+
+    def _replay(self, subscription: Subscription, last_event_id: int):
+        # Ids contíguos por canal: qualquer lacuna antes do buffer indica eventos
+        # perdidos, inclusive quando este worker ainda não recebeu nenhum evento
+        recent = self._recent.get(subscription.channel, ())
+        if recent and recent[-1]['id'] <= last_event_id:
+            return
+        if not recent or recent[0]['id'] > last_event_id + 1:
+            resync_id = recent[-1]['id'] if recent else last_event_id
+            subscription.put({'id': resync_id, 'type': 'resync', 'data': {}})
+            return
+        for event in recent:
+            if event['id'] > last_event_id:
+                subscription.put(event)
+
+    def _subscribe_broker(self):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(f'{self.CHANNEL_PREFIX}*')
+        return pubsub
+
+    def _listen(self):
+        retry = BROKER_RETRY_SECONDS
+        while True:
+            try:
+                for message in self._pubsub.listen():
+                    retry = BROKER_RETRY_SECONDS
+                    self._receive(message)
+            except Exception:
+                logger.exception('Conexão com o broker de eventos perdida; nova tentativa em %.1fs', retry)
+            self._reconnect(retry)
+            retry = min(retry * 2, BROKER_MAX_RETRY_SECONDS)
+
+    def _reconnect(self, retry: float):
+        """Assina o broker novamente e pede ressincronização aos assinantes locais."""
+        try:
+            self._pubsub.close()
+        except Exception:
+            pass
+        while True:
+            time.sleep(retry)
+            try:
+                self._pubsub = self._subscribe_broker()
+                break
+            except Exception:
+                retry = min(retry * 2, BROKER_MAX_RETRY_SECONDS)
+                logger.warning('Broker de eventos indisponível; nova tentativa em %.1fs', retry)
+        # Eventos publicados enquanto a conexão estava caída não chegaram a este
+        # processo: o buffer de reenvio deixa de ser contíguo e é descartado
+        with self._lock:
+            resyncs = []
+            for channel, subscribers in self._subscribers.items():
+                recent = self._recent.get(channel)
+                event = {'id': recent[-1]['id'] if recent else 0, 'type': 'resync', 'data': {}}
+                resyncs.extend((subscription, event) for subscription in subscribers)
+            self._recent.clear()
+            self._evicted.clear()
+        for subscription, event in resyncs:
+            subscription.put(event)
+        logger.info('Reconectado ao broker de eventos')
+
+    def _receive(self, message: Dict[str, Any]):
+        try:
+            channel = message['channel'].decode('utf-8')[len(self.CHANNEL_PREFIX):]
+            payload = json.loads(message['data'])
+            self._deliver(channel, payload['type'], payload['data'], int(payload['id']))
+        except Exception:
+            logger.exception('Mensagem inválida recebida do broker de eventos')
+
+
+def create_event_bus() -> EventBus:
+    """Cria o barramento conforme ``EVENT_BROKER_URL`` (em memória se ausente)."""
+    url = os.environ.get('EVENT_BROKER_URL')
+    if url and url.startswith('redis://'):
+        return RedisEventBus(url)
+    if url:
+        logger.warning('EVENT_BROKER_URL não suportado (%s), usando barramento em memória', url)
+    return EventBus()
+
+
+def user_channel(user_id: int) -> str:
+    return f'user:{user_id}'
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Formata um evento no protocolo text/event-stream."""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Codificação compacta do payload ``exercises.data``.
+
+Com os codecs compactos o payload é gravado como BLOB cujo primeiro byte
+indica o formato:
+
+    0x01  MessagePack sem compressão (payloads pequenos)
+    0x02  MessagePack + zlib
+    0x03  MessagePack + zstd
+    0x04  JSON + zlib (quando o msgpack não está instalado)
+
+Valores TEXT (JSON puro) continuam sendo lidos normalmente. O codec de
+escrita é escolhido por ``EXERCISE_DATA_CODEC``: ``json`` (padrão: texto
+puro, em que ``dataPatch``/``dataSet`` são aplicados pelas funções JSON1 do
+SQLite sem ler o payload), ``auto`` (o melhor codec compacto disponível),
+``msgpack-zstd``, ``msgpack-zlib`` ou ``json-zlib``. Os codecs compactos
+reduzem o banco, mas cada atualização parcial passa a decodificar, alterar e
+regravar o payload dentro de uma transação ``BEGIN IMMEDIATE``; use-os quando
+o tamanho do banco pesar mais que a latência de escrita. Ao trocar de codec,
+rode ``migrate`` para regravar as linhas existentes no novo formato.
+
+Uso:
+    python exercise_codec.py migrate
+"""
+
+import os
+import sys
+import re
+import json
+import zlib
+import threading
+from typing import Any, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependência opcional
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependência opcional
+    zstandard = None
+
+FORMAT_MSGPACK = 0x01
+FORMAT_MSGPACK_ZLIB = 0x02
+FORMAT_MSGPACK_ZSTD = 0x03
+FORMAT_JSON_ZLIB = 0x04
+
+# Payloads menores que isso não compensam a compressão
+COMPRESS_MIN_BYTES = 256
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _resolve_codec(name: str) -> str:
+    if name == 'auto':
+        if msgpack is None:
+            return 'json-zlib'
+        return 'msgpack-zstd' if zstandard is not None else 'msgpack-zlib'
+    if name.startswith('msgpack') and msgpack is None:
+        raise RuntimeError('EXERCISE_DATA_CODEC requer o pacote msgpack')
+    if name == 'msgpack-zstd' and zstandard is None:
+        raise RuntimeError('EXERCISE_DATA_CODEC requer o pacote zstandard')
+    if name not in ('msgpack-zstd', 'msgpack-zlib', 'json-zlib', 'json'):
+        raise RuntimeError(f'Codec desconhecido: {name}')
+    return name
+
+
+CODEC = _resolve_codec(os.environ.get('EXERCISE_DATA_CODEC', 'json'))
+
+# Compressores zstd não podem ser compartilhados entre threads
+_local = threading.local()
+
+
+def _zstd_compressor():
+    if not hasattr(_local, 'compressor'):
+        _local.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        _local.decompressor = zstandard.ZstdDecompressor()
+    return _local.compressor
+
+
+def _zstd_decompressor():
+    _zstd_compressor()
+    return _local.decompressor
+
+
+def uses_text_storage() -> bool:
+    """Indica se os payloads são gravados como JSON em texto puro."""
+    return CODEC == 'json'
+
+
+def encode(data: Any, codec: Optional[str] = None) -> Union[str, bytes]:
+    """Codifica um payload para gravação na coluna ``exercises.data``."""
+    codec = codec or CODEC
+    if codec == 'json':
+        return json.dumps(data)
+
+    if codec == 'json-zlib':
+        return bytes([FORMAT_JSON_ZLIB]) + zlib.compress(
+            json.dumps(data, separators=(',', ':')).encode('utf-8'), ZLIB_LEVEL)
+
+    try:
+        packed = msgpack.packb(data, use_bin_type=True)
+    except (TypeError, OverflowError, ValueError):
+        # Inteiros fora de 64 bits e afins: recorrer ao JSON
+        return encode(data, 'json-zlib')
+
+    if len(packed) >= COMPRESS_MIN_BYTES:
+        if codec == 'msgpack-zstd':
+            compressed = _zstd_compressor().compress(packed)
+            if len(compressed) < len(packed):
+                return bytes([FORMAT_MSGPACK_ZSTD]) + compressed
+        else:
+            compressed = zlib.compress(packed, ZLIB_LEVEL)
+            if len(compressed) < len(packed):
+                return bytes([FORMAT_MSGPACK_ZLIB]) + compressed
+    return bytes([FORMAT_MSGPACK]) + packed
+
+
+def decode(value: Union[str, bytes, None]) -> Any:
+    """Decodifica um valor da coluna ``exercises.data`` em qualquer formato."""
+    if not value:
+        return {}
+    if isinstance(value, str):
+        return json.loads(value)
+
+    version, body = value[0], value[1:]
+    if version == FORMAT_MSGPACK:
+        return msgpack.unpackb(body, raw=False, strict_map_key=False)
+    if version == FORMAT_MSGPACK_ZLIB:
+        return msgpack.unpackb(zlib.decompress(body), raw=False, strict_map_key=False)
+    if version == FORMAT_MSGPACK_ZSTD:
+        return msgpack.unpackb(_zstd_decompressor().decompress(body), raw=False, strict_map_key=False)
+    if version == FORMAT_JSON_ZLIB:
+        return json.loads(zlib.decompress(body).decode('utf-8'))
+    if version in b'{[':
+        # JSON gravado como BLOB por outro cliente
+        return json.loads(value.decode('utf-8'))
+    raise ValueError(f'Formato de payload desconhecido: 0x{version:02x}')
+
+
+def apply_merge_patch(target: Any, patch: Any) -> Any:
+    """Aplica um JSON merge patch (RFC 7396), como ``json_patch`` do SQLite."""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+
+_PATH_TOKEN = re.compile(r'\.(?:"([^"]+)"|([^.\[\]"]+))|\[(\d+|#)\]')
+
+
+def _parse_path(path: str):
+    """Converte um caminho JSON (``$.a.b[0]``, ``$.lista[#]``) em chaves/índices.
+
+    Aceita o mesmo subconjunto da sintaxe de caminhos do SQLite usado pelas
+    atualizações parciais: chaves simples ou entre aspas, índices e ``[#]``.
+    """
+    if not isinstance(path, str) or not path.startswith('$'):
+        raise ValueError(f'Caminho JSON inválido: {path}')
+    parts = []
+    index = 1
+    while index < len(path):
+        match = _PATH_TOKEN.match(path, index)
+        if match is None:
+            raise ValueError(f'Caminho JSON inválido: {path}')
+        quoted, key, position = match.groups()
+        if position is not None:
+            parts.append(position if position == '#' else int(position))
+        else:
+            parts.append(quoted if quoted is not None else key)
+        index = match.end()
+    return parts
+
+
+def is_valid_path(path: Any) -> bool:
+    """Indica se ``path`` é um caminho JSON aceito por :func:`apply_json_set`."""
+    try:
+        _parse_path(path)
+    except ValueError:
+        return False
+    return True
+
+
+def apply_json_set(target: Any, path: str, value: Any) -> Any:
+    """Define o valor em ``path``, como ``json_set`` do SQLite.
+
+    Objetos intermediários ausentes são criados; ``[#]`` acrescenta ao
+    final de uma lista.
+    """
+    parts = _parse_path(path)
+    if not parts:
+        return value
+    root = target if isinstance(target, (dict, list)) else {}
+    node = root
+    for position, key in enumerate(parts):
+        last = position == len(parts) - 1
+        if isinstance(key, int) or key == '#':
+            if not isinstance(node, list):
+                return root
+            if key == '#':
+                key = len(node)
+            if key > len(node):
+                return root
+            if key == len(node):
+                node.append(value if last else {})
+            elif last:
+                node[key] = value
+            node = node[key]
+        else:
+            if not isinstance(node, dict):
+                return root
+            if last:
+                node[key] = value
+            elif not isinstance(node.get(key), (dict, list)):
+                node[key] = {}
+            node = node[key]
+    return root
+
+
+def migrate_exercise_data(conn, batch_size: int = 500) -> int:
+    """Regrava no codec atual as linhas que estão em outro tipo de armazenamento.
+
+    Com o codec ``json`` os BLOBs voltam a ser texto; nos demais codecs as
+    linhas legadas em texto são compactadas. Retorna o número de linhas
+    convertidas.
+    """
+    source_type = 'blob' if uses_text_storage() else 'text'
+    cursor = conn.cursor()
+    converted = 0
+    last_id = 0
+    while True:
+        cursor.execute(
+            'SELECT id, data FROM exercises WHERE id > ? AND typeof(data) = ? ORDER BY id LIMIT ?',
+            (last_id, source_type, batch_size)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany('UPDATE exercises SET data = ? WHERE id = ?',
+                           [(encode(decode(data)), row_id) for row_id, data in rows])
+        conn.commit()
+        converted += len(rows)
+        last_id = rows[-1][0]
+    return converted
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'migrate':
+        print(__doc__)
+        sys.exit(1)
+    import app
+    for name in app.shard_router.shard_names():
+        if not os.path.exists(app.shard_router.path(name)):
+            continue
+        connection = app.shard_router.connect(name, initialize=False)
+        print(f'{name}: {migrate_exercise_data(connection)} linhas convertidas para o codec {CODEC}')
+        connection.close()
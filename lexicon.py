@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Léxicos compilados para a análise de texto.
+
+As listas de palavras (arquivos TSV com ``termo<TAB>categoria[<TAB>peso]``)
+são compiladas em um arquivo binário que o módulo C++ mapeia em memória
+(``mmap``) sem nenhuma etapa de parsing; as páginas ficam no cache do
+sistema e são compartilhadas entre todos os processos. O arquivo é
+substituído atomicamente, e os workers recarregam a nova versão ao
+perceber a mudança.
+
+Formato (little-endian):
+
+    cabeçalho   magic "NPLX", versão, nº de categorias, nº de entradas,
+                offset e tamanho do pool de strings (6 x uint32)
+    categorias  (offset, tamanho) do nome no pool (2 x uint32)
+    entradas    (offset, tamanho do termo, categoria, peso float32),
+                ordenadas pelos bytes UTF-8 do termo normalizado
+    pool        strings UTF-8 concatenadas
+
+Este módulo também lê o formato, para que o fallback em Python use
+exatamente o mesmo léxico e a mesma normalização do módulo nativo.
+
+Uso:
+    python lexicon.py build lexicons/base.tsv [outros.tsv ...] [-o lib/lexicon.bin]
+    python lexicon.py info [lib/lexicon.bin]
+"""
+
+import os
+import re
+import hashlib
+import mmap
+import struct
+import argparse
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b'NPLX'
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct('<4sIIIII')
+CATEGORY = struct.Struct('<II')
+ENTRY = struct.Struct('<IIIf')
+
+DEFAULT_PATH = os.environ.get(
+    'LEXICON_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib', 'lexicon.bin'))
+
+# Categorias usadas por analyze_text
+CATEGORIES = ['positive', 'negative', 'power', 'collaborative']
+
+# Léxico embutido no módulo C++, usado enquanto nenhum léxico compilado é carregado
+BUILTIN_WORDS = {
+    'positive': ['acordo', 'benefício', 'colaboração', 'ganho', 'oportunidade',
+                 'parceria', 'solução', 'sucesso', 'vantagem', 'valor'],
+    'negative': ['conflito', 'custo', 'desvantagem', 'disputa', 'falha',
+                 'perda', 'problema', 'risco', 'ruptura', 'tensão'],
+    'power': ['certamente', 'claramente', 'definitivamente', 'essencial', 'exatamente',
+              'garantido', 'imperativo', 'necessário', 'precisamente', 'vital'],
+    'collaborative': ['ambos', 'compartilhar', 'conjunto', 'cooperação', 'equipe',
+                      'juntos', 'mútuo', 'parceria', 'reciprocidade', 'sinergia'],
+}
+
+# Mesmas classes de caracteres de is_word_char() no módulo C++
+_TOKEN_RE = re.compile(
+    '[0-9A-Za-z_\u00c0-\u00d6\u00d8-\u00f6\u00f8-\u1fff\u2c00-\u2fff'
+    '\u3040-\ufffc\ufffe-\U0010ffff]+')
+
+
+def _fold_case(code_point: int) -> int:
+    """Minúsculas como fold_case() no módulo C++ (ASCII, Latin-1 e Latin Extended-A)."""
+    c = code_point
+    if ord('A') <= c <= ord('Z') or (0xC0 <= c <= 0xDE and c != 0xD7):
+        return c + 0x20
+    if 0x100 <= c <= 0x17F:
+        if c == 0x178:
+            return 0xFF
+        odd_upper = 0x139 <= c <= 0x148 or 0x179 <= c <= 0x17E
+        even_upper = not odd_upper and c not in (0x130, 0x138, 0x149, 0x17F)
+        if (odd_upper and c & 1) or (even_upper and not c & 1):
+            return c + 1
+    return c
+
+
+_FOLD_TABLE = {c: _fold_case(c) for c in range(0x180) if _fold_case(c) != c}
+
+
+def tokenize(text: str) -> List[str]:
+    """Divide o texto em palavras normalizadas, como o tokenizador nativo."""
+    return _TOKEN_RE.findall(text.translate(_FOLD_TABLE))
+
+
+def iter_token_spans(text: str) -> Iterator[Tuple[str, int, int]]:
+    """Gera ``(palavra, início, fim)`` com as posições em caracteres no texto original."""
+    for match in _TOKEN_RE.finditer(text.translate(_FOLD_TABLE)):
+        yield match.group(), match.start(), match.end()
+
+
+def compile_lexicon(entries: Iterable[Tuple[str, str, float]]) -> bytes:
+    """Compila entradas ``(termo, categoria, peso)`` no formato binário.
+
+    Termos repetidos na mesma categoria ficam com o último peso informado.
+
+    Raises:
+        ValueError: se um termo não for uma única palavra ou o peso não for positivo
+    """
+    weights: Dict[Tuple[bytes, str], float] = {}
+    for term, category, weight in entries:
+        tokens = tokenize(term)
+        if len(tokens) != 1:
+            raise ValueError(f'O termo "{term}" deve ser uma única palavra')
+        if not weight > 0:
+            raise ValueError(f'Peso inválido para "{term}": {weight}')
+        weights[(tokens[0].encode('utf-8'), category)] = float(weight)
+
+    categories = sorted({category for _, category in weights})
+    category_ids = {name: index for index, name in enumerate(categories)}
+
+    pool = bytearray()
+    category_table = []
+    for name in categories:
+        encoded = name.encode('utf-8')
+        category_table.append(CATEGORY.pack(len(pool), len(encoded)))
+        pool += encoded
+
+    entry_table = []
+    for (term, category), weight in sorted(weights.items(), key=lambda item: (item[0][0], category_ids[item[0][1]])):
+        entry_table.append(ENTRY.pack(len(pool), len(term), category_ids[category], weight))
+        pool += term
+
+    pool_offset = HEADER.size + CATEGORY.size * len(category_table) + ENTRY.size * len(entry_table)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(category_table), len(entry_table), pool_offset, len(pool))
+    return header + b''.join(category_table) + b''.join(entry_table) + bytes(pool)
+
+
+def read_sources(paths: Iterable[str]) -> List[Tuple[str, str, float]]:
+    """Lê arquivos TSV ``termo<TAB>categoria[<TAB>peso]`` (linhas com # são ignoradas)."""
+    entries = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                fields = line.split('\t')
+                if len(fields) not in (2, 3):
+                    raise ValueError(f'{path}:{line_number}: esperado termo<TAB>categoria[<TAB>peso]')
+                weight = float(fields[2]) if len(fields) == 3 else 1.0
+                entries.append((fields[0], fields[1], weight))
+    return entries
+
+
+def write_lexicon(path: str, data: bytes):
+    """Grava o léxico substituindo o anterior atomicamente.
+
+    Processos que ainda mapeiam a versão antiga continuam a lê-la até
+    recarregar, pois o arquivo antigo só é liberado quando deixa de ser usado.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f'{path}.tmp{os.getpid()}'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class Lexicon:
+    """Leitor do formato compilado (busca binária direto sobre os bytes)."""
+
+    def __init__(self, data, source: str):
+        self.data = data
+        self.source = source
+        magic, version, category_count, entry_count, pool_offset, pool_size = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('Arquivo não é um léxico compilado')
+        if version != FORMAT_VERSION:
+            raise ValueError(f'Versão de léxico não suportada: {version}')
+        if pool_offset + pool_size > len(data):
+            raise ValueError('Léxico corrompido: tabelas fora dos limites')
+        self.entry_count = entry_count
+        self.digest = hashlib.sha256(data).hexdigest()
+        self._entries_offset = HEADER.size + CATEGORY.size * category_count
+        self._pool_offset = pool_offset
+        self.categories = []
+        for index in range(category_count):
+            offset, length = CATEGORY.unpack_from(data, HEADER.size + CATEGORY.size * index)
+            self.categories.append(self._string(offset, length).decode('utf-8'))
+
+    @classmethod
+    def from_file(cls, path: str) -> 'Lexicon':
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), path)
+
+    @classmethod
+    def builtin(cls) -> 'Lexicon':
+        return cls(compile_lexicon(
+            (word, category, 1.0) for category, words in BUILTIN_WORDS.items() for word in words), 'builtin')
+
+    def __len__(self) -> int:
+        return self.entry_count
+
+    def _string(self, offset: int, length: int) -> bytes:
+        start = self._pool_offset + offset
+        return self.data[start:start + length]
+
+    def _entry(self, index: int):
+        return ENTRY.unpack_from(self.data, self._entries_offset + ENTRY.size * index)
+
+    def _term(self, index: int) -> bytes:
+        offset, length, _, _ = self._entry(index)
+        return self._string(offset, length)
+
+    def lookup(self, token: str) -> List[Tuple[str, float]]:
+        """Retorna ``(categoria, peso)`` de um token já normalizado."""
+        term = token.encode('utf-8')
+        low, high = 0, self.entry_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._term(middle) < term:
+                low = middle + 1
+            else:
+                high = middle
+        matches = []
+        while low < self.entry_count and self._term(low) == term:
+            _, _, category, weight = self._entry(low)
+            matches.append((self.categories[category], weight))
+            low += 1
+        return matches
+
+
+def load(path: Optional[str] = None) -> Lexicon:
+    """Carrega o léxico compilado em ``path`` ou o embutido se o arquivo não existir."""
+    path = path or DEFAULT_PATH
+    return Lexicon.from_file(path) if os.path.exists(path) else Lexicon.builtin()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compila e inspeciona léxicos de análise de texto')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='compila arquivos TSV')
+    build_parser.add_argument('sources', nargs='+')
+    build_parser.add_argument('-o', '--output', default=DEFAULT_PATH)
+    info_parser = subparsers.add_parser('info', help='mostra o conteúdo de um léxico compilado')
+    info_parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        data = compile_lexicon(read_sources(args.sources))
+        write_lexicon(args.output, data)
+        lexicon = Lexicon(data, args.output)
+        print(f'{len(lexicon)} entradas em {len(lexicon.categories)} categorias gravadas em {args.output}')
+    else:
+        lexicon = Lexicon.from_file(args.path)
+        print(f'{args.path}: {len(lexicon)} entradas, categorias: {", ".join(lexicon.categories)}')
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Instrumentação de performance da aplicação.
+
+Mantém contadores e histogramas em memória (por processo) e os expõe no
+formato texto do Prometheus em ``/metrics``. Também fornece uma conexão
+SQLite instrumentada que mede o tempo de cada instrução executada.
+"""
+
+import os
+import re
+import time
+import logging
+import sqlite3
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+# Limites padrão dos histogramas (em segundos)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_query_logger = logging.getLogger('negotiation.slow_query')
+
+
+def _parse_slow_query_ms(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        slow_query_logger.warning('SLOW_QUERY_LOG_MS inválido (%r), log de consultas lentas desativado', value)
+        return None
+
+
+# Limite para o log de consultas lentas (desativado quando não definido)
+SLOW_QUERY_MS = _parse_slow_query_ms(os.environ.get('SLOW_QUERY_LOG_MS'))
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monotônico com rótulos."""
+
+    metric_type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+
+
+class Histogram:
+    """Histograma cumulativo com rótulos, compatível com o Prometheus."""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Para cada combinação de rótulos: [contagens por bucket, soma, total]
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Mede o tempo de execução do bloco e registra no histograma."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self):
+        with self._lock:
+            values = {key: ([*entry[0]], entry[1], entry[2]) for key, entry in self._values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(float(bound))))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labelnames, key, ('le', '+Inf'))
+            yield f'{self.name}_bucket{labels} {count}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, key)} {count}'
+
+
+class Registry:
+    """Conjunto de métricas exportadas em ``/metrics``."""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.metric_type}')
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# Métricas da aplicação
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    'http_requests_total', 'Total de requisições HTTP atendidas',
+    ('method', 'endpoint', 'status')))
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Latência das requisições HTTP por rota',
+    ('method', 'endpoint')))
+SQL_QUERY_DURATION = REGISTRY.register(Histogram(
+    'sqlite_query_duration_seconds', 'Tempo de execução das instruções SQLite',
+    ('operation', 'table')))
+SQL_SLOW_QUERIES = REGISTRY.register(Counter(
+    'sqlite_slow_queries_total', 'Instruções SQLite acima do limite de consulta lenta',
+    ('operation', 'table')))
+REPORT_STAGE_DURATION = REGISTRY.register(Histogram(
+    'report_stage_duration_seconds', 'Tempo das etapas de geração de relatório',
+    ('stage',)))
+BCRYPT_DURATION = REGISTRY.register(Histogram(
+    'bcrypt_duration_seconds', 'Tempo gasto em operações bcrypt',
+    ('operation',), buckets=(0.01, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0)))
+NATIVE_CALL_DURATION = REGISTRY.register(Histogram(
+    'native_call_duration_seconds', 'Tempo das chamadas ao analisador nativo ou ao fallback',
+    ('function', 'backend')))
+NATIVE_CALL_ERRORS = REGISTRY.register(Counter(
+    'native_call_errors_total', 'Falhas em chamadas ao módulo C++',
+    ('function',)))
+
+
+_STATEMENT_RE = re.compile(r'^\s*(\w+)', re.IGNORECASE)
+_TABLE_RE = re.compile(
+    r'\b(?:FROM|INTO|UPDATE|TABLE(?:\s+IF\s+NOT\s+EXISTS)?|INDEX(?:\s+IF\s+NOT\s+EXISTS)?\s+\w+\s+ON)\s+(\w+)',
+    re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def describe_statement(sql: str) -> Tuple[str, str]:
+    """Retorna (operação, tabela) de uma instrução SQL para uso como rótulo."""
+    operation = _STATEMENT_RE.match(sql)
+    table = _TABLE_RE.search(sql)
+    return (operation.group(1).upper() if operation else 'UNKNOWN',
+            table.group(1) if table else '')
+
+
+def _record_query(sql: str, elapsed: float):
+    operation, table = describe_statement(sql)
+    SQL_QUERY_DURATION.observe(elapsed, operation=operation, table=table)
+    if SLOW_QUERY_MS is not None and elapsed * 1000 >= SLOW_QUERY_MS:
+        SQL_SLOW_QUERIES.inc(operation=operation, table=table)
+        slow_query_logger.warning('Consulta lenta (%.1f ms): %s', elapsed * 1000, ' '.join(sql.split()))
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que mede o tempo de cada instrução executada."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_query(sql, time.perf_counter() - start)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Conexão SQLite cujos cursores são instrumentados.
+
+    Uso: ``sqlite3.connect(path, factory=InstrumentedConnection)``.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def init_app(app):
+    """Registra os hooks de medição de latência e a rota ``/metrics``."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start,
+                                          method=request.method, endpoint=endpoint)
+            HTTP_REQUESTS.inc(method=request.method, endpoint=endpoint,
+                              status=str(response.status_code))
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -2,15 +2,32 @@
 #include <vector>
 #include <string>
 #include <map>
+#include <deque>
+#include <unordered_map>
+#include <unordered_set>
 #include <chrono>
 #include <thread>
 #include <mutex>
+#include <memory>
 #include <fstream>
 #include <sstream>
 #include <algorithm>
+#include <stdexcept>
+#include <cstdint>
+#include <cstring>
+#include <cctype>
+#include <iterator>
 #include <cmath>
+#include <cstdio>
 #include <nlohmann/json.hpp>
 
+#ifndef _WIN32
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+
 // Para simplificar o uso do namespace json
 using json = nlohmann::json;
 
@@ -46,102 +63,413 @@ public:
     }
 };
 
-// Classe para análise de texto em negociações
-class TextAnalyzer {
+// Formato binário do léxico compilado (gerado por lexicon.py, little-endian):
+//
+//   Header | Category[category_count] | Entry[entry_count] | pool de strings
+//
+// As entradas ficam ordenadas pelos bytes UTF-8 do termo (já em minúsculas),
+// permitindo busca binária direto sobre o arquivo mapeado em memória.
+namespace lexicon_format {
+    const char MAGIC[4] = {'N', 'P', 'L', 'X'};
+    const uint32_t VERSION = 1;
+
+    struct Header {
+        char magic[4];
+        uint32_t version;
+        uint32_t category_count;
+        uint32_t entry_count;
+        uint32_t pool_offset;
+        uint32_t pool_size;
+    };
+
+    struct Category {
+        uint32_t name_offset;
+        uint32_t name_length;
+    };
+
+    struct Entry {
+        uint32_t term_offset;
+        uint32_t term_length;
+        uint32_t category;
+        float weight;
+    };
+}
+
+// Léxico somente leitura, mapeado de um arquivo compilado ou montado em memória
+class Lexicon {
 private:
-    std::vector<std::string> positive_words;
-    std::vector<std::string> negative_words;
-    std::vector<std::string> power_words;
-    std::vector<std::string> collaborative_words;
+    std::vector<char> owned;
+    void* mapping = nullptr;
+    size_t mapping_size = 0;
 
-    // Carrega palavras de um arquivo
-    void load_words_from_file(const std::string& filename, std::vector<std::string>& word_list) {
-        std::ifstream file(filename);
-        std::string word;
-        
-        if (file.is_open()) {
-            while (std::getline(file, word)) {
-                // Converter para minúsculas
-                std::transform(word.begin(), word.end(), word.begin(),
-                    [](unsigned char c) { return std::tolower(c); });
-                word_list.push_back(word);
+    const lexicon_format::Header* header = nullptr;
+    const lexicon_format::Category* categories = nullptr;
+    const lexicon_format::Entry* entries = nullptr;
+    const char* pool = nullptr;
+
+    Lexicon() {}
+
+    // Valida a estrutura e posiciona os ponteiros sobre os dados
+    void attach(const char* data, size_t size) {
+        using namespace lexicon_format;
+        if (size < sizeof(Header)) {
+            throw std::runtime_error("Léxico truncado");
+        }
+        header = reinterpret_cast<const Header*>(data);
+        if (std::memcmp(header->magic, MAGIC, sizeof(MAGIC)) != 0) {
+            throw std::runtime_error("Arquivo não é um léxico compilado");
+        }
+        if (header->version != VERSION) {
+            throw std::runtime_error("Versão de léxico não suportada: " + std::to_string(header->version));
+        }
+
+        uint64_t tables_end = sizeof(Header) + (uint64_t)header->category_count * sizeof(Category)
+                            + (uint64_t)header->entry_count * sizeof(Entry);
+        if (tables_end > header->pool_offset || (uint64_t)header->pool_offset + header->pool_size > size) {
+            throw std::runtime_error("Léxico corrompido: tabelas fora dos limites");
+        }
+
+        categories = reinterpret_cast<const Category*>(data + sizeof(Header));
+        entries = reinterpret_cast<const Entry*>(categories + header->category_count);
+        pool = data + header->pool_offset;
+
+        for (uint32_t i = 0; i < header->category_count; ++i) {
+            if ((uint64_t)categories[i].name_offset + categories[i].name_length > header->pool_size) {
+                throw std::runtime_error("Léxico corrompido: categoria fora dos limites");
+            }
+        }
+        for (uint32_t i = 0; i < header->entry_count; ++i) {
+            if ((uint64_t)entries[i].term_offset + entries[i].term_length > header->pool_size ||
+                entries[i].category >= header->category_count) {
+                throw std::runtime_error("Léxico corrompido: entrada fora dos limites");
             }
-            file.close();
         }
     }
 
-    // Normaliza o texto para análise
-    std::string normalize_text(const std::string& text) {
-        std::string result = text;
-        // Converter para minúsculas
-        std::transform(result.begin(), result.end(), result.begin(),
-            [](unsigned char c) { return std::tolower(c); });
-        return result;
+    int compare(const lexicon_format::Entry& entry, const char* term, size_t length) const {
+        size_t common = std::min<size_t>(entry.term_length, length);
+        int result = std::memcmp(pool + entry.term_offset, term, common);
+        if (result != 0) {
+            return result;
+        }
+        return entry.term_length < length ? -1 : (entry.term_length > length ? 1 : 0);
     }
 
-    // Conta ocorrências de palavras de uma lista no texto
-    int count_word_occurrences(const std::string& text, const std::vector<std::string>& word_list) {
-        int count = 0;
-        std::string normalized_text = normalize_text(text);
-        
-        for (const auto& word : word_list) {
-            size_t pos = 0;
-            while ((pos = normalized_text.find(word, pos)) != std::string::npos) {
-                // Verificar se é uma palavra completa
-                bool is_word_start = (pos == 0 || !std::isalpha(normalized_text[pos-1]));
-                bool is_word_end = (pos + word.length() == normalized_text.length() || 
-                                  !std::isalpha(normalized_text[pos + word.length()]));
-                
-                if (is_word_start && is_word_end) {
-                    count++;
-                }
-                pos += word.length();
+public:
+    std::string source;
+
+    Lexicon(const Lexicon&) = delete;
+    Lexicon& operator=(const Lexicon&) = delete;
+
+    ~Lexicon() {
+#ifndef _WIN32
+        if (mapping) {
+            munmap(mapping, mapping_size);
+        }
+#endif
+    }
+
+    // Mapeia um léxico compilado; as páginas são compartilhadas entre processos
+    static std::shared_ptr<const Lexicon> from_file(const std::string& path) {
+        std::shared_ptr<Lexicon> lexicon(new Lexicon());
+        lexicon->source = path;
+#ifndef _WIN32
+        int fd = open(path.c_str(), O_RDONLY);
+        if (fd < 0) {
+            throw std::runtime_error("Não foi possível abrir o léxico: " + path);
+        }
+        struct stat info;
+        if (fstat(fd, &info) != 0 || info.st_size == 0) {
+            close(fd);
+            throw std::runtime_error("Léxico vazio ou inacessível: " + path);
+        }
+        lexicon->mapping_size = (size_t)info.st_size;
+        lexicon->mapping = mmap(nullptr, lexicon->mapping_size, PROT_READ, MAP_SHARED, fd, 0);
+        close(fd);
+        if (lexicon->mapping == MAP_FAILED) {
+            lexicon->mapping = nullptr;
+            throw std::runtime_error("Falha ao mapear o léxico: " + path);
+        }
+        lexicon->attach(static_cast<const char*>(lexicon->mapping), lexicon->mapping_size);
+#else
+        std::ifstream file(path, std::ios::binary);
+        if (!file.is_open()) {
+            throw std::runtime_error("Não foi possível abrir o léxico: " + path);
+        }
+        lexicon->owned.assign(std::istreambuf_iterator<char>(file), std::istreambuf_iterator<char>());
+        lexicon->attach(lexicon->owned.data(), lexicon->owned.size());
+#endif
+        return lexicon;
+    }
+
+    // Monta um léxico em memória (peso 1) a partir de listas de palavras por categoria
+    static std::shared_ptr<const Lexicon> from_words(
+            const std::vector<std::pair<std::string, std::vector<std::string>>>& word_lists) {
+        using namespace lexicon_format;
+        struct Term { std::string text; uint32_t category; };
+
+        std::vector<Term> terms;
+        for (uint32_t category = 0; category < word_lists.size(); ++category) {
+            for (const auto& word : word_lists[category].second) {
+                terms.push_back({word, category});
             }
         }
-        
-        return count;
+        std::sort(terms.begin(), terms.end(), [](const Term& a, const Term& b) {
+            return a.text != b.text ? a.text < b.text : a.category < b.category;
+        });
+
+        std::string strings;
+        std::vector<Category> category_table;
+        for (const auto& list : word_lists) {
+            category_table.push_back({(uint32_t)strings.size(), (uint32_t)list.first.size()});
+            strings += list.first;
+        }
+        std::vector<Entry> entry_table;
+        for (const auto& term : terms) {
+            entry_table.push_back({(uint32_t)strings.size(), (uint32_t)term.text.size(), term.category, 1.0f});
+            strings += term.text;
+        }
+
+        Header header;
+        std::memcpy(header.magic, MAGIC, sizeof(MAGIC));
+        header.version = VERSION;
+        header.category_count = (uint32_t)category_table.size();
+        header.entry_count = (uint32_t)entry_table.size();
+        header.pool_offset = (uint32_t)(sizeof(Header) + category_table.size() * sizeof(Category)
+                                        + entry_table.size() * sizeof(Entry));
+        header.pool_size = (uint32_t)strings.size();
+
+        std::shared_ptr<Lexicon> lexicon(new Lexicon());
+        lexicon->source = "builtin";
+        std::vector<char>& buffer = lexicon->owned;
+        buffer.resize(header.pool_offset + strings.size());
+        char* out = buffer.data();
+        std::memcpy(out, &header, sizeof(Header));
+        std::memcpy(out + sizeof(Header), category_table.data(), category_table.size() * sizeof(Category));
+        std::memcpy(out + sizeof(Header) + category_table.size() * sizeof(Category),
+                    entry_table.data(), entry_table.size() * sizeof(Entry));
+        std::memcpy(out + header.pool_offset, strings.data(), strings.size());
+        lexicon->attach(buffer.data(), buffer.size());
+        return lexicon;
+    }
+
+    size_t size() const {
+        return header->entry_count;
+    }
+
+    // Índice de uma categoria pelo nome (-1 se o léxico não a define)
+    int category_index(const std::string& name) const {
+        for (uint32_t i = 0; i < header->category_count; ++i) {
+            if (categories[i].name_length == name.size() &&
+                std::memcmp(pool + categories[i].name_offset, name.data(), name.size()) == 0) {
+                return (int)i;
+            }
+        }
+        return -1;
+    }
+
+    // Entradas do termo (uma por categoria) por busca binária
+    std::pair<const lexicon_format::Entry*, const lexicon_format::Entry*>
+    find(const char* term, size_t length) const {
+        const lexicon_format::Entry* first = entries;
+        const lexicon_format::Entry* last = entries + header->entry_count;
+        first = std::lower_bound(first, last, 0, [&](const lexicon_format::Entry& entry, int) {
+            return compare(entry, term, length) < 0;
+        });
+        const lexicon_format::Entry* end = first;
+        while (end != last && compare(*end, term, length) == 0) {
+            ++end;
+        }
+        return {first, end};
+    }
+};
+
+// Decodifica um code point UTF-8 a partir de ``pos``; bytes inválidos viram U+FFFD
+inline size_t decode_utf8(const std::string& text, size_t pos, uint32_t& code_point) {
+    unsigned char c = (unsigned char)text[pos];
+    size_t length = c < 0x80 ? 1 : (c >> 5) == 0x6 ? 2 : (c >> 4) == 0xE ? 3 : (c >> 3) == 0x1E ? 4 : 0;
+    if (length == 0 || pos + length > text.size()) {
+        code_point = 0xFFFD;
+        return 1;
+    }
+    code_point = length == 1 ? c : length == 2 ? (c & 0x1F) : length == 3 ? (c & 0x0F) : (c & 0x07);
+    for (size_t i = 1; i < length; ++i) {
+        unsigned char next = (unsigned char)text[pos + i];
+        if ((next >> 6) != 0x2) {
+            code_point = 0xFFFD;
+            return 1;
+        }
+        code_point = (code_point << 6) | (next & 0x3F);
+    }
+    return length;
+}
+
+inline void append_utf8(std::string& out, uint32_t code_point) {
+    if (code_point < 0x80) {
+        out += (char)code_point;
+    } else if (code_point < 0x800) {
+        out += (char)(0xC0 | (code_point >> 6));
+        out += (char)(0x80 | (code_point & 0x3F));
+    } else if (code_point < 0x10000) {
+        out += (char)(0xE0 | (code_point >> 12));
+        out += (char)(0x80 | ((code_point >> 6) & 0x3F));
+        out += (char)(0x80 | (code_point & 0x3F));
+    } else {
+        out += (char)(0xF0 | (code_point >> 18));
+        out += (char)(0x80 | ((code_point >> 12) & 0x3F));
+        out += (char)(0x80 | ((code_point >> 6) & 0x3F));
+        out += (char)(0x80 | (code_point & 0x3F));
+    }
+}
+
+// Letras, dígitos e "_" (aproxima o \w do Python usado no fallback)
+inline bool is_word_char(uint32_t c) {
+    if (c < 0x80) {
+        return std::isalnum((int)c) || c == '_';
+    }
+    if (c < 0xC0 || c == 0xD7 || c == 0xF7) {
+        return false;  // Pontuação e símbolos do Latin-1
+    }
+    if ((c >= 0x2000 && c <= 0x2BFF) || (c >= 0x3000 && c <= 0x303F) || c == 0xFFFD) {
+        return false;  // Pontuação geral, símbolos, setas e pontuação CJK
+    }
+    return true;
+}
+
+// Minúsculas para ASCII, Latin-1 e Latin Extended-A (mesmo resultado de str.lower())
+inline uint32_t fold_case(uint32_t c) {
+    if (c >= 'A' && c <= 'Z') {
+        return c + 0x20;
+    }
+    if (c >= 0xC0 && c <= 0xDE && c != 0xD7) {
+        return c + 0x20;
+    }
+    if (c >= 0x100 && c <= 0x17F) {
+        if (c == 0x178) {
+            return 0xFF;
+        }
+        bool odd_upper = (c >= 0x139 && c <= 0x148) || (c >= 0x179 && c <= 0x17E);
+        bool even_upper = !odd_upper && c != 0x130 && c != 0x138 && c != 0x149 && c != 0x17F;
+        if ((odd_upper && (c & 1)) || (even_upper && !(c & 1))) {
+            return c + 1;
+        }
+    }
+    return c;
+}
+
+// Palavra produzida pelo tokenizador, com posições em caracteres (code points)
+struct Token {
+    std::string text;
+    size_t start;
+    size_t end;
+    bool sentence_start;  // primeira palavra de uma frase
+};
+
+// Encerram uma frase para a avaliação por frase dos padrões
+inline bool is_sentence_end(uint32_t c) {
+    return c == '.' || c == '!' || c == '?' || c == '\n';
+}
+
+// Percorre o texto uma única vez, entregando cada palavra já em minúsculas
+template <typename Callback>
+size_t for_each_token(const std::string& text, Callback callback) {
+    Token token{"", 0, 0, true};
+    bool sentence_ended = true;
+    size_t count = 0;
+    size_t pos = 0;
+    size_t index = 0;
+    while (pos < text.size()) {
+        uint32_t code_point;
+        size_t length = decode_utf8(text, pos, code_point);
+        if (is_word_char(code_point)) {
+            if (token.text.empty()) {
+                token.start = index;
+                token.sentence_start = sentence_ended;
+                sentence_ended = false;
+            }
+            append_utf8(token.text, fold_case(code_point));
+        } else {
+            if (!token.text.empty()) {
+                token.end = index;
+                callback(token);
+                token.text.clear();
+                ++count;
+            }
+            sentence_ended = sentence_ended || is_sentence_end(code_point);
+        }
+        pos += length;
+        ++index;
+    }
+    if (!token.text.empty()) {
+        token.end = index;
+        callback(token);
+        ++count;
+    }
+    return count;
+}
+
+// Classe para análise de texto em negociações
+class TextAnalyzer {
+private:
+    // Léxico ativo; trocado atomicamente em load_lexicon sem bloquear as análises
+    std::shared_ptr<const Lexicon> lexicon;
+
+    static const std::vector<std::string>& category_names() {
+        static const std::vector<std::string> names = {"positive", "negative", "power", "collaborative"};
+        return names;
     }
 
 public:
     TextAnalyzer() {
-        // Inicializar com algumas palavras padrão
-        // Em uma implementação real, estas seriam carregadas de arquivos
-        positive_words = {"acordo", "benefício", "colaboração", "ganho", "oportunidade", 
-                         "parceria", "solução", "sucesso", "vantagem", "valor"};
-        
-        negative_words = {"conflito", "custo", "desvantagem", "disputa", "falha", 
-                         "perda", "problema", "risco", "ruptura", "tensão"};
-        
-        power_words = {"certamente", "claramente", "definitivamente", "essencial", "exatamente", 
-                      "garantido", "imperativo", "necessário", "precisamente", "vital"};
-        
-        collaborative_words = {"ambos", "compartilhar", "conjunto", "cooperação", "equipe", 
-                             "juntos", "mútuo", "parceria", "reciprocidade", "sinergia"};
+        // Léxico embutido, usado até que um léxico compilado seja carregado
+        lexicon = Lexicon::from_words({
+            {"positive", {"acordo", "benefício", "colaboração", "ganho", "oportunidade",
+                          "parceria", "solução", "sucesso", "vantagem", "valor"}},
+            {"negative", {"conflito", "custo", "desvantagem", "disputa", "falha",
+                          "perda", "problema", "risco", "ruptura", "tensão"}},
+            {"power", {"certamente", "claramente", "definitivamente", "essencial", "exatamente",
+                       "garantido", "imperativo", "necessário", "precisamente", "vital"}},
+            {"collaborative", {"ambos", "compartilhar", "conjunto", "cooperação", "equipe",
+                               "juntos", "mútuo", "parceria", "reciprocidade", "sinergia"}}
+        });
     }
 
-    // Carrega palavras de arquivos externos
-    void load_word_lists(const std::string& positive_file, const std::string& negative_file,
-                        const std::string& power_file, const std::string& collaborative_file) {
-        load_words_from_file(positive_file, positive_words);
-        load_words_from_file(negative_file, negative_words);
-        load_words_from_file(power_file, power_words);
-        load_words_from_file(collaborative_file, collaborative_words);
+    // Carrega um léxico compilado; análises em andamento seguem com o anterior
+    json load_lexicon(const std::string& path) {
+        std::shared_ptr<const Lexicon> loaded = Lexicon::from_file(path);
+        std::atomic_store(&lexicon, loaded);
+        return {{"status", "loaded"}, {"source", loaded->source}, {"entries", loaded->size()}};
     }
 
     // Analisa um texto e retorna métricas
     json analyze_text(const std::string& text) {
         json result;
-        
-        // Contar ocorrências de cada tipo de palavra
-        int positive_count = count_word_occurrences(text, positive_words);
-        int negative_count = count_word_occurrences(text, negative_words);
-        int power_count = count_word_occurrences(text, power_words);
-        int collaborative_count = count_word_occurrences(text, collaborative_words);
-        
-        // Calcular total de palavras no texto
-        std::istringstream iss(text);
-        int word_count = std::distance(std::istream_iterator<std::string>(iss),
-                                     std::istream_iterator<std::string>());
+        std::shared_ptr<const Lexicon> active = std::atomic_load(&lexicon);
+
+        int category_map[4];
+        for (size_t i = 0; i < 4; ++i) {
+            category_map[i] = active->category_index(category_names()[i]);
+        }
+
+        // Ocorrências e soma dos pesos por categoria, em uma única passada
+        int counts[4] = {0, 0, 0, 0};
+        double weights[4] = {0, 0, 0, 0};
+        int word_count = (int)for_each_token(text, [&](const Token& token) {
+            auto range = active->find(token.text.data(), token.text.size());
+            for (auto entry = range.first; entry != range.second; ++entry) {
+                for (size_t i = 0; i < 4; ++i) {
+                    if (category_map[i] == (int)entry->category) {
+                        counts[i]++;
+                        weights[i] += entry->weight;
+                    }
+                }
+            }
+        });
+
+        int positive_count = counts[0];
+        int negative_count = counts[1];
+        int power_count = counts[2];
+        int collaborative_count = counts[3];
         
         // Calcular percentuais
         double positive_ratio = word_count > 0 ? (double)positive_count / word_count : 0;
@@ -149,16 +477,16 @@ public:
         double power_ratio = word_count > 0 ? (double)power_count / word_count : 0;
         double collaborative_ratio = word_count > 0 ? (double)collaborative_count / word_count : 0;
         
-        // Calcular pontuação de tom (positivo vs negativo)
+        // Calcular pontuação de tom (positivo vs negativo), ponderada pelos pesos do léxico
         double tone_score = 0;
-        if (positive_count + negative_count > 0) {
-            tone_score = (double)(positive_count - negative_count) / (positive_count + negative_count);
+        if (weights[0] + weights[1] > 0) {
+            tone_score = (weights[0] - weights[1]) / (weights[0] + weights[1]);
         }
         
         // Calcular pontuação de estilo (poder vs colaboração)
         double style_score = 0;
-        if (power_count + collaborative_count > 0) {
-            style_score = (double)(collaborative_count - power_count) / (power_count + collaborative_count);
+        if (weights[2] + weights[3] > 0) {
+            style_score = (weights[3] - weights[2]) / (weights[2] + weights[3]);
         }
         
         // Preencher o resultado JSON
@@ -175,6 +503,7 @@ public:
             {"tone_score", tone_score},  // -1 (muito negativo) a 1 (muito positivo)
             {"style_score", style_score}  // -1 (muito autoritário) a 1 (muito colaborativo)
         };
+        result["lexicon"] = {{"source", active->source}, {"entries", active->size()}};
         
         return result;
     }
@@ -310,11 +639,157 @@ public:
 };
 
 // Classe para análise de padrões em negociações
+//
+// Cada padrão é pontuado por regras com peso próprio: palavras e frases
+// (casadas por palavra inteira, após a mesma normalização do TextAnalyzer)
+// e pares de termos próximos na mesma frase. Ocorrências precedidas de
+// negação ("não", "nunca"...) são registradas, mas não pontuam. O texto é
+// percorrido uma única vez e o resultado traz as posições (em caracteres)
+// de cada ocorrência e a pontuação de cada frase.
 class NegotiationPatternAnalyzer {
 private:
+    // Palavra ou frase associada a um padrão
+    struct KeywordRule {
+        std::string pattern_id;
+        std::string keyword;
+        std::vector<std::string> tokens;
+        double weight;
+        std::string match_prefix;
+    };
+
+    // Par de termos que reforça um padrão quando aparecem próximos
+    struct ProximityRule {
+        std::string pattern_id;
+        std::string first;
+        std::string second;
+        size_t window;
+        double weight;
+        std::string match_prefix;
+    };
+
+    // Ocorrência encontrada no texto (aponta para o trecho pré-serializado da regra)
+    struct Match {
+        const std::string* prefix;
+        size_t start;
+        size_t end;
+        int sentence;
+        bool negated;
+    };
+
+    // Pontuação das frases com alguma ocorrência
+    struct SentenceScores {
+        int index;
+        size_t start;
+        size_t end;
+        std::map<std::string, double> scores;
+    };
+
+    // Palavra vista na frase atual
+    struct RecentToken {
+        std::string text;
+        size_t start;
+        bool negator;
+    };
+
+    // Palavras anteriores (na mesma frase) verificadas para negação
+    static const size_t NEGATION_WINDOW = 3;
+    // Soma de pesos que leva a confiança a 1 - 1/e
+    static constexpr double SCORE_SCALE = 2.0;
+    static constexpr double DETECTION_THRESHOLD = 0.3;
+
     // Mapeia padrões de negociação para suas descrições
     std::map<std::string, std::string> pattern_descriptions;
 
+    std::vector<KeywordRule> keyword_rules;
+    std::vector<ProximityRule> proximity_rules;
+    std::unordered_map<std::string, std::vector<size_t>> rules_by_last_token;
+    std::unordered_map<std::string, std::vector<size_t>> proximity_by_token;
+    std::unordered_set<std::string> negators;
+    size_t max_phrase_length = 1;
+
+    static std::vector<std::string> tokenize(const std::string& text) {
+        std::vector<std::string> tokens;
+        for_each_token(text, [&](const Token& token) { tokens.push_back(token.text); });
+        return tokens;
+    }
+
+    void add_keyword(const std::string& pattern_id, const std::string& keyword, double weight) {
+        KeywordRule rule{pattern_id, keyword, tokenize(keyword), weight, match_prefix(pattern_id, keyword, weight)};
+        max_phrase_length = std::max(max_phrase_length, rule.tokens.size());
+        rules_by_last_token[rule.tokens.back()].push_back(keyword_rules.size());
+        keyword_rules.push_back(rule);
+    }
+
+    void add_proximity(const std::string& pattern_id, const std::string& first, const std::string& second,
+                       size_t window, double weight) {
+        proximity_by_token[first].push_back(proximity_rules.size());
+        proximity_by_token[second].push_back(proximity_rules.size());
+        proximity_rules.push_back({pattern_id, first, second, window, weight,
+                                   match_prefix(pattern_id, first + " ~ " + second, weight)});
+    }
+
+    static double confidence(double score) {
+        return 1.0 - std::exp(-score / SCORE_SCALE);
+    }
+
+    // Serialização direta das listas de ocorrências e frases, que em transcrições
+    // longas têm dezenas de milhares de itens (montá-las como json domina o tempo)
+    static std::string match_prefix(const std::string& pattern_id, const std::string& keyword, double weight) {
+        return "{\"pattern_id\":" + json(pattern_id).dump() + ",\"keyword\":" + json(keyword).dump()
+             + ",\"weight\":" + json(weight).dump();
+    }
+
+    static void append_number(std::string& out, double value) {
+        char buffer[32];
+        std::snprintf(buffer, sizeof(buffer), "%.17g", value);
+        out += buffer;
+    }
+
+    static void append_matches(std::string& out, const std::vector<Match>& matches) {
+        out += '[';
+        for (size_t i = 0; i < matches.size(); ++i) {
+            const Match& match = matches[i];
+            if (i) {
+                out += ',';
+            }
+            out += *match.prefix;
+            out += ",\"start\":";
+            out += std::to_string(match.start);
+            out += ",\"end\":";
+            out += std::to_string(match.end);
+            out += ",\"sentence\":";
+            out += std::to_string(match.sentence);
+            out += match.negated ? ",\"negated\":true}" : ",\"negated\":false}";
+        }
+        out += ']';
+    }
+
+    static void append_sentences(std::string& out, const std::vector<SentenceScores>& sentences) {
+        out += '[';
+        for (size_t i = 0; i < sentences.size(); ++i) {
+            const SentenceScores& sentence = sentences[i];
+            out += i ? ",{\"end\":" : "{\"end\":";
+            out += std::to_string(sentence.end);
+            out += ",\"index\":";
+            out += std::to_string(sentence.index);
+            out += ",\"scores\":{";
+            bool first = true;
+            for (const auto& score : sentence.scores) {
+                if (!first) {
+                    out += ',';
+                }
+                first = false;
+                out += json(score.first).dump();
+                out += ':';
+                append_number(out, confidence(score.second));
+            }
+            out += "},\"start\":";
+            out += std::to_string(sentence.start);
+            out += '}';
+        }
+        out += ']';
+    }
+
 public:
     NegotiationPatternAnalyzer() {
         // Inicializar com alguns padrões comuns
@@ -328,6 +803,50 @@ public:
         pattern_descriptions["bogey"] = "Fingir que um item tem pouco valor quando na verdade é importante";
         pattern_descriptions["decoy"] = "Introdução de opção irrelevante para tornar outra mais atraente";
         pattern_descriptions["highball_lowball"] = "Oferta inicial extrema seguida de concessões planejadas";
+
+        // Palavras e frases por padrão; termos genéricos ou compartilhados têm peso baixo
+        // (mantenha em sincronia com patterns.py)
+        std::vector<std::pair<std::string, std::vector<std::pair<std::string, double>>>> keywords = {
+            {"anchoring", {{"oferta inicial", 1.0}, {"preço de referência", 0.8}, {"valor de mercado", 0.6},
+                           {"comparável", 0.5}, {"referência", 0.4}, {"inicial", 0.3}, {"oferta", 0.3},
+                           {"mercado", 0.3}, {"valor", 0.2}}},
+            {"nibbling", {{"só mais", 0.8}, {"pequeno detalhe", 0.9}, {"mais um", 0.6}, {"além disso", 0.5},
+                          {"adicional", 0.5}, {"incluir", 0.4}, {"pequeno", 0.3}, {"também", 0.2}}},
+            {"good_cop_bad_cop", {{"meu colega", 0.9}, {"colega", 0.5}, {"rígido", 0.6}, {"flexível", 0.4},
+                                  {"superior", 0.2}, {"consultar", 0.2}}},
+            {"deadline_pressure", {{"prazo final", 1.0}, {"até amanhã", 0.9}, {"urgente", 0.7}, {"prazo", 0.6},
+                                   {"imediato", 0.5}, {"amanhã", 0.3}, {"hoje", 0.3}, {"tempo", 0.2}}},
+            {"limited_authority", {{"preciso consultar", 1.0}, {"não tenho autorização", 1.2},
+                                   {"autorização", 0.6}, {"permissão", 0.6}, {"comitê", 0.5},
+                                   {"superior", 0.4}, {"consultar", 0.4}, {"limitado", 0.4}}},
+            {"emotional_appeal", {{"situação difícil", 0.9}, {"empatia", 0.6}, {"família", 0.5},
+                                  {"sentir", 0.4}, {"ajuda", 0.4}, {"difícil", 0.3}, {"situação", 0.2}}},
+            {"take_it_or_leave_it", {{"pegar ou largar", 1.5}, {"oferta final", 1.2}, {"última oferta", 1.2},
+                                     {"única opção", 1.0}, {"final", 0.4}, {"impossível", 0.4},
+                                     {"última", 0.3}, {"única", 0.3}, {"melhor", 0.2}, {"opção", 0.1}}},
+            {"bogey", {{"pouca importância", 0.9}, {"secundário", 0.6}, {"prioridade", 0.4},
+                       {"importância", 0.3}, {"relevante", 0.3}, {"valor", 0.1}}},
+            {"decoy", {{"outra alternativa", 0.6}, {"alternativa", 0.5}, {"comparar", 0.4},
+                       {"escolha", 0.3}, {"preferência", 0.3}, {"opção", 0.3}}},
+            {"highball_lowball", {{"reconsiderar", 0.6}, {"reduzir", 0.5}, {"ajustar", 0.4},
+                                  {"flexibilidade", 0.4}, {"inicial", 0.3}}}
+        };
+        for (const auto& pattern : keywords) {
+            for (const auto& keyword : pattern.second) {
+                add_keyword(pattern.first, keyword.first, keyword.second);
+            }
+        }
+
+        // Pares de termos próximos (janela em palavras)
+        add_proximity("anchoring", "oferta", "inicial", 4, 0.5);
+        add_proximity("deadline_pressure", "prazo", "amanhã", 6, 0.6);
+        add_proximity("deadline_pressure", "prazo", "hoje", 6, 0.6);
+        add_proximity("limited_authority", "consultar", "superior", 5, 0.6);
+        add_proximity("limited_authority", "autorização", "comitê", 6, 0.5);
+        add_proximity("take_it_or_leave_it", "oferta", "final", 4, 0.6);
+        add_proximity("highball_lowball", "inicial", "reduzir", 8, 0.5);
+
+        negators = {"não", "nunca", "nem", "jamais", "sem"};
     }
 
     // Adiciona um novo padrão ao analisador
@@ -336,81 +855,147 @@ public:
     }
 
     // Obtém a descrição de um padrão específico
-    std::string get_pattern_description(const std::string& pattern_id) {
-        if (pattern_descriptions.find(pattern_id) != pattern_descriptions.end()) {
-            return pattern_descriptions[pattern_id];
+    std::string get_pattern_description(const std::string& pattern_id) const {
+        auto found = pattern_descriptions.find(pattern_id);
+        if (found != pattern_descriptions.end()) {
+            return found->second;
         }
         return "Padrão desconhecido";
     }
 
-    // Analisa um texto em busca de padrões de negociação
-    json analyze_patterns(const std::string& text) {
+    // Analisa um texto em busca de padrões de negociação (retorna o JSON serializado)
+    std::string analyze_patterns(const std::string& text) const {
         json result;
         std::map<std::string, double> pattern_scores;
-        
-        // Palavras-chave associadas a cada padrão
-        std::map<std::string, std::vector<std::string>> pattern_keywords = {
-            {"anchoring", {"inicial", "oferta", "valor", "mercado", "comparável", "referência"}},
-            {"nibbling", {"adicional", "pequeno", "mais um", "também", "incluir", "além disso"}},
-            {"good_cop_bad_cop", {"colega", "consultar", "superior", "flexível", "rígido"}},
-            {"deadline_pressure", {"prazo", "tempo", "urgente", "amanhã", "hoje", "imediato"}},
-            {"limited_authority", {"autorização", "superior", "consultar", "permissão", "limitado"}},
-            {"emotional_appeal", {"sentir", "família", "difícil", "situação", "ajuda", "empatia"}},
-            {"take_it_or_leave_it", {"final", "última", "melhor", "impossível", "única", "opção"}},
-            {"bogey", {"importância", "relevante", "secundário", "prioridade", "valor"}},
-            {"decoy", {"alternativa", "opção", "comparar", "escolha", "preferência"}},
-            {"highball_lowball", {"inicial", "reduzir", "ajustar", "flexibilidade", "reconsiderar"}}
+        for (const auto& pattern : pattern_descriptions) {
+            pattern_scores[pattern.first] = 0.0;
+        }
+
+        std::vector<Match> matches;
+        std::vector<SentenceScores> sentences;
+
+        // Estado da frase atual
+        std::deque<RecentToken> recent;
+        std::unordered_map<std::string, std::pair<size_t, size_t>> last_seen;  // termo -> (posição, início)
+        std::map<std::string, double> sentence_scores;
+        size_t position = 0;
+        size_t sentence_start = 0;
+        size_t sentence_end = 0;
+        int sentence_index = -1;
+
+        auto flush_sentence = [&]() {
+            if (!sentence_scores.empty()) {
+                sentences.push_back({sentence_index, sentence_start, sentence_end, sentence_scores});
+            }
         };
-        
-        // Normalizar o texto
-        std::string normalized_text = text;
-        std::transform(normalized_text.begin(), normalized_text.end(), normalized_text.begin(),
-            [](unsigned char c) { return std::tolower(c); });
-        
-        // Analisar cada padrão
-        for (const auto& pattern : pattern_keywords) {
-            int keyword_count = 0;
-            
-            // Contar ocorrências de palavras-chave
-            for (const auto& keyword : pattern.second) {
-                size_t pos = 0;
-                while ((pos = normalized_text.find(keyword, pos)) != std::string::npos) {
-                    keyword_count++;
-                    pos += keyword.length();
+
+        // Há negação nas palavras que antecedem a posição ``first`` de ``recent``?
+        auto is_negated = [&](size_t first) {
+            for (size_t i = first > NEGATION_WINDOW ? first - NEGATION_WINDOW : 0; i < first; ++i) {
+                if (recent[i].negator) {
+                    return true;
                 }
             }
-            
-            // Calcular pontuação baseada na frequência de palavras-chave
-            double score = 0.0;
-            if (!pattern.second.empty()) {
-                score = (double)keyword_count / pattern.second.size();
+            return false;
+        };
+
+        auto record = [&](const std::string& pattern_id, const std::string& prefix, size_t start, size_t end,
+                          double weight, bool negated) {
+            matches.push_back({&prefix, start, end, sentence_index, negated});
+            if (!negated) {
+                pattern_scores[pattern_id] += weight;
+                sentence_scores[pattern_id] += weight;
             }
-            
-            pattern_scores[pattern.first] = score;
-        }
-        
-        // Identificar os padrões mais prováveis (pontuação > 0.3)
+        };
+
+        for_each_token(text, [&](const Token& token) {
+            if (token.sentence_start) {
+                flush_sentence();
+                recent.clear();
+                last_seen.clear();
+                sentence_scores.clear();
+                position = 0;
+                sentence_start = token.start;
+                ++sentence_index;
+            }
+            sentence_end = token.end;
+
+            recent.push_back({token.text, token.start, negators.count(token.text) > 0});
+            if (recent.size() > max_phrase_length + NEGATION_WINDOW) {
+                recent.pop_front();
+            }
+
+            // Palavras e frases que terminam nesta palavra
+            auto candidates = rules_by_last_token.find(token.text);
+            if (candidates != rules_by_last_token.end()) {
+                for (size_t rule_index : candidates->second) {
+                    const KeywordRule& rule = keyword_rules[rule_index];
+                    if (rule.tokens.size() > recent.size()) {
+                        continue;
+                    }
+                    size_t first = recent.size() - rule.tokens.size();
+                    bool matched = true;
+                    for (size_t i = 0; matched && i + 1 < rule.tokens.size(); ++i) {
+                        matched = recent[first + i].text == rule.tokens[i];
+                    }
+                    if (matched) {
+                        record(rule.pattern_id, rule.match_prefix, recent[first].start, token.end,
+                               rule.weight, is_negated(first));
+                    }
+                }
+            }
+
+            // Pares de termos próximos
+            auto pairs = proximity_by_token.find(token.text);
+            if (pairs != proximity_by_token.end()) {
+                for (size_t rule_index : pairs->second) {
+                    const ProximityRule& rule = proximity_rules[rule_index];
+                    const std::string& other = token.text == rule.first ? rule.second : rule.first;
+                    auto seen = last_seen.find(other);
+                    if (seen != last_seen.end() && position - seen->second.first <= rule.window) {
+                        record(rule.pattern_id, rule.match_prefix, seen->second.second, token.end,
+                               rule.weight, is_negated(recent.size() - 1));
+                    }
+                }
+                last_seen[token.text] = {position, token.start};
+            }
+            ++position;
+        });
+        flush_sentence();
+
+        // Identificar os padrões mais prováveis
         json detected_patterns = json::array();
+        json all_scores = json::object();
         for (const auto& score : pattern_scores) {
-            if (score.second > 0.3) {
+            double pattern_confidence = confidence(score.second);
+            all_scores[score.first] = pattern_confidence;
+            if (pattern_confidence > DETECTION_THRESHOLD) {
                 detected_patterns.push_back({
                     {"pattern_id", score.first},
-                    {"description", pattern_descriptions[score.first]},
-                    {"confidence", score.second}
+                    {"description", get_pattern_description(score.first)},
+                    {"confidence", pattern_confidence}
                 });
             }
         }
         
         // Ordenar por confiança (decrescente)
-        std::sort(detected_patterns.begin(), detected_patterns.end(),
+        std::stable_sort(detected_patterns.begin(), detected_patterns.end(),
                  [](const json& a, const json& b) {
                      return a["confidence"] > b["confidence"];
                  });
         
         result["detected_patterns"] = detected_patterns;
-        result["all_scores"] = pattern_scores;
+        result["all_scores"] = all_scores;
         
-        return result;
+        // Acrescentar as listas grandes ao objeto já serializado
+        std::string output = result.dump();
+        output.pop_back();
+        output += ",\"matches\":";
+        append_matches(output, matches);
+        output += ",\"sentences\":";
+        append_sentences(output, sentences);
+        output += '}';
+        return output;
     }
 
     // Sugere respostas para padrões detectados
@@ -481,15 +1066,40 @@ public:
     }
 };
 
+// Instância compartilhada do analisador de texto (inicializada uma única vez)
+static TextAnalyzer& text_analyzer() {
+    static TextAnalyzer analyzer;
+    return analyzer;
+}
+
 // Função principal para demonstração
 extern "C" {
     // Função para análise de texto
     const char* analyze_negotiation_text(const char* text) {
-        static std::string result_str;
+        // Um buffer por thread: a função pode ser chamada em paralelo
+        static thread_local std::string result_str;
+        
+        try {
+            json result = text_analyzer().analyze_text(text);
+            result_str = result.dump();
+            return result_str.c_str();
+        } catch (const std::exception& e) {
+            json error = {{
+                "error", true
+            }, {
+                "message", e.what()
+            }};
+            result_str = error.dump();
+            return result_str.c_str();
+        }
+    }
+    
+    // Função para carregar (ou recarregar) o léxico compilado
+    const char* load_lexicon(const char* path) {
+        static thread_local std::string result_str;
         
         try {
-            TextAnalyzer analyzer;
-            json result = analyzer.analyze_text(text);
+            json result = text_analyzer().load_lexicon(path);
             result_str = result.dump();
             return result_str.c_str();
         } catch (const std::exception& e) {
@@ -576,12 +1186,12 @@ extern "C" {
     
     // Função para detectar padrões de negociação
     const char* detect_negotiation_patterns(const char* text) {
-        static std::string result_str;
+        static thread_local std::string result_str;
+        // Regras montadas uma única vez; a análise não altera o analisador
+        static const NegotiationPatternAnalyzer analyzer;
         
         try {
-            NegotiationPatternAnalyzer analyzer;
-            json result = analyzer.analyze_patterns(text);
-            result_str = result.dump();
+            result_str = analyzer.analyze_patterns(text);
             return result_str.c_str();
         } catch (const std::exception& e) {
             json error = {{
@@ -621,11 +1231,686 @@ extern "C" {
     }
 }
 
-// Função main para testes locais
-int main() {
-    std::cout << "Módulo C++ de Processamento de Negociação" << std::endl;
-    std::cout << "Este módulo é compilado como uma biblioteca compartilhada" << std::endl;
-    std::cout << "para ser utilizado pelo backend Python." << std::endl;
-    
+#ifdef STANDALONE_TEST
+// Harness de benchmark nativo (executável test_processor)
+//
+// Segue a interface do Google Benchmark -- laço `for (auto _ : state)`, flags
+// --benchmark_* e saída JSON compatível com tools/compare.py -- sem depender
+// da biblioteca: o número de iterações é calibrado até atingir o tempo mínimo
+// e cada repetição extra entra na média, mediana e desvio padrão.
+//
+// Uso:
+//   test_processor [--benchmark_filter=REGEX] [--benchmark_min_time=0.5]
+//                  [--benchmark_repetitions=N] [--benchmark_format=console|json]
+//                  [--benchmark_out=ARQUIVO] [--benchmark_list_tests]
+//                  [--corpus=ARQUIVO.jsonl] [--lexicon=lib/lexicon.bin]
+//
+// Sem --corpus, os textos são gerados com as mesmas frases de
+// benchmarks/corpus.py; `python benchmarks/corpus.py export` grava o corpus
+// usado pelos benchmarks em Python para comparar as duas medições.
+#include <functional>
+#include <regex>
+#include <ctime>
+#include <iomanip>
+
+namespace benchmark {
+
+// Impede que o compilador descarte um resultado que não é usado
+template <typename T>
+inline void do_not_optimize(const T& value) {
+    asm volatile("" : : "r,m"(value) : "memory");
+}
+
+inline double thread_cpu_seconds() {
+#ifndef _WIN32
+    timespec spec;
+    clock_gettime(CLOCK_THREAD_CPUTIME_ID, &spec);
+    return spec.tv_sec + spec.tv_nsec / 1e9;
+#else
+    return std::clock() / (double)CLOCKS_PER_SEC;
+#endif
+}
+
+// Estado de uma execução: controla as iterações e mede o tempo do laço
+class State {
+public:
+    struct __attribute__((unused)) Value {};
+
+    struct Iterator {
+        State* state;
+        size_t remaining;
+
+        bool operator!=(const Iterator&) const {
+            if (remaining != 0) {
+                return true;
+            }
+            state->finish();
+            return false;
+        }
+        void operator++() { --remaining; }
+        Value operator*() const { return Value(); }
+    };
+
+    State(size_t iterations, int64_t arg, int thread_index, int threads)
+        : iterations_(iterations), arg_(arg), thread_index_(thread_index), threads_(threads) {}
+
+    Iterator begin() {
+        cpu_start = thread_cpu_seconds();
+        timer.start();
+        return Iterator{this, iterations_};
+    }
+    Iterator end() { return Iterator{this, 0}; }
+
+    int64_t range() const { return arg_; }
+    size_t iterations() const { return iterations_; }
+    int thread_index() const { return thread_index_; }
+    int threads() const { return threads_; }
+
+    void set_bytes_processed(int64_t bytes) { bytes_processed = bytes; }
+    void set_items_processed(int64_t items) { items_processed = items; }
+    void set_label(const std::string& text) { label = text; }
+
+    double real_seconds = 0;
+    double cpu_seconds = 0;
+    int64_t bytes_processed = 0;
+    int64_t items_processed = 0;
+    std::string label;
+
+private:
+    void finish() {
+        timer.stop();
+        real_seconds = timer.elapsed_seconds();
+        cpu_seconds = thread_cpu_seconds() - cpu_start;
+    }
+
+    size_t iterations_;
+    int64_t arg_;
+    int thread_index_;
+    int threads_;
+    PrecisionTimer timer;
+    double cpu_start = 0;
+};
+
+struct Benchmark {
+    std::string name;
+    std::function<void(State&)> function;
+    int64_t arg;
+    int threads;
+};
+
+// Resultado de uma repetição (run_type "iteration") ou agregado entre elas
+struct Run {
+    std::string name;
+    std::string run_name;
+    std::string aggregate_name;
+    int repetition_index;
+    int threads;
+    size_t iterations;
+    double real_ns;
+    double cpu_ns;
+    double bytes_per_second;
+    double items_per_second;
+    std::string label;
+};
+
+struct Options {
+    std::string filter = ".";
+    double min_time = 0.5;
+    int repetitions = 1;
+    std::string format = "console";
+    std::string out;
+    std::string out_format = "json";
+    bool list_tests = false;
+    std::string corpus;
+    std::string lexicon;
+};
+
+inline std::vector<Benchmark>& registry() {
+    static std::vector<Benchmark> benchmarks;
+    return benchmarks;
+}
+
+// Registra uma variação por argumento e por número de threads (nomes como no Google Benchmark)
+inline void register_benchmark(const std::string& name, std::function<void(State&)> function,
+                               const std::vector<int64_t>& args, const std::vector<int>& threads = {1}) {
+    for (int64_t arg : args.empty() ? std::vector<int64_t>{-1} : args) {
+        for (int thread_count : threads) {
+            std::string full_name = name;
+            if (arg >= 0) {
+                full_name += "/" + std::to_string(arg);
+            }
+            if (thread_count > 1) {
+                full_name += "/threads:" + std::to_string(thread_count);
+            }
+            registry().push_back({full_name, function, arg, thread_count});
+        }
+    }
+}
+
+// Executa `iterations` iterações em cada thread do benchmark.
+//
+// O tempo real é a média do tempo de cada thread dividida pelas iterações
+// de uma thread; o tempo de CPU e as vazões somam o trabalho de todas elas.
+inline Run run_iterations(const Benchmark& benchmark, size_t iterations) {
+    std::vector<State> states;
+    for (int i = 0; i < benchmark.threads; ++i) {
+        states.emplace_back(iterations, benchmark.arg, i, benchmark.threads);
+    }
+    if (benchmark.threads == 1) {
+        benchmark.function(states[0]);
+    } else {
+        std::vector<std::thread> workers;
+        for (State& state : states) {
+            workers.emplace_back([&benchmark, &state] { benchmark.function(state); });
+        }
+        for (std::thread& worker : workers) {
+            worker.join();
+        }
+    }
+
+    double real_seconds = 0, cpu_seconds = 0, bytes = 0, items = 0;
+    for (const State& state : states) {
+        real_seconds += state.real_seconds / states.size();
+        cpu_seconds += state.cpu_seconds;
+        bytes += state.bytes_processed;
+        items += state.items_processed;
+    }
+    Run run;
+    run.name = run.run_name = benchmark.name;
+    run.repetition_index = 0;
+    run.threads = benchmark.threads;
+    run.iterations = iterations * benchmark.threads;
+    run.real_ns = real_seconds * 1e9 / iterations;
+    run.cpu_ns = cpu_seconds * 1e9 / run.iterations;
+    run.bytes_per_second = real_seconds > 0 ? bytes / real_seconds : 0;
+    run.items_per_second = real_seconds > 0 ? items / real_seconds : 0;
+    run.label = states[0].label;
+    return run;
+}
+
+// Aumenta as iterações até a execução durar pelo menos `min_time` e repete a medição
+inline std::vector<Run> run_benchmark(const Benchmark& benchmark, const Options& options) {
+    const size_t max_iterations = 1000000000;
+    size_t iterations = 1;
+    Run run;
+    while (true) {
+        run = run_iterations(benchmark, iterations);
+        double seconds = run.real_ns * iterations / 1e9;
+        if (seconds >= options.min_time || iterations >= max_iterations) {
+            break;
+        }
+        double multiplier = options.min_time * 1.4 / std::max(seconds, 1e-9);
+        if (seconds / options.min_time <= 0.1) {
+            multiplier = std::min(multiplier, 10.0);
+        }
+        iterations = std::min(max_iterations, std::max(iterations + 1, (size_t)(iterations * multiplier)));
+    }
+
+    std::vector<Run> runs = {run};
+    for (int i = 1; i < options.repetitions; ++i) {
+        runs.push_back(run_iterations(benchmark, iterations));
+        runs.back().repetition_index = i;
+    }
+    if (runs.size() < 2) {
+        return runs;
+    }
+
+    auto aggregate = [&](const std::string& aggregate_name, std::function<double(std::vector<double>)> statistic) {
+        Run result = runs[0];
+        result.name = benchmark.name + "_" + aggregate_name;
+        result.aggregate_name = aggregate_name;
+        result.repetition_index = -1;
+        auto values = [&](double Run::*field) {
+            std::vector<double> collected;
+            for (const Run& each : runs) {
+                collected.push_back(each.*field);
+            }
+            return statistic(collected);
+        };
+        result.real_ns = values(&Run::real_ns);
+        result.cpu_ns = values(&Run::cpu_ns);
+        result.bytes_per_second = values(&Run::bytes_per_second);
+        result.items_per_second = values(&Run::items_per_second);
+        return result;
+    };
+    auto mean = [](std::vector<double> values) {
+        double sum = 0;
+        for (double value : values) {
+            sum += value;
+        }
+        return sum / values.size();
+    };
+    auto median = [](std::vector<double> values) {
+        std::sort(values.begin(), values.end());
+        size_t middle = values.size() / 2;
+        return values.size() % 2 ? values[middle] : (values[middle - 1] + values[middle]) / 2;
+    };
+    auto stddev = [&mean](std::vector<double> values) {
+        double average = mean(values);
+        double sum = 0;
+        for (double value : values) {
+            sum += (value - average) * (value - average);
+        }
+        return std::sqrt(sum / (values.size() - 1));
+    };
+    std::vector<Run> aggregates = {aggregate("mean", mean), aggregate("median", median), aggregate("stddev", stddev)};
+    runs.insert(runs.end(), aggregates.begin(), aggregates.end());
+    return runs;
+}
+
+inline std::string human_rate(double value) {
+    const char* units[] = {"", "k", "M", "G", "T"};
+    size_t unit = 0;
+    while (value >= 1000 && unit < 4) {
+        value /= 1000;
+        ++unit;
+    }
+    std::ostringstream out;
+    out << std::fixed << std::setprecision(unit ? 2 : 0) << value << units[unit];
+    return out.str();
+}
+
+inline std::string iso_date() {
+    std::time_t now = std::time(nullptr);
+    char buffer[32];
+    std::strftime(buffer, sizeof(buffer), "%Y-%m-%dT%H:%M:%S%z", std::localtime(&now));
+    return buffer;
+}
+
+inline json context(const Options& options, const std::string& executable) {
+    return {
+        {"date", iso_date()},
+        {"executable", executable},
+        {"num_cpus", std::thread::hardware_concurrency()},
+#ifdef NDEBUG
+        {"library_build_type", "release"},
+#else
+        {"library_build_type", "debug"},
+#endif
+#ifdef NP_BUILD_CONFIG
+        {"build_config", NP_BUILD_CONFIG},
+#endif
+        {"corpus", options.corpus.empty() ? "gerado" : options.corpus},
+        {"lexicon", options.lexicon.empty() ? "embutido" : options.lexicon}
+    };
+}
+
+inline void write_console_header(std::ostream& out, const json& info) {
+    out << info["date"].get<std::string>() << "\n"
+        << "Executando " << info["executable"].get<std::string>() << "\n"
+        << "Run on (" << info["num_cpus"].get<unsigned>() << " X CPU)";
+    if (info.contains("build_config")) {
+        out << " [" << info["build_config"].get<std::string>() << "]";
+    }
+    out << "\n" << std::string(100, '-') << "\n"
+        << std::left << std::setw(50) << "Benchmark" << std::right << std::setw(11) << "Time"
+        << std::setw(14) << "CPU" << std::setw(17) << "Iterations" << " UserCounters...\n"
+        << std::string(100, '-') << "\n";
+}
+
+inline void write_console_run(std::ostream& out, const Run& run) {
+    out << std::left << std::setw(50) << run.name << std::right << std::fixed << std::setprecision(0)
+        << std::setw(11) << run.real_ns << " ns" << std::setw(11) << run.cpu_ns << " ns"
+        << std::setw(14) << (run.aggregate_name.empty() ? std::to_string(run.iterations) : "");
+    if (run.bytes_per_second > 0) {
+        out << " bytes_per_second=" << human_rate(run.bytes_per_second) << "/s";
+    }
+    if (run.items_per_second > 0) {
+        out << " items_per_second=" << human_rate(run.items_per_second) << "/s";
+    }
+    if (!run.label.empty()) {
+        out << " " << run.label;
+    }
+    out << std::endl;
+}
+
+inline json run_to_json(const Run& run, const Options& options) {
+    json entry = {
+        {"name", run.name},
+        {"run_name", run.run_name},
+        {"run_type", run.aggregate_name.empty() ? "iteration" : "aggregate"},
+        {"repetitions", options.repetitions},
+        {"threads", run.threads},
+        {"iterations", run.iterations},
+        {"real_time", run.real_ns},
+        {"cpu_time", run.cpu_ns},
+        {"time_unit", "ns"}
+    };
+    if (run.aggregate_name.empty()) {
+        entry["repetition_index"] = run.repetition_index;
+    } else {
+        entry["aggregate_name"] = run.aggregate_name;
+    }
+    if (run.bytes_per_second > 0) {
+        entry["bytes_per_second"] = run.bytes_per_second;
+    }
+    if (run.items_per_second > 0) {
+        entry["items_per_second"] = run.items_per_second;
+    }
+    if (!run.label.empty()) {
+        entry["label"] = run.label;
+    }
+    return entry;
+}
+
+}  // namespace benchmark
+
+namespace corpus {
+
+// Mesmas frases de benchmarks/corpus.py
+const char* const SUBJECTS[] = {"Nossa empresa", "O comitê de compras", "A diretoria", "Nosso time jurídico",
+                                "O fornecedor", "A equipe comercial", "Meu superior", "O cliente"};
+
+const char* const SENTENCES[] = {
+    "{subject} entende que a oferta inicial está acima do valor de mercado.",
+    "Precisamos de uma solução que gere benefício mútuo para ambos os lados.",
+    "{subject} não tem autorização para aprovar um desconto maior sem consultar o superior.",
+    "O prazo para aceitação é amanhã, então a decisão precisa ser imediata.",
+    "Esta é nossa oferta final e a única opção que conseguimos sustentar.",
+    "Gostaríamos de incluir um pequeno serviço adicional, além disso o frete.",
+    "Existe um risco claro de conflito se o custo continuar subindo.",
+    "Juntos podemos construir uma parceria de longo prazo com sinergia real.",
+    "Certamente é essencial garantir a qualidade exigida no contrato.",
+    "Podemos reconsiderar o volume e ajustar a flexibilidade dos pagamentos.",
+    "A referência comparável que temos aponta um valor {number}% menor.",
+    "Entendo a situação difícil da sua família, mas precisamos de ajuda nos termos.",
+    "Vamos comparar essa alternativa com a nossa preferência inicial.",
+    "O item de suporte tem importância secundária para nós, não é prioridade.",
+    "Nossa BATNA inclui um fornecedor alternativo com entrega em {number} dias.",
+    "Houve uma perda de {number}% na margem no último trimestre, o que gera tensão.",
+    "Propomos compartilhar o ganho de eficiência em conjunto com a sua equipe.",
+    "Não é possível melhorar o preço, mas podemos estender a garantia em {number} dias.",
+    "Precisamos de um acordo que seja vantajoso e traga sucesso para a cooperação.",
+    "O problema do atraso gerou uma disputa que precisa de uma solução rápida."
+};
+
+const char* const FILLERS[] = {"Bom dia a todos.", "Conforme conversamos na última reunião,",
+                               "Obrigado pelo retorno.", "Em resumo,", "Fico no aguardo.",
+                               "Sobre o ponto anterior,"};
+
+// Gerador pseudoaleatório simples (xorshift64*), determinístico entre plataformas
+class Random {
+public:
+    explicit Random(uint64_t seed) : state(seed * 2654435761u + 1) {}
+
+    size_t next(size_t bound) {
+        state ^= state >> 12;
+        state ^= state << 25;
+        state ^= state >> 27;
+        return (size_t)((state * 2685821657736338717ull) >> 33) % bound;
+    }
+
+private:
+    uint64_t state;
+};
+
+template <typename T, size_t N>
+const char* choice(Random& random, T (&options)[N]) {
+    return options[random.next(N)];
+}
+
+// Gera um texto de negociação com aproximadamente `size` bytes
+inline std::string build_text(size_t size, uint64_t seed) {
+    Random random(seed);
+    std::string text;
+    while (text.size() < size) {
+        std::string sentence = random.next(100) < 15 ? choice(random, FILLERS) : choice(random, SENTENCES);
+        size_t pos;
+        if ((pos = sentence.find("{subject}")) != std::string::npos) {
+            sentence.replace(pos, 9, choice(random, SUBJECTS));
+        }
+        if ((pos = sentence.find("{number}")) != std::string::npos) {
+            sentence.replace(pos, 8, std::to_string(3 + random.next(88)));
+        }
+        if (!text.empty()) {
+            text += random.next(100) < 20 ? "\n\n" : " ";
+        }
+        text += sentence;
+    }
+    return text;
+}
+
+// Lê um corpus em JSON Lines: cada linha é uma string ou um objeto com "text"
+inline std::vector<std::string> load(const std::string& path) {
+    std::ifstream file(path);
+    if (!file) {
+        throw std::runtime_error("Não foi possível abrir o corpus: " + path);
+    }
+    std::vector<std::string> documents;
+    std::string line;
+    while (std::getline(file, line)) {
+        if (line.empty()) {
+            continue;
+        }
+        json document = json::parse(line);
+        documents.push_back(document.is_string() ? document.get<std::string>() : document.at("text").get<std::string>());
+    }
+    if (documents.empty()) {
+        throw std::runtime_error("Corpus vazio: " + path);
+    }
+    return documents;
+}
+
+// Concatena os documentos até `size` bytes, sem cortar um caractere UTF-8 ao meio
+inline std::string concatenate(const std::vector<std::string>& documents, size_t size) {
+    std::string text;
+    for (size_t i = 0; text.size() < size; i = (i + 1) % documents.size()) {
+        if (!text.empty()) {
+            text += "\n\n";
+        }
+        text += documents[i];
+    }
+    size_t end = size;
+    while (end > 0 && ((unsigned char)text[end] & 0xC0) == 0x80) {
+        --end;
+    }
+    text.resize(end);
+    return text;
+}
+
+}  // namespace corpus
+
+static void register_benchmarks(const std::vector<std::string>& documents) {
+    using benchmark::State;
+    using benchmark::do_not_optimize;
+
+    // Textos de 1 KiB (e-mail) a 16 MiB (lote de transcrições), montados uma única vez
+    const std::vector<int64_t> sizes = {1 << 10, 1 << 16, 1 << 20, 1 << 24};
+    auto texts = std::make_shared<std::map<int64_t, std::string>>();
+    for (int64_t size : sizes) {
+        (*texts)[size] = corpus::concatenate(documents, (size_t)size);
+    }
+    size_t corpus_bytes = 0;
+    for (const std::string& document : documents) {
+        corpus_bytes += document.size();
+    }
+
+    benchmark::register_benchmark("BM_Tokenize", [texts](State& state) {
+        const std::string& text = texts->at(state.range());
+        for (auto _ : state) {
+            size_t characters = 0;
+            size_t words = for_each_token(text, [&](const Token& token) { characters += token.text.size(); });
+            do_not_optimize(words);
+            do_not_optimize(characters);
+        }
+        state.set_bytes_processed((int64_t)(state.iterations() * text.size()));
+    }, sizes);
+
+    benchmark::register_benchmark("BM_AnalyzeText", [texts](State& state) {
+        const std::string& text = texts->at(state.range());
+        for (auto _ : state) {
+            json result = text_analyzer().analyze_text(text);
+            do_not_optimize(result);
+        }
+        state.set_bytes_processed((int64_t)(state.iterations() * text.size()));
+    }, sizes);
+
+    // Caminho completo usado pelo Python: cópia do texto, análise e serialização do JSON
+    benchmark::register_benchmark("BM_AnalyzeNegotiationText", [texts](State& state) {
+        const std::string& text = texts->at(state.range());
+        for (auto _ : state) {
+            const char* result = analyze_negotiation_text(text.c_str());
+            do_not_optimize(result);
+        }
+        state.set_bytes_processed((int64_t)(state.iterations() * text.size()));
+    }, sizes);
+
+    benchmark::register_benchmark("BM_DetectNegotiationPatterns", [texts](State& state) {
+        const std::string& text = texts->at(state.range());
+        for (auto _ : state) {
+            const char* result = detect_negotiation_patterns(text.c_str());
+            do_not_optimize(result);
+        }
+        state.set_bytes_processed((int64_t)(state.iterations() * text.size()));
+    }, sizes);
+
+    // Chamadas concorrentes, como nos pools de threads do servidor ASGI
+    benchmark::register_benchmark("BM_DetectNegotiationPatterns", [texts](State& state) {
+        const std::string& text = texts->at(state.range());
+        for (auto _ : state) {
+            const char* result = detect_negotiation_patterns(text.c_str());
+            do_not_optimize(result);
+        }
+        state.set_bytes_processed((int64_t)(state.iterations() * text.size()));
+    }, {1 << 16}, {2, 4, 8});
+
+    // Corpus documento a documento, com as duas análises feitas pela rota /api/analyze
+    benchmark::register_benchmark("BM_AnalyzeCorpus", [documents, corpus_bytes](State& state) {
+        for (auto _ : state) {
+            for (const std::string& document : documents) {
+                do_not_optimize(analyze_negotiation_text(document.c_str()));
+                do_not_optimize(detect_negotiation_patterns(document.c_str()));
+            }
+        }
+        state.set_items_processed((int64_t)(state.iterations() * documents.size()));
+        state.set_bytes_processed((int64_t)(state.iterations() * corpus_bytes));
+        state.set_label(std::to_string(documents.size()) + " documentos");
+    }, {});
+}
+
+static bool parse_flag(const std::string& argument, const std::string& name, std::string& value) {
+    std::string prefix = "--" + name + "=";
+    if (argument.compare(0, prefix.size(), prefix) != 0) {
+        return false;
+    }
+    value = argument.substr(prefix.size());
+    return true;
+}
+
+int main(int argc, char** argv) {
+    benchmark::Options options;
+    for (int i = 1; i < argc; ++i) {
+        std::string argument = argv[i], value;
+        if (parse_flag(argument, "benchmark_filter", value)) {
+            options.filter = value;
+        } else if (parse_flag(argument, "benchmark_min_time", value)) {
+            // Aceita "0.5" e "0.5s", como o Google Benchmark
+            options.min_time = std::stod(value);
+        } else if (parse_flag(argument, "benchmark_repetitions", value)) {
+            options.repetitions = std::max(1, std::stoi(value));
+        } else if (parse_flag(argument, "benchmark_format", value)) {
+            options.format = value;
+        } else if (parse_flag(argument, "benchmark_out", value)) {
+            options.out = value;
+        } else if (parse_flag(argument, "benchmark_out_format", value)) {
+            options.out_format = value;
+        } else if (argument == "--benchmark_list_tests" || argument == "--benchmark_list_tests=true") {
+            options.list_tests = true;
+        } else if (parse_flag(argument, "corpus", value)) {
+            options.corpus = value;
+        } else if (parse_flag(argument, "lexicon", value)) {
+            options.lexicon = value;
+        } else {
+            std::cerr << "Opção desconhecida: " << argument << "\n"
+                      << "Uso: " << argv[0] << " [--benchmark_filter=REGEX] [--benchmark_min_time=SEGUNDOS]"
+                      << " [--benchmark_repetitions=N] [--benchmark_format=console|json]"
+                      << " [--benchmark_out=ARQUIVO] [--benchmark_out_format=console|json]"
+                      << " [--benchmark_list_tests] [--corpus=ARQUIVO.jsonl] [--lexicon=ARQUIVO]" << std::endl;
+            return 1;
+        }
+    }
+    for (const std::string& format : {options.format, options.out_format}) {
+        if (format != "console" && format != "json") {
+            std::cerr << "Formato inválido: " << format << std::endl;
+            return 1;
+        }
+    }
+
+    std::vector<std::string> documents;
+    try {
+        if (options.corpus.empty()) {
+            // Documentos de tamanhos variados, de um e-mail curto a uma reunião longa
+            corpus::Random random(42);
+            for (uint64_t seed = 0; seed < 200; ++seed) {
+                documents.push_back(corpus::build_text(500 + random.next(12000), seed));
+            }
+        } else {
+            documents = corpus::load(options.corpus);
+        }
+    } catch (const std::exception& e) {
+        std::cerr << e.what() << std::endl;
+        return 1;
+    }
+    if (!options.lexicon.empty()) {
+        json loaded = json::parse(load_lexicon(options.lexicon.c_str()));
+        if (loaded.contains("error")) {
+            std::cerr << "Erro ao carregar o léxico: " << loaded["message"].get<std::string>() << std::endl;
+            return 1;
+        }
+    }
+
+    register_benchmarks(documents);
+    std::regex filter(options.filter);
+    std::vector<benchmark::Benchmark> selected;
+    for (const benchmark::Benchmark& each : benchmark::registry()) {
+        if (std::regex_search(each.name, filter)) {
+            selected.push_back(each);
+        }
+    }
+    if (options.list_tests) {
+        for (const benchmark::Benchmark& each : selected) {
+            std::cout << each.name << "\n";
+        }
+        return 0;
+    }
+
+    json info = benchmark::context(options, argv[0]);
+    json report = {{"context", info}, {"benchmarks", json::array()}};
+    bool console = options.format == "console";
+    if (console) {
+        benchmark::write_console_header(std::cout, info);
+    }
+    std::ostringstream console_out;
+    bool console_file = !options.out.empty() && options.out_format == "console";
+    if (console_file) {
+        benchmark::write_console_header(console_out, info);
+    }
+    for (const benchmark::Benchmark& each : selected) {
+        for (const benchmark::Run& run : benchmark::run_benchmark(each, options)) {
+            if (console) {
+                benchmark::write_console_run(std::cout, run);
+            }
+            if (console_file) {
+                benchmark::write_console_run(console_out, run);
+            }
+            report["benchmarks"].push_back(benchmark::run_to_json(run, options));
+        }
+    }
+    if (!console) {
+        std::cout << report.dump(2) << std::endl;
+    }
+    if (!options.out.empty()) {
+        std::ofstream out(options.out);
+        if (!out) {
+            std::cerr << "Não foi possível gravar " << options.out << std::endl;
+            return 1;
+        }
+        if (options.out_format == "json") {
+            out << report.dump(2) << std::endl;
+        } else {
+            out << console_out.str();
+        }
+    }
     return 0;
 }
+#endif
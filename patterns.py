@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Pontuação de padrões de negociação (espelho do NegotiationPatternAnalyzer).
+
+Implementação em Python usada como fallback quando o módulo C++ não está
+disponível. As regras, a normalização do texto e o cálculo das pontuações
+são os mesmos do módulo nativo, de modo que os dois produzem o mesmo
+resultado; ao alterar as regras, altere também negotiation_processor.cpp.
+"""
+
+import math
+from typing import Any, Dict, List, Tuple
+
+import lexicon
+
+PATTERN_DESCRIPTIONS = {
+    'anchoring': 'Uso de âncora inicial extrema para influenciar percepção de valor',
+    'nibbling': 'Pedidos pequenos adicionais após acordo principal',
+    'good_cop_bad_cop': 'Alternância entre posições duras e conciliatórias',
+    'deadline_pressure': 'Uso de prazos para forçar concessões',
+    'limited_authority': 'Alegação de autoridade limitada para decisão',
+    'emotional_appeal': 'Uso de apelos emocionais para influenciar decisões',
+    'take_it_or_leave_it': 'Apresentação de proposta final sem negociação',
+    'bogey': 'Fingir que um item tem pouco valor quando na verdade é importante',
+    'decoy': 'Introdução de opção irrelevante para tornar outra mais atraente',
+    'highball_lowball': 'Oferta inicial extrema seguida de concessões planejadas',
+}
+
+# Palavras e frases por padrão; termos genéricos ou compartilhados têm peso baixo
+KEYWORDS: List[Tuple[str, List[Tuple[str, float]]]] = [
+    ('anchoring', [('oferta inicial', 1.0), ('preço de referência', 0.8), ('valor de mercado', 0.6),
+                   ('comparável', 0.5), ('referência', 0.4), ('inicial', 0.3), ('oferta', 0.3),
+                   ('mercado', 0.3), ('valor', 0.2)]),
+    ('nibbling', [('só mais', 0.8), ('pequeno detalhe', 0.9), ('mais um', 0.6), ('além disso', 0.5),
+                  ('adicional', 0.5), ('incluir', 0.4), ('pequeno', 0.3), ('também', 0.2)]),
+    ('good_cop_bad_cop', [('meu colega', 0.9), ('colega', 0.5), ('rígido', 0.6), ('flexível', 0.4),
+                          ('superior', 0.2), ('consultar', 0.2)]),
+    ('deadline_pressure', [('prazo final', 1.0), ('até amanhã', 0.9), ('urgente', 0.7), ('prazo', 0.6),
+                           ('imediato', 0.5), ('amanhã', 0.3), ('hoje', 0.3), ('tempo', 0.2)]),
+    ('limited_authority', [('preciso consultar', 1.0), ('não tenho autorização', 1.2),
+                           ('autorização', 0.6), ('permissão', 0.6), ('comitê', 0.5),
+                           ('superior', 0.4), ('consultar', 0.4), ('limitado', 0.4)]),
+    ('emotional_appeal', [('situação difícil', 0.9), ('empatia', 0.6), ('família', 0.5),
+                          ('sentir', 0.4), ('ajuda', 0.4), ('difícil', 0.3), ('situação', 0.2)]),
+    ('take_it_or_leave_it', [('pegar ou largar', 1.5), ('oferta final', 1.2), ('última oferta', 1.2),
+                             ('única opção', 1.0), ('final', 0.4), ('impossível', 0.4),
+                             ('última', 0.3), ('única', 0.3), ('melhor', 0.2), ('opção', 0.1)]),
+    ('bogey', [('pouca importância', 0.9), ('secundário', 0.6), ('prioridade', 0.4),
+               ('importância', 0.3), ('relevante', 0.3), ('valor', 0.1)]),
+    ('decoy', [('outra alternativa', 0.6), ('alternativa', 0.5), ('comparar', 0.4),
+               ('escolha', 0.3), ('preferência', 0.3), ('opção', 0.3)]),
+    ('highball_lowball', [('reconsiderar', 0.6), ('reduzir', 0.5), ('ajustar', 0.4),
+                          ('flexibilidade', 0.4), ('inicial', 0.3)]),
+]
+
+# Pares de termos próximos: (padrão, termo, termo, janela em palavras, peso)
+PROXIMITY = [
+    ('anchoring', 'oferta', 'inicial', 4, 0.5),
+    ('deadline_pressure', 'prazo', 'amanhã', 6, 0.6),
+    ('deadline_pressure', 'prazo', 'hoje', 6, 0.6),
+    ('limited_authority', 'consultar', 'superior', 5, 0.6),
+    ('limited_authority', 'autorização', 'comitê', 6, 0.5),
+    ('take_it_or_leave_it', 'oferta', 'final', 4, 0.6),
+    ('highball_lowball', 'inicial', 'reduzir', 8, 0.5),
+]
+
+NEGATORS = {'não', 'nunca', 'nem', 'jamais', 'sem'}
+
+# Palavras anteriores (na mesma frase) verificadas para negação
+NEGATION_WINDOW = 3
+# Soma de pesos que leva a confiança a 1 - 1/e
+SCORE_SCALE = 2.0
+DETECTION_THRESHOLD = 0.3
+
+SENTENCE_END = set('.!?\n')
+
+
+def _build_rules():
+    keyword_rules = []
+    rules_by_last_token: Dict[str, List[int]] = {}
+    for pattern_id, keywords in KEYWORDS:
+        for keyword, weight in keywords:
+            tokens = lexicon.tokenize(keyword)
+            rules_by_last_token.setdefault(tokens[-1], []).append(len(keyword_rules))
+            keyword_rules.append((pattern_id, keyword, tokens, weight))
+
+    proximity_by_token: Dict[str, List[int]] = {}
+    for index, (_, first, second, _, _) in enumerate(PROXIMITY):
+        proximity_by_token.setdefault(first, []).append(index)
+        proximity_by_token.setdefault(second, []).append(index)
+
+    max_phrase_length = max(len(rule[2]) for rule in keyword_rules)
+    return keyword_rules, rules_by_last_token, proximity_by_token, max_phrase_length
+
+
+KEYWORD_RULES, RULES_BY_LAST_TOKEN, PROXIMITY_BY_TOKEN, MAX_PHRASE_LENGTH = _build_rules()
+
+
+def iter_tokens(text: str):
+    """Gera ``(palavra, início, fim, início_de_frase)`` com posições em caracteres."""
+    previous_end = 0
+    sentence_ended = True
+    for token, start, end in lexicon.iter_token_spans(text):
+        if not sentence_ended:
+            sentence_ended = any(char in SENTENCE_END for char in text[previous_end:start])
+        yield token, start, end, sentence_ended
+        sentence_ended = False
+        previous_end = end
+
+
+def confidence(score: float) -> float:
+    return 1.0 - math.exp(-score / SCORE_SCALE)
+
+
+def analyze_patterns(text: str) -> Dict[str, Any]:
+    """Pontua os padrões de negociação do texto em uma única passada."""
+    pattern_scores = dict.fromkeys(sorted(PATTERN_DESCRIPTIONS), 0.0)
+    matches = []
+    sentences = []
+
+    recent: List[Tuple[str, int, bool]] = []
+    last_seen: Dict[str, Tuple[int, int]] = {}
+    sentence_scores: Dict[str, float] = {}
+    position = 0
+    sentence_start = sentence_end = 0
+    sentence_index = -1
+
+    def flush_sentence():
+        if sentence_scores:
+            sentences.append({
+                'index': sentence_index, 'start': sentence_start, 'end': sentence_end,
+                'scores': {pattern_id: confidence(score) for pattern_id, score in sorted(sentence_scores.items())}
+            })
+
+    def is_negated(first: int) -> bool:
+        return any(token[2] for token in recent[max(0, first - NEGATION_WINDOW):first])
+
+    def record(pattern_id, keyword, start, end, weight, negated):
+        matches.append({'pattern_id': pattern_id, 'keyword': keyword, 'start': start, 'end': end,
+                        'sentence': sentence_index, 'weight': weight, 'negated': negated})
+        if not negated:
+            pattern_scores[pattern_id] += weight
+            sentence_scores[pattern_id] = sentence_scores.get(pattern_id, 0.0) + weight
+
+    for token, start, end, sentence_begins in iter_tokens(text):
+        if sentence_begins:
+            flush_sentence()
+            recent.clear()
+            last_seen.clear()
+            sentence_scores.clear()
+            position = 0
+            sentence_start = start
+            sentence_index += 1
+        sentence_end = end
+
+        recent.append((token, start, token in NEGATORS))
+        if len(recent) > MAX_PHRASE_LENGTH + NEGATION_WINDOW:
+            recent.pop(0)
+
+        # Palavras e frases que terminam nesta palavra
+        for rule_index in RULES_BY_LAST_TOKEN.get(token, ()):
+            pattern_id, keyword, tokens, weight = KEYWORD_RULES[rule_index]
+            if len(tokens) > len(recent):
+                continue
+            first = len(recent) - len(tokens)
+            if all(recent[first + i][0] == tokens[i] for i in range(len(tokens) - 1)):
+                record(pattern_id, keyword, recent[first][1], end, weight, is_negated(first))
+
+        # Pares de termos próximos
+        if token in PROXIMITY_BY_TOKEN:
+            for rule_index in PROXIMITY_BY_TOKEN[token]:
+                pattern_id, first_term, second_term, window, weight = PROXIMITY[rule_index]
+                other = second_term if token == first_term else first_term
+                seen = last_seen.get(other)
+                if seen is not None and position - seen[0] <= window:
+                    record(pattern_id, f'{first_term} ~ {second_term}', seen[1], end,
+                           weight, is_negated(len(recent) - 1))
+            last_seen[token] = (position, start)
+        position += 1
+    flush_sentence()
+
+    detected = []
+    all_scores = {}
+    for pattern_id, score in pattern_scores.items():
+        all_scores[pattern_id] = confidence(score)
+        if all_scores[pattern_id] > DETECTION_THRESHOLD:
+            detected.append({
+                'pattern_id': pattern_id,
+                'description': PATTERN_DESCRIPTIONS[pattern_id],
+                'confidence': all_scores[pattern_id]
+            })
+    detected.sort(key=lambda pattern: pattern['confidence'], reverse=True)
+
+    return {
+        'detected_patterns': detected,
+        'all_scores': all_scores,
+        'matches': matches,
+        'sentences': sentences
+    }
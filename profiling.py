@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Captura de perfis de execução sob demanda.
+
+Um perfil (cProfile ou pyinstrument, quando instalado) é coletado para uma
+fração amostrada das requisições ou quando um administrador envia o
+cabeçalho ``X-Profile``. Os perfis ficam em ``DATA_DIR/profiles`` junto com
+um arquivo JSON de metadados, que inclui o tempo gasto em cada chamada ao
+analisador nativo durante a requisição.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import cProfile
+import threading
+import contextvars
+from typing import Any, Dict, List, Optional
+
+try:
+    import pyinstrument
+except ImportError:  # pragma: no cover - dependência opcional
+    pyinstrument = None
+
+# Número máximo de perfis mantidos em disco
+MAX_PROFILES = int(os.environ.get('PROFILE_MAX_FILES', 200))
+
+_state = {
+    'sample_rate': float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+    'profiler': os.environ.get('PROFILER', 'cprofile'),
+}
+_state_lock = threading.Lock()
+
+# Chamadas nativas registradas durante a requisição em perfilamento
+_active_spans: contextvars.ContextVar[Optional[List[Dict[str, Any]]]] = \
+    contextvars.ContextVar('profiling_spans', default=None)
+
+_PROFILE_ID_RE = re.compile(r'^[\w.-]+$')
+
+# Um perfil por vez no processo: no Python 3.12+ (sys.monitoring) um segundo
+# enable() concorrente falha, e perfis sobrepostos misturariam as requisições
+_profile_lock = threading.Lock()
+
+
+def get_settings() -> Dict[str, Any]:
+    """Retorna a configuração atual de amostragem."""
+    with _state_lock:
+        settings = dict(_state)
+    settings['available_profilers'] = ['cprofile'] + (['pyinstrument'] if pyinstrument else [])
+    return settings
+
+
+def update_settings(sample_rate: Optional[float] = None, profiler: Optional[str] = None) -> Dict[str, Any]:
+    """Altera a taxa de amostragem e/ou o profiler deste processo."""
+    with _state_lock:
+        if sample_rate is not None:
+            if not 0 <= sample_rate <= 1:
+                raise ValueError('sample_rate deve estar entre 0 e 1')
+            _state['sample_rate'] = sample_rate
+        if profiler is not None:
+            if profiler not in ('cprofile', 'pyinstrument'):
+                raise ValueError('profiler desconhecido')
+            if profiler == 'pyinstrument' and pyinstrument is None:
+                raise ValueError('pyinstrument não está instalado')
+            _state['profiler'] = profiler
+    return get_settings()
+
+
+def record_span(function: str, backend: str, seconds: float):
+    """Registra o tempo de uma chamada ao analisador na requisição perfilada."""
+    spans = _active_spans.get()
+    if spans is not None:
+        spans.append({'function': function, 'backend': backend, 'ms': seconds * 1000})
+
+
+class RequestProfile:
+    """Perfil em andamento de uma única requisição."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.spans: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+        self._token = _active_spans.set(self.spans)
+        if kind == 'pyinstrument':
+            self._profiler = pyinstrument.Profiler()
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def discard(self):
+        """Encerra a coleta sem gravar nada (requisição interrompida por exceção)."""
+        try:
+            _active_spans.reset(self._token)
+        except ValueError:
+            # Token criado em outro contexto; basta desativar a coleta de spans
+            _active_spans.set(None)
+        if self.kind == 'pyinstrument':
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def stop(self, directory: str, metadata: Dict[str, Any]) -> str:
+        """Encerra a coleta, grava o perfil e retorna seu identificador."""
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        _active_spans.reset(self._token)
+        if self.kind == 'pyinstrument':
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+        slug = re.sub(r'[^\w]+', '_', metadata.get('endpoint', 'request')).strip('_') or 'root'
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed_ms)}ms-{slug}-{os.getpid()}-{random.randint(0, 9999):04d}"
+        extension = 'html' if self.kind == 'pyinstrument' else 'prof'
+        os.makedirs(directory, exist_ok=True)
+        profile_path = os.path.join(directory, f'{profile_id}.{extension}')
+        if self.kind == 'pyinstrument':
+            with open(profile_path, 'w', encoding='utf-8') as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.dump_stats(profile_path)
+
+        metadata = dict(metadata, id=profile_id, profiler=self.kind, file=os.path.basename(profile_path),
+                        duration_ms=elapsed_ms, native_calls=self.spans,
+                        native_ms=sum(span['ms'] for span in self.spans),
+                        created_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        with open(os.path.join(directory, f'{profile_id}.json'), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        _prune(directory)
+        return profile_id
+
+
+def _prune(directory: str):
+    entries = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+    for name in entries[:max(0, len(entries) - MAX_PROFILES)]:
+        profile_id = name[:-len('.json')]
+        for extension in ('json', 'prof', 'html'):
+            path = os.path.join(directory, f'{profile_id}.{extension}')
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def list_profiles(directory: str) -> List[Dict[str, Any]]:
+    """Lista os metadados dos perfis armazenados, do mais recente ao mais antigo."""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                profiles.append(json.load(f))
+    return profiles
+
+
+def get_profile_path(directory: str, profile_id: str) -> Optional[str]:
+    """Retorna o caminho do arquivo de perfil, ou None se não existir."""
+    if not _PROFILE_ID_RE.match(profile_id):
+        return None
+    for extension in ('prof', 'html'):
+        path = os.path.join(directory, f'{profile_id}.{extension}')
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def init_app(app, directory: str, is_admin_request):
+    """Registra os hooks que iniciam e encerram a coleta por requisição.
+
+    Args:
+        app: Aplicação Flask
+        directory: Diretório onde os perfis são gravados
+        is_admin_request: Função que indica se a requisição atual é de um
+            administrador (necessário para forçar a coleta via cabeçalho)
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        settings = get_settings()
+        requested = request.headers.get('X-Profile')
+        kind = None
+        if requested and is_admin_request():
+            kind = requested if requested == 'pyinstrument' and pyinstrument else settings['profiler']
+        elif settings['sample_rate'] > 0 and random.random() < settings['sample_rate']:
+            kind = settings['profiler']
+        # Outra requisição já está sendo perfilada: esta segue sem coleta
+        if kind and _profile_lock.acquire(blocking=False):
+            try:
+                g._request_profile = RequestProfile(kind)
+            except Exception:
+                _profile_lock.release()
+                raise
+
+    @app.after_request
+    def _stop_profile(response):
+        profile = g.pop('_request_profile', None)
+        if profile is not None:
+            try:
+                profile_id = profile.stop(directory, {
+                    'method': request.method,
+                    'path': request.path,
+                    'endpoint': request.url_rule.rule if request.url_rule else 'unmatched',
+                    'status': response.status_code,
+                })
+            finally:
+                _profile_lock.release()
+            response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    # after_request não roda quando a exceção é propagada (modo debug ou
+    # PROPAGATE_EXCEPTIONS); o profiler ativo impediria o próximo enable()
+    @app.teardown_request
+    def _discard_profile(exc):
+        profile = g.pop('_request_profile', None)
+        if profile is not None:
+            try:
+                profile.discard()
+            finally:
+                _profile_lock.release()
@@ -0,0 +1,399 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Roteamento dos dados de usuários entre arquivos SQLite (shards).
+
+O banco principal (``negotiation_training.db``) continua sendo o diretório
+de usuários (tabela ``users``, com a organização de cada um). Os dados de
+progresso e de análise (exercícios, dias de treinamento, histórico e
+análises de texto) ficam no shard escolhido a partir da organização do
+usuário, de modo que as escritas de cada empresa não disputam o mesmo
+arquivo:
+
+    SHARD_MODE=none    tudo no banco principal (padrão)
+    SHARD_MODE=tenant  um arquivo por organização (``shards/tenant_<nome>.db``);
+                       a organização só é definida no cadastro feito por um
+                       administrador e pode ser limitada pela lista TENANTS
+    SHARD_MODE=hash    SHARD_COUNT arquivos (``shards/shard_NNN.db``); a
+                       organização (ou o usuário, se não houver) é distribuída
+                       por hash. SHARD_COUNT não pode mudar depois que houver dados.
+
+As conexões ficam em cache por thread e por shard (modo WAL); ``close()``
+apenas devolve a conexão ao cache. A consulta administrativa
+``query_all`` executa um SELECT somente leitura em todos os shards em
+paralelo.
+
+Uso:
+    python shards.py list
+    python shards.py migrate [--delete-source]
+"""
+
+import os
+import re
+import zlib
+import time
+import json
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from metrics import InstrumentedConnection
+
+logger = logging.getLogger(__name__)
+
+MODES = ('none', 'tenant', 'hash')
+
+# Nome do shard que corresponde ao banco principal
+MAIN = 'main'
+
+# Organização usada para usuários sem organização no modo tenant
+DEFAULT_TENANT = 'default'
+
+# Conexões mantidas por thread (as menos usadas são fechadas)
+MAX_CACHED_CONNECTIONS = 32
+
+# Usuários cujo shard fica em memória (o mapa é esvaziado ao atingir o limite)
+MAX_CACHED_USERS = 100000
+
+# Tabelas de dados por usuário copiadas pelo comando migrate
+USER_TABLES = ['exercises', 'training_days', 'activity_history', 'activity_daily']
+
+# Operações permitidas na consulta administrativa (somente leitura)
+_READ_ONLY_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION,
+                      getattr(sqlite3, 'SQLITE_RECURSIVE', 33)}
+
+
+def shard_name(mode: str, shard_count: int, organization: Optional[str], user_id: Optional[int]) -> str:
+    """Nome do shard de um usuário a partir da sua organização."""
+    organization = (organization or '').strip()
+    if mode == 'tenant':
+        organization = organization or DEFAULT_TENANT
+        slug = re.sub(r'[^a-z0-9]+', '-', organization.lower()).strip('-')[:40]
+        # O hash evita colisões entre organizações com o mesmo nome simplificado
+        return f"tenant_{slug}_{hashlib.sha1(organization.encode('utf-8')).hexdigest()[:8]}"
+    if mode == 'hash':
+        key = organization or f'user-{user_id}'
+        return f"shard_{zlib.crc32(key.encode('utf-8')) % shard_count:03d}"
+    return MAIN
+
+
+class ShardConnection(InstrumentedConnection):
+    """Conexão mantida no cache da thread.
+
+    ``close()`` só devolve a conexão: ao ser liberada pelo último usuário
+    da thread, transações abertas são desfeitas e a ``row_factory`` volta
+    ao padrão. ``dispose()`` fecha de fato.
+    """
+
+    checkouts = 0
+
+    def close(self):
+        self.checkouts = max(self.checkouts - 1, 0)
+        if self.checkouts == 0:
+            self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        if self.in_transaction:
+            self.rollback()
+        self.row_factory = None
+
+    def dispose(self):
+        super().close()
+
+
+class ShardRouter:
+    """Escolhe o arquivo SQLite de cada usuário e mantém as conexões em cache."""
+
+    def __init__(self, main_path: str, shard_dir: str, mode: str = 'none', shard_count: int = 16,
+                 init_shard: Optional[Callable[[sqlite3.Connection], None]] = None):
+        if mode not in MODES:
+            raise ValueError(f'SHARD_MODE inválido: {mode} (use {", ".join(MODES)})')
+        if shard_count < 1:
+            raise ValueError('SHARD_COUNT deve ser positivo')
+        self.main_path = main_path
+        self.shard_dir = shard_dir
+        self.mode = mode
+        self.shard_count = shard_count
+        self.init_shard = init_shard
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._initialized = set()
+        self._user_shards: Dict[int, str] = {}
+
+    @property
+    def sharded(self) -> bool:
+        return self.mode != 'none'
+
+    def path(self, name: str) -> str:
+        return self.main_path if name == MAIN else os.path.join(self.shard_dir, f'{name}.db')
+
+    def shard_for(self, organization: Optional[str], user_id: Optional[int] = None) -> str:
+        return shard_name(self.mode, self.shard_count, organization, user_id)
+
+    def default_shard(self) -> str:
+        """Shard usado para dados sem usuário associado."""
+        return shard_name(self.mode, self.shard_count, DEFAULT_TENANT, None)
+
+    def shard_names(self) -> List[str]:
+        """Shards conhecidos (no modo tenant, apenas os que já existem)."""
+        if not self.sharded:
+            return [MAIN]
+        names = set()
+        if self.mode == 'hash':
+            names.update(f'shard_{index:03d}' for index in range(self.shard_count))
+        if os.path.isdir(self.shard_dir):
+            names.update(file_name[:-3] for file_name in os.listdir(self.shard_dir) if file_name.endswith('.db'))
+        return sorted(names)
+
+    def _open(self, name: str) -> ShardConnection:
+        path = self.path(name)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = sqlite3.connect(path, factory=ShardConnection)
+        # WAL: leituras não bloqueiam a escrita do mesmo shard
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        return conn
+
+    def _connect(self, name: str, initialize: bool) -> ShardConnection:
+        cache = getattr(self._local, 'connections', None)
+        if cache is None:
+            cache = self._local.connections = OrderedDict()
+
+        conn = cache.get(name)
+        if conn is None:
+            conn = cache[name] = self._open(name)
+            if len(cache) > MAX_CACHED_CONNECTIONS:
+                for other_name, other in list(cache.items()):
+                    if other.checkouts == 0 and other_name != name:
+                        del cache[other_name]
+                        other.dispose()
+                        break
+        cache.move_to_end(name)
+
+        if initialize and self.init_shard is not None and name not in self._initialized:
+            with self._lock:
+                if name not in self._initialized:
+                    self.init_shard(conn)
+                    self._initialized.add(name)
+
+        conn.checkouts += 1
+        return conn
+
+    def directory(self) -> ShardConnection:
+        """Conexão com o banco principal (diretório de usuários)."""
+        return self._connect(MAIN, initialize=not self.sharded)
+
+    def connect(self, name: str, initialize: bool = True) -> ShardConnection:
+        """Conexão com um shard, criando suas tabelas no primeiro uso."""
+        return self._connect(name, initialize)
+
+    def shard_for_user(self, user_id: int) -> str:
+        if not self.sharded:
+            return MAIN
+        name = self._user_shards.get(user_id)
+        if name is None:
+            conn = self.directory()
+            try:
+                row = conn.execute('SELECT organization FROM users WHERE id = ?', (user_id,)).fetchone()
+            finally:
+                conn.close()
+            # Usuários inexistentes não são memorizados
+            if row is None:
+                return self.shard_for(None, user_id)
+            name = self.shard_for(row[0], user_id)
+            if len(self._user_shards) >= MAX_CACHED_USERS:
+                self._user_shards.clear()
+            self._user_shards[user_id] = name
+        return name
+
+    def connect_for_user(self, user_id: int) -> ShardConnection:
+        return self.connect(self.shard_for_user(user_id))
+
+    def release(self):
+        """Devolve as conexões da thread (fim da requisição), desfazendo transações esquecidas."""
+        for name, conn in getattr(self._local, 'connections', {}).items():
+            if conn.checkouts or conn.in_transaction:
+                logger.warning('Conexão com o shard %s não foi fechada pela requisição', name)
+                conn.reset()
+
+    def close_all(self):
+        """Fecha as conexões em cache da thread atual."""
+        cache = getattr(self._local, 'connections', None) or {}
+        for conn in cache.values():
+            conn.dispose()
+        cache.clear()
+
+    def _query_shard(self, name: str, sql: str, params: Sequence[Any], limit: int, timeout: float) -> dict:
+        started = time.perf_counter()
+        conn = sqlite3.connect(f'file:{self.path(name)}?mode=ro', uri=True)
+        try:
+            conn.execute('PRAGMA query_only = ON')
+            conn.set_authorizer(
+                lambda action, *_: sqlite3.SQLITE_OK if action in _READ_ONLY_ACTIONS else sqlite3.SQLITE_DENY)
+            deadline = started + timeout
+            conn.set_progress_handler(lambda: time.perf_counter() > deadline, 10000)
+            cursor = conn.execute(sql, params)
+            rows = cursor.fetchmany(limit + 1)
+            return {
+                'columns': [column[0] for column in cursor.description or []],
+                'rows': rows[:limit],
+                'truncated': len(rows) > limit,
+                'ms': round((time.perf_counter() - started) * 1000, 2)
+            }
+        finally:
+            conn.close()
+
+    def query_all(self, sql: str, params: Sequence[Any] = (), limit: int = 1000, timeout: float = 10.0) -> dict:
+        """Executa um SELECT somente leitura em todos os shards, em paralelo.
+
+        As linhas de cada shard (até ``limit`` por shard) são concatenadas com
+        o nome do shard na primeira coluna; agregações entre shards ficam a
+        cargo de quem consulta.
+
+        Raises:
+            ValueError: se a consulta falhar em todos os shards
+        """
+        names = [name for name in self.shard_names() if os.path.exists(self.path(name))]
+        results: Dict[str, dict] = {}
+        if names:
+            with ThreadPoolExecutor(min(len(names), 8)) as executor:
+                futures = {name: executor.submit(self._query_shard, name, sql, params, limit, timeout)
+                           for name in names}
+                for name, future in futures.items():
+                    try:
+                        results[name] = future.result()
+                    except sqlite3.Error as e:
+                        results[name] = {'error': str(e)}
+
+        answered = {name: result for name, result in results.items() if 'error' not in result}
+        if results and not answered:
+            raise ValueError(next(iter(results.values()))['error'])
+
+        columns = next((result['columns'] for result in answered.values()), [])
+        rows = []
+        for name, result in answered.items():
+            for row in result['rows']:
+                rows.append([name] + [value.hex() if isinstance(value, bytes) else value for value in row])
+        return {
+            'columns': ['shard'] + columns,
+            'rows': rows,
+            'shards': {name: {key: value for key, value in result.items() if key not in ('columns', 'rows')}
+                       for name, result in results.items()}
+        }
+
+    def describe(self) -> List[dict]:
+        return [{'name': name, 'path': self.path(name),
+                 'size': os.path.getsize(self.path(name)) if os.path.exists(self.path(name)) else 0}
+                for name in self.shard_names()]
+
+
+def add_column(cursor, table: str, column: str, definition: str):
+    """Adiciona uma coluna se a tabela ainda não a tiver."""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def init_app(app, router: ShardRouter):
+    """Garante que nenhuma requisição deixe conexões ou transações pendentes."""
+
+    @app.teardown_request
+    def _release_shard_connections(exception=None):
+        router.release()
+
+
+def _copy_users(conn, user_ids: List[int]) -> int:
+    """Copia do banco principal (anexado como ``src``) os dados de ``user_ids`` para o shard."""
+    cursor = conn.cursor()
+    cursor.execute('CREATE TEMP TABLE IF NOT EXISTS migrate_users (id INTEGER PRIMARY KEY)')
+    cursor.execute('DELETE FROM migrate_users')
+    # Usuários que já têm dados no shard foram migrados antes (ou criados depois da troca de modo)
+    cursor.executemany('INSERT INTO migrate_users (id) SELECT ? WHERE NOT EXISTS '
+                       '(SELECT 1 FROM main.exercises WHERE user_id = ?)', [(uid, uid) for uid in user_ids])
+    copied = cursor.execute('SELECT COUNT(*) FROM migrate_users').fetchone()[0]
+
+    for table in USER_TABLES:
+        # Ids locais são renumerados pelo shard, preservando a ordem
+        columns = [row[1] for row in cursor.execute(f'PRAGMA main.table_info({table})') if row[1] != 'id']
+        column_list = ', '.join(columns)
+        order = ' ORDER BY id' if 'id' in [row[1] for row in cursor.execute(f'PRAGMA src.table_info({table})')] else ''
+        cursor.execute(f'INSERT INTO main.{table} ({column_list}) SELECT {column_list} FROM src.{table} '
+                       f'WHERE user_id IN (SELECT id FROM migrate_users){order}')
+
+    cursor.execute(
+        'INSERT INTO main.analysis_results (content_hash, analyzer_version, word_count, tone_score, style_score, '
+        'result, created_at) SELECT content_hash, analyzer_version, word_count, tone_score, style_score, result, '
+        'created_at FROM src.analysis_results WHERE id IN (SELECT analysis_id FROM src.analysis_links '
+        'WHERE user_id IN (SELECT id FROM migrate_users)) ORDER BY id '
+        'ON CONFLICT (content_hash, analyzer_version) DO NOTHING')
+    cursor.execute(
+        'INSERT OR IGNORE INTO main.analysis_links (user_id, exercise_type, source, analysis_id, created_at) '
+        'SELECT l.user_id, l.exercise_type, l.source, r.id, l.created_at FROM src.analysis_links l '
+        'JOIN src.analysis_results s ON s.id = l.analysis_id '
+        'JOIN main.analysis_results r ON r.content_hash = s.content_hash AND r.analyzer_version = s.analyzer_version '
+        'WHERE l.user_id IN (SELECT id FROM migrate_users)')
+    conn.commit()
+    return copied
+
+
+def migrate(router: ShardRouter, delete_source: bool = False) -> Dict[str, int]:
+    """Copia para os shards os dados gravados no banco principal antes do particionamento."""
+    if not router.sharded:
+        raise ValueError('SHARD_MODE=none: não há shards para migrar')
+
+    directory = router.directory()
+    users_by_shard: Dict[str, List[int]] = {}
+    try:
+        # Bancos antigos podem não ter as tabelas de dados
+        tables = {row[0] for row in directory.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not set(USER_TABLES + ['analysis_results', 'analysis_links']) <= tables:
+            return {}
+        for user_id, organization in directory.execute('SELECT id, organization FROM users ORDER BY id'):
+            users_by_shard.setdefault(router.shard_for(organization, user_id), []).append(user_id)
+    finally:
+        directory.close()
+
+    stats = {}
+    for name, user_ids in sorted(users_by_shard.items()):
+        conn = router.connect(name)
+        try:
+            conn.execute('ATTACH DATABASE ? AS src', (router.main_path,))
+            try:
+                stats[name] = _copy_users(conn, user_ids)
+            finally:
+                conn.execute('DETACH DATABASE src')
+        finally:
+            conn.close()
+
+    if delete_source:
+        directory = router.directory()
+        try:
+            for table in USER_TABLES + ['analysis_links']:
+                directory.execute(f'DELETE FROM {table}')
+            directory.commit()
+        finally:
+            directory.close()
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Shards SQLite dos dados de usuários')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='lista os shards configurados')
+    migrate_parser = subparsers.add_parser('migrate', help='copia os dados do banco principal para os shards')
+    migrate_parser.add_argument('--delete-source', action='store_true',
+                                help='remove do banco principal os dados copiados')
+    args = parser.parse_args()
+
+    import app
+    app.init_db()
+    if args.command == 'list':
+        print(json.dumps({'mode': app.shard_router.mode, 'shards': app.shard_router.describe()}, indent=2))
+    else:
+        print(json.dumps(migrate(app.shard_router, args.delete_source)))
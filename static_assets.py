@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Pipeline de arquivos estáticos da interface (SPA).
+
+Na etapa de build os arquivos recebem o hash do conteúdo no nome
+(``js/app.3f2a9c1b7d.js``), as referências em ``index.html`` são
+reescritas e são geradas variantes pré-compactadas ``.gz`` e ``.br``
+(brotli apenas se o pacote estiver instalado), além de ``manifest.json``.
+
+Em execução os arquivos gerados ficam em memória e são servidos com a
+melhor codificação aceita pelo cliente, ETag forte e
+``Cache-Control: immutable`` para os nomes com hash. O ``index.html``
+é sempre revalidado (``no-cache`` + ETag), de modo que um novo build é
+percebido na visita seguinte.
+
+Sem build, os arquivos-fonte são servidos diretamente (modo de
+desenvolvimento), apenas com ETag.
+
+Uso:
+    python static_assets.py build
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import hashlib
+import logging
+import mimetypes
+from typing import Dict, Optional
+
+from flask import Response, abort, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependência opcional
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BUILD_DIR = os.path.join(SOURCE_DIR, 'dist')
+
+# Caminho público -> arquivo-fonte
+ASSETS = {
+    'css/styles.css': 'styles.css',
+    'js/storage.js': 'storage.js',
+    'js/app.js': 'app.js',
+}
+INDEX = 'index.html'
+
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 10
+
+# Codificações na ordem de preferência do servidor
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+
+def _digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _hashed_name(path: str, content: bytes) -> str:
+    base, extension = os.path.splitext(path)
+    return f'{base}.{_digest(content)[:HASH_LENGTH]}{extension}'
+
+
+def _compress(content: bytes) -> Dict[str, bytes]:
+    variants = {'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(content, quality=11)
+    return variants
+
+
+def _write(path: str, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def build(output_dir: str = DEFAULT_BUILD_DIR, source_dir: str = SOURCE_DIR) -> Dict[str, str]:
+    """Gera os arquivos com hash, as variantes compactadas e o manifesto.
+
+    Returns:
+        Manifesto (caminho público -> caminho com hash)
+    """
+    manifest = {}
+    outputs = {}
+    for public_path, source in ASSETS.items():
+        with open(os.path.join(source_dir, source), 'rb') as f:
+            content = f.read()
+        manifest[public_path] = _hashed_name(public_path, content)
+        outputs[manifest[public_path]] = content
+
+    with open(os.path.join(source_dir, INDEX), 'r', encoding='utf-8') as f:
+        index = f.read()
+    index = re.sub(r'(src|href)="([^"]+)"',
+                   lambda m: f'{m.group(1)}="{manifest.get(m.group(2), m.group(2))}"', index)
+    outputs[INDEX] = index.encode('utf-8')
+
+    for path, content in outputs.items():
+        _write(os.path.join(output_dir, path), content)
+        variants = _compress(content)
+        for encoding, suffix in ENCODINGS:
+            compressed = variants.get(encoding)
+            if compressed is not None and len(compressed) < len(content):
+                _write(os.path.join(output_dir, path + suffix), compressed)
+
+    with open(os.path.join(output_dir, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class StaticAsset:
+    """Arquivo servido a partir da memória, com suas variantes compactadas."""
+
+    def __init__(self, path: str, content: bytes, variants: Dict[str, bytes], immutable: bool):
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/') or self.content_type == 'application/javascript':
+            self.content_type += '; charset=utf-8'
+        self.cache_control = IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+        self.digest = _digest(content)[:16]
+        self.variants = dict(variants, identity=content)
+
+    def select(self, accept_encodings) -> str:
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and accept_encodings[encoding]:
+                return encoding
+        return 'identity'
+
+    def etag(self, encoding: str) -> str:
+        # Cada representação precisa de uma ETag forte própria
+        return self.digest if encoding == 'identity' else f'{self.digest}-{encoding}'
+
+
+def load_build(directory: str) -> Optional[Dict[str, StaticAsset]]:
+    """Carrega um build gerado por ``build``; retorna None se não existir."""
+    manifest_path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    assets = {}
+    for path in list(manifest.values()) + [INDEX]:
+        with open(os.path.join(directory, path), 'rb') as f:
+            content = f.read()
+        variants = {}
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(os.path.join(directory, path + suffix)):
+                with open(os.path.join(directory, path + suffix), 'rb') as f:
+                    variants[encoding] = f.read()
+        assets[path] = StaticAsset(path, content, variants, immutable=path != INDEX)
+    return assets
+
+
+def _load_source(path: str) -> Optional[StaticAsset]:
+    source = INDEX if path == INDEX else ASSETS.get(path)
+    if source is None:
+        return None
+    with open(os.path.join(SOURCE_DIR, source), 'rb') as f:
+        return StaticAsset(path, f.read(), {}, immutable=False)
+
+
+def init_app(app, directory: str = DEFAULT_BUILD_DIR):
+    """Registra as rotas da interface servindo o build de ``directory``."""
+    assets = load_build(directory)
+    if assets is None:
+        logger.warning('Build de estáticos não encontrado em %s, servindo os arquivos-fonte '
+                       '(execute "python static_assets.py build")', directory)
+
+    def serve(path):
+        asset = assets.get(path) if assets is not None else _load_source(path)
+        if asset is None:
+            abort(404)
+
+        encoding = asset.select(request.accept_encodings)
+        etag = asset.etag(encoding)
+        headers = {'Cache-Control': asset.cache_control, 'Vary': 'Accept-Encoding'}
+        if request.if_none_match.contains(etag):
+            response = Response(status=304, headers=headers)
+        else:
+            response = Response(asset.variants[encoding], content_type=asset.content_type, headers=headers)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        return response
+
+    # Uma rota por arquivo conhecido: os demais caminhos (inclusive /api/...)
+    # seguem para o tratamento de 404 da aplicação
+    app.add_url_rule('/', 'static_index', lambda: serve(INDEX))
+    for path in (assets if assets is not None else [INDEX, *ASSETS]):
+        app.add_url_rule(f'/{path}', 'static_asset', serve, defaults={'path': path})
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'build':
+        print(__doc__)
+        sys.exit(1)
+    output = os.environ.get('STATIC_DIR', DEFAULT_BUILD_DIR)
+    for public_path, hashed_path in build(output).items():
+        print(f'{public_path} -> {hashed_path}')
+    if brotli is None:
+        print('Aviso: pacote brotli não instalado, apenas variantes gzip foram geradas')
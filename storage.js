@@ -26,13 +26,17 @@ const Storage = (function() {
             REPORT: '/report',
             LOGIN: '/login',
             LOGOUT: '/logout',
-            CHECK_AUTH: '/check-auth'
+            CHECK_AUTH: '/check-auth',
+            EVENTS: '/events'
         }
     };
 
     // Estado da conexão
     let isOnline = navigator.onLine;
 
+    // Canal de eventos do servidor (Server-Sent Events)
+    let eventSource = null;
+
     // Ouvintes de eventos para mudanças de estado
     window.addEventListener('online', () => {
         isOnline = true;
@@ -138,6 +142,7 @@ const Storage = (function() {
                 credentials: 'include'
             });
             
+            unsubscribeFromUpdates();
             localStorage.removeItem(KEYS.USER_ID);
             localStorage.removeItem(KEYS.USER_DATA);
             
@@ -175,6 +180,8 @@ const Storage = (function() {
             // Criar dados iniciais do usuário
             const initialData = createInitialUserData();
             saveUserData(initialData);
+        } else {
+            subscribeToUpdates(userId);
         }
 
         return {
@@ -309,14 +316,16 @@ const Storage = (function() {
                 clearSyncQueue();
             }
 
-            // Atualizar dados do usuário do backend
-            if (userId) {
+            // Atualizar dados do usuário do backend (desnecessário com o canal de eventos ativo)
+            if (userId && !isSubscribed()) {
                 const backendData = await fetchUserDataFromBackend(userId);
                 if (backendData) {
                     const localData = loadUserData();
                     // Mesclar dados locais com dados do backend
                     const mergedData = mergeUserData(localData, backendData);
                     saveUserData(mergedData);
+                    // Buscar só os payloads dos exercícios que mudaram no servidor
+                    staleExerciseTypes(localData, backendData).forEach(type => refreshExerciseData(userId, type));
                 }
             }
 
@@ -332,6 +341,121 @@ const Storage = (function() {
         }
     }
 
+    /**
+     * Indica se o canal de eventos do servidor está conectado
+     */
+    function isSubscribed() {
+        return eventSource !== null && eventSource.readyState === EventSource.OPEN;
+    }
+
+    /**
+     * Assina as alterações de progresso do usuário enviadas pelo servidor
+     */
+    function subscribeToUpdates(userId) {
+        if (!userId || typeof EventSource === 'undefined' || eventSource) return;
+
+        eventSource = new EventSource(`${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.USER}/${userId}${API_CONFIG.ENDPOINTS.EVENTS}`);
+
+        eventSource.addEventListener('exercise', (event) => {
+            const change = JSON.parse(event.data);
+            applyRemoteChange(userData => {
+                const exercise = userData.exercises[change.exerciseType] || { data: {} };
+                userData.exercises[change.exerciseType] = {
+                    ...exercise,
+                    status: change.status,
+                    timeSpent: change.timeSpent,
+                    lastActivity: change.lastActivity
+                };
+            });
+            if (change.dataChanged) {
+                refreshExerciseData(userId, change.exerciseType);
+            }
+        });
+
+        eventSource.addEventListener('training_day', (event) => {
+            const change = JSON.parse(event.data);
+            applyRemoteChange(userData => {
+                userData.trainingDays[change.dayNumber] = {
+                    ...userData.trainingDays[change.dayNumber],
+                    status: change.status,
+                    timeSpent: change.timeSpent,
+                    lastActivity: change.lastActivity
+                };
+            });
+        });
+
+        eventSource.addEventListener('activity', (event) => {
+            const activity = JSON.parse(event.data);
+            applyRemoteChange(userData => {
+                const history = userData.activityHistory || [];
+                if (history.some(item => item.id === activity.id)) return;
+                // Entrada já adicionada localmente por esta aba: apenas associar o ID
+                const local = history.find(item => item.id === undefined && item.title === activity.title);
+                if (local) {
+                    local.id = activity.id;
+                } else {
+                    history.unshift(activity);
+                }
+                userData.activityHistory = history.slice(0, 10);
+            });
+        });
+
+        // Eventos perdidos: recarregar o documento completo uma única vez
+        eventSource.addEventListener('resync', async () => {
+            const backendData = await fetchUserDataFromBackend(userId);
+            if (backendData) {
+                saveUserData(mergeUserData(loadUserData(), backendData));
+                notifyChange();
+            }
+        });
+    }
+
+    /**
+     * Encerra o canal de eventos do servidor
+     */
+    function unsubscribeFromUpdates() {
+        if (eventSource) {
+            eventSource.close();
+            eventSource = null;
+        }
+    }
+
+    /**
+     * Aplica uma alteração recebida do servidor aos dados locais
+     */
+    function applyRemoteChange(apply) {
+        const userData = loadUserData();
+        if (!userData) return;
+
+        apply(userData);
+
+        const exercisesTime = Object.values(userData.exercises || {}).reduce((sum, item) => sum + (item.timeSpent || 0), 0);
+        const daysTime = Object.values(userData.trainingDays || {}).reduce((sum, item) => sum + (item.timeSpent || 0), 0);
+        userData.totalTimeSpent = exercisesTime + daysTime;
+
+        saveUserData(userData);
+        notifyChange();
+    }
+
+    /**
+     * Busca apenas o payload de um exercício alterado
+     */
+    async function refreshExerciseData(userId, exerciseType) {
+        const exercise = await fetchExerciseFromBackend(userId, exerciseType);
+        if (exercise) {
+            applyRemoteChange(userData => {
+                userData.exercises[exerciseType] = { ...userData.exercises[exerciseType], ...exercise };
+            });
+        }
+    }
+
+    /**
+     * Avisa a interface que os dados do usuário mudaram
+     */
+    function notifyChange() {
+        window.dispatchEvent(new CustomEvent('storage:userdata-changed'));
+    }
+
     /**
      * Processa uma operação da fila de sincronização
      */
@@ -377,7 +501,9 @@ const Storage = (function() {
                 const localTimestamp = new Date(localExercise.lastActivity || 0).getTime();
                 const backendTimestamp = new Date(backendExercise.lastActivity || 0).getTime();
                 
-                exercises[type] = localTimestamp > backendTimestamp ? localExercise : backendExercise;
+                exercises[type] = localTimestamp > backendTimestamp
+                    ? localExercise
+                    : { ...backendExercise, data: backendExercise.data || localExercise.data };
             }
         });
 
@@ -430,6 +556,22 @@ const Storage = (function() {
         };
     }
 
+    /**
+     * Lista os exercícios cujo registro no backend é mais recente que o local
+     * (o payload deles é buscado à parte, já que a listagem não o inclui)
+     */
+    function staleExerciseTypes(localData, backendData) {
+        return Object.entries(backendData.exercises || {})
+            .filter(([type, backendExercise]) => {
+                const localExercise = localData && localData.exercises && localData.exercises[type];
+                if (!localExercise) return true;
+                const localTimestamp = new Date(localExercise.lastActivity || 0).getTime();
+                const backendTimestamp = new Date(backendExercise.lastActivity || 0).getTime();
+                return backendTimestamp > localTimestamp;
+            })
+            .map(([type]) => type);
+    }
+
     /**
      * Cria um usuário no backend
      */
@@ -459,7 +601,7 @@ const Storage = (function() {
      */
     async function fetchUserDataFromBackend(userId) {
         try {
-            const response = await fetch(`${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.USER}/${userId}`);
+            const response = await fetch(`${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.USER}/${userId}?exerciseData=none`);
 
             if (!response.ok) {
                 throw new Error(`Erro ao buscar dados do usuário: ${response.status}`);
@@ -472,6 +614,24 @@ const Storage = (function() {
         }
     }
 
+    /**
+     * Busca os dados de um único exercício do backend
+     */
+    async function fetchExerciseFromBackend(userId, exerciseType) {
+        try {
+            const response = await fetch(`${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.EXERCISE}/${userId}/${exerciseType}`);
+
+            if (!response.ok) {
+                throw new Error(`Erro ao buscar exercício: ${response.status}`);
+            }
+
+            return await response.json();
+        } catch (error) {
+            console.error('Erro ao buscar exercício:', error);
+            return null;
+        }
+    }
+
     /**
      * Atualiza um exercício no backend
      */
@@ -579,15 +739,20 @@ const Storage = (function() {
         userData.exercises[exerciseType] = updatedExercise;
         saveUserData(userData);
 
-        // Adicionar à fila de sincronização
+        // Adicionar à fila de sincronização (o payload vai como merge patch,
+        // só com o que mudou; sem ele a atualização pode ser agrupada no servidor)
+        const operation = {
+            exerciseType,
+            status: updatedExercise.status,
+            timeSpent: data.timeSpent || 0
+        };
+        const dataPatch = createMergePatch(exercise.data || {}, updatedExercise.data || {});
+        if (dataPatch !== undefined) {
+            operation.dataPatch = dataPatch;
+        }
         addToSyncQueue({
             type: 'update_exercise',
-            data: {
-                exerciseType,
-                status: updatedExercise.status,
-                timeSpent: data.timeSpent || 0,
-                data: updatedExercise.data
-            }
+            data: operation
         });
 
         // Tentar sincronizar imediatamente se online
@@ -598,6 +763,27 @@ const Storage = (function() {
         return true;
     }
 
+    /**
+     * Calcula o JSON merge patch (RFC 7396) que leva `before` a `after`;
+     * retorna undefined quando não há diferença
+     */
+    function createMergePatch(before, after) {
+        const isObject = value => value !== null && typeof value === 'object' && !Array.isArray(value);
+        if (!isObject(before) || !isObject(after)) {
+            return JSON.stringify(before) === JSON.stringify(after) ? undefined : after;
+        }
+
+        const patch = {};
+        Object.keys(before).forEach(key => {
+            if (!(key in after)) patch[key] = null;
+        });
+        Object.keys(after).forEach(key => {
+            const change = key in before ? createMergePatch(before[key], after[key]) : after[key];
+            if (change !== undefined) patch[key] = change;
+        });
+        return Object.keys(patch).length > 0 ? patch : undefined;
+    }
+
     /**
      * Atualiza um dia de treinamento localmente e adiciona à fila de sincronização
      */
@@ -733,6 +919,8 @@ const Storage = (function() {
         updateTrainingDay,
         updateUserProfile,
         syncWithBackend,
+        subscribeToUpdates,
+        unsubscribeFromUpdates,
         generateReport,
         isOnline: () => isOnline,
         registerUser,
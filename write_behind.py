@@ -0,0 +1,465 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Buffer write-behind para as atualizações frequentes de progresso.
+
+Os timers da interface enviam ``PUT /api/exercise`` e ``PUT /api/training-day``
+com frequência, e cada chamada fazia seu próprio ``UPDATE`` e commit. Com
+``WRITE_BEHIND=1`` as atualizações que só alteram status e tempo são
+acumuladas em memória por (usuário, exercício/dia): os incrementos de tempo
+são somados e prevalece o último status. O buffer é gravado em uma
+transação por shard a cada ``WRITE_BEHIND_INTERVAL`` segundos ou quando
+atinge ``WRITE_BEHIND_MAX_PENDING`` chaves.
+
+Durabilidade: antes da resposta, cada atualização é anexada (com fsync,
+agrupado entre requisições simultâneas) ao journal do processo. A transação
+que grava um lote registra em ``write_behind_state`` a maior sequência do
+journal já aplicada, e os segmentos do journal só são apagados depois que
+todos os shards confirmaram o lote. Na inicialização, os journals de
+processos que não estão mais em execução são reaplicados ignorando os
+registros já aplicados: nenhum incremento é perdido nem somado duas vezes.
+"""
+
+import os
+import json
+import time
+import uuid
+import atexit
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: um único processo por diretório de dados
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Atualização adiada por tipo (a chave é o tipo de exercício ou o número do dia).
+# Um lote pode chegar depois de uma conclusão gravada diretamente (por outro
+# processo ou por um journal reaplicado): ele nunca rebaixa ``completed`` nem
+# faz a última atividade voltar no tempo, apenas soma o tempo.
+UPDATES = {
+    'exercise': (
+        "UPDATE exercises SET status = CASE WHEN status = 'completed' THEN status ELSE ? END, "
+        "time_spent = time_spent + ?, last_activity = MAX(COALESCE(last_activity, ''), ?) "
+        'WHERE user_id = ? AND exercise_type = ? RETURNING status, time_spent, last_activity'
+    ),
+    'training_day': (
+        "UPDATE training_days SET status = CASE WHEN status = 'completed' THEN status ELSE ? END, "
+        "time_spent = time_spent + ?, last_activity = MAX(COALESCE(last_activity, ''), ?) "
+        'WHERE user_id = ? AND day_number = ? RETURNING status, time_spent, last_activity'
+    ),
+}
+
+SEGMENT_SUFFIX = '.log'
+LOCK_SUFFIX = '.lock'
+
+# Chave do buffer: (tipo, usuário, exercício/dia)
+Key = Tuple[str, int, Any]
+
+
+def create_tables(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS write_behind_state (
+        journal TEXT PRIMARY KEY,
+        applied_seq INTEGER NOT NULL
+    )
+    ''')
+
+
+def validate(status: Any, time_spent: Any):
+    """Garante os tipos gravados no journal (status em texto, tempo inteiro).
+
+    Raises:
+        ValueError: se algum dos valores tiver tipo inválido
+    """
+    if not isinstance(status, str):
+        raise ValueError('status deve ser um texto')
+    if time_spent is not None and (not isinstance(time_spent, int) or isinstance(time_spent, bool)
+                                   or not -2 ** 63 <= time_spent < 2 ** 63):
+        raise ValueError('timeSpent deve ser um número inteiro')
+
+
+def _merge(pending: Dict[Key, dict], record: dict, older: bool = False):
+    """Acumula um registro na entrada da sua chave.
+
+    ``older`` indica que o registro é anterior ao que já está pendente
+    (lote devolvido após uma falha): o tempo é somado, mas o status
+    pendente prevalece.
+    """
+    key = (record['kind'], record['user_id'], record['key'])
+    entry = pending.get(key)
+    if entry is None:
+        pending[key] = dict(record)
+        return
+    entry['time'] += record['time']
+    entry['seq'] = max(entry['seq'], record['seq'])
+    if not older:
+        entry['status'] = record['status']
+        entry['at'] = record['at']
+
+
+class _Segment:
+    """Arquivo do journal; o fsync cobre todos os registros já escritos."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'ab')
+        self.written = 0
+        self.synced = 0
+        self.closed = False
+        self.sync_lock = threading.Lock()
+
+    def sync(self, seq: int):
+        with self.sync_lock:
+            # Segmento fechado: o lote já foi confirmado no banco
+            if self.closed or self.synced >= seq:
+                return
+            target = self.written
+            os.fsync(self.file.fileno())
+            self.synced = target
+
+    def close(self, remove: bool = True):
+        with self.sync_lock:
+            self.closed = True
+            self.file.close()
+        if remove:
+            os.remove(self.path)
+
+
+def _fsync_directory(directory: str):
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class WriteBehindBuffer:
+    """Acumula atualizações de progresso e as grava em lotes por shard.
+
+    ``router`` é o ``shards.ShardRouter`` da aplicação; ``on_flush`` é
+    chamado para cada chave gravada com ``(tipo, usuário, chave, status,
+    tempo total, última atividade)``.
+    """
+
+    def __init__(self, directory: str, router, interval: float = 1.0, max_pending: int = 500,
+                 fsync: bool = True, on_flush: Optional[Callable[..., None]] = None):
+        self.directory = directory
+        self.router = router
+        self.interval = interval
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self.on_flush = on_flush
+        self.journal_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[Key, dict] = {}
+        self._in_flight: Dict[Key, dict] = {}
+        self._seq = 0
+        self._segment: Optional[_Segment] = None
+        self._segment_number = 0
+        self._sealed: List[_Segment] = []
+        self._touched_shards = set()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_file = None
+        self._closed = False
+
+    def _path(self, journal_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, journal_id + suffix)
+
+    def _open_segment(self) -> _Segment:
+        self._segment_number += 1
+        segment = _Segment(self._path(f'{self.journal_id}.{self._segment_number:06d}', SEGMENT_SUFFIX))
+        if self.fsync:
+            _fsync_directory(self.directory)
+        return segment
+
+    def _lock_journal(self, journal_id: str, blocking: bool):
+        """Trava o journal (o dono o mantém travado enquanto o processo existir)."""
+        lock_file = open(self._path(journal_id, LOCK_SUFFIX), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except OSError:
+                lock_file.close()
+                return None
+        return lock_file
+
+    def _start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = self._lock_journal(self.journal_id, blocking=True)
+        self._segment = self._open_segment()
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, kind: str, user_id: int, key: Any, status: str, time_spent: int):
+        """Registra uma atualização no journal e no buffer (retorna após o fsync)."""
+        if kind not in UPDATES:
+            raise ValueError(f'Tipo de atualização desconhecido: {kind}')
+        validate(status, time_spent)
+        record = {'kind': kind, 'user_id': user_id, 'key': key, 'status': status,
+                  'time': time_spent or 0, 'at': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())}
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Buffer write-behind encerrado')
+            if self._segment is None:
+                self._start()
+            self._seq += 1
+            record['seq'] = self._seq
+            segment = self._segment
+            segment.file.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+            segment.file.flush()
+            segment.written = self._seq
+            _merge(self._pending, record)
+            full = len(self._pending) >= self.max_pending
+        if self.fsync:
+            segment.sync(record['seq'])
+        if full:
+            self._wakeup.set()
+
+    def has_pending(self, kind: str, user_id: int, key: Any) -> bool:
+        with self._lock:
+            return (kind, user_id, key) in self._pending or (kind, user_id, key) in self._in_flight
+
+    def flush_pending(self, kind: str, user_id: int, key: Any):
+        """Grava o buffer se houver algo pendente para a chave.
+
+        Usado antes das gravações diretas (conclusões e payloads) para que
+        um status adiado não sobrescreva um mais recente.
+        """
+        if self.has_pending(kind, user_id, key):
+            self.flush()
+
+    def flush_user(self, user_id: int):
+        """Grava o buffer se houver algo pendente ou em gravação para o usuário.
+
+        Usado antes das leituras do progresso do usuário, que de outro modo
+        não veriam as atualizações adiadas.
+        """
+        with self._lock:
+            pending = any(key[1] == user_id for key in (*self._pending, *self._in_flight))
+        if pending:
+            self.flush()
+
+    def flush(self) -> int:
+        """Grava as entradas pendentes; retorna quantas chaves foram gravadas."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                self._in_flight = batch
+                watermark = self._seq
+                # Registros novos vão para outro segmento; os atuais só são apagados após a gravação
+                sealed = self._sealed + [self._segment]
+                self._sealed = []
+                self._segment = self._open_segment()
+
+            failed = batch
+            try:
+                failed = self._apply(self.journal_id, batch, watermark)
+            finally:
+                with self._lock:
+                    self._in_flight = {}
+                    for record in failed.values():
+                        _merge(self._pending, record, older=True)
+                    if failed:
+                        self._sealed = sealed
+            if not failed:
+                for segment in sealed:
+                    segment.close()
+            return len(batch) - len(failed)
+
+    def _applied_seq(self, conn, journal_id: str) -> int:
+        row = conn.execute('SELECT applied_seq FROM write_behind_state WHERE journal = ?', (journal_id,)).fetchone()
+        return row[0] if row else 0
+
+    def _apply(self, journal_id: str, batch: Dict[Key, dict], watermark: int) -> Dict[Key, dict]:
+        """Grava o lote em uma transação por shard; retorna as entradas que falharam."""
+        by_shard: Dict[str, List[Tuple[Key, dict]]] = {}
+        for key, entry in batch.items():
+            by_shard.setdefault(self.router.shard_for_user(entry['user_id']), []).append((key, entry))
+
+        failed = {}
+        for name, items in by_shard.items():
+            try:
+                rows = self._apply_shard(name, journal_id, items, watermark)
+            except Exception:
+                logger.exception('Falha ao gravar %d atualizações adiadas no shard %s', len(items), name)
+                failed.update(items)
+                continue
+
+            self._touched_shards.add(name)
+            if self.on_flush is not None:
+                for entry, (status, time_spent, last_activity) in rows:
+                    try:
+                        self.on_flush(entry['kind'], entry['user_id'], entry['key'], status, time_spent, last_activity)
+                    except Exception:
+                        logger.exception('Falha ao notificar atualização adiada')
+        return failed
+
+    def _apply_shard(self, name: str, journal_id: str, items: List[Tuple[Key, dict]], watermark: int):
+        conn = self.router.connect(name)
+        try:
+            # O journal é apagado após o commit: este precisa sobreviver a uma queda de energia
+            conn.execute('PRAGMA synchronous = FULL')
+            try:
+                rows = []
+                for _, entry in items:
+                    try:
+                        validate(entry['status'], entry['time'])
+                        row = conn.execute(UPDATES[entry['kind']], (
+                            entry['status'], entry['time'], entry['at'], entry['user_id'], entry['key'])).fetchone()
+                    except (ValueError, sqlite3.IntegrityError):
+                        # Entrada inválida: o SQLite desfaz só este comando; descartá-la
+                        # evita que ela impeça a gravação das demais chaves do shard
+                        logger.exception('Atualização adiada inválida descartada: %r', entry)
+                        continue
+                    if row:
+                        rows.append((entry, row))
+                conn.execute(
+                    'INSERT INTO write_behind_state (journal, applied_seq) VALUES (?, ?) '
+                    'ON CONFLICT (journal) DO UPDATE SET applied_seq = MAX(applied_seq, excluded.applied_seq)',
+                    (journal_id, watermark)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute('PRAGMA synchronous = NORMAL')
+        finally:
+            conn.close()
+        return rows
+
+    def _forget(self, journal_id: str, shard_names):
+        for name in shard_names:
+            conn = self.router.connect(name)
+            try:
+                conn.execute('DELETE FROM write_behind_state WHERE journal = ?', (journal_id,))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _replay(self, journal_id: str, paths: List[str]) -> Optional[Tuple[int, List[str]]]:
+        """Reaplica os registros ainda não gravados.
+
+        Returns:
+            ``(chaves regravadas, shards consultados)`` ou None se algum shard falhar
+        """
+        records = []
+        for path in paths:
+            try:
+                with open(path, 'rb') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # Última linha incompleta: a requisição não chegou a ser confirmada
+                            logger.warning('Registro incompleto ignorado em %s', path)
+                            continue
+                        try:
+                            validate(record['status'], record['time'])
+                        except ValueError:
+                            # Journals gravados antes da validação em add()
+                            logger.error('Registro inválido ignorado em %s: %r', path, record)
+                            continue
+                        records.append(record)
+            except FileNotFoundError:
+                continue
+        records.sort(key=lambda record: record['seq'])
+
+        applied: Dict[str, int] = {}
+        batch: Dict[Key, dict] = {}
+        for record in records:
+            name = self.router.shard_for_user(record['user_id'])
+            if name not in applied:
+                conn = self.router.connect(name)
+                try:
+                    applied[name] = self._applied_seq(conn, journal_id)
+                finally:
+                    conn.close()
+            if record['seq'] > applied[name]:
+                _merge(batch, record)
+
+        if batch and self._apply(journal_id, batch, records[-1]['seq']):
+            return None
+        return len(batch), list(applied)
+
+    def recover(self) -> int:
+        """Reaplica os journals deixados por processos encerrados.
+
+        Returns:
+            Número de chaves regravadas
+        """
+        if not os.path.isdir(self.directory):
+            return 0
+        journals: Dict[str, List[str]] = {}
+        for file_name in sorted(os.listdir(self.directory)):
+            if file_name.endswith(SEGMENT_SUFFIX):
+                journal_id = file_name.split('.', 1)[0]
+                if journal_id != self.journal_id:
+                    journals.setdefault(journal_id, []).append(os.path.join(self.directory, file_name))
+
+        recovered = 0
+        for journal_id, paths in journals.items():
+            lock_file = self._lock_journal(journal_id, blocking=False)
+            if lock_file is None:
+                continue  # processo ainda em execução
+            try:
+                replayed = self._replay(journal_id, paths)
+                if replayed is None:
+                    logger.error('Journal %s não pôde ser reaplicado; nova tentativa na próxima inicialização',
+                                 journal_id)
+                    continue
+                count, shard_names = replayed
+                recovered += count
+                # O journal precisa sumir do disco antes do seu watermark: sem o
+                # watermark, segmentos restantes seriam reaplicados por inteiro
+                for path in paths:
+                    if os.path.exists(path):
+                        os.remove(path)
+                _fsync_directory(self.directory)
+                self._forget(journal_id, shard_names)
+                os.remove(self._path(journal_id, LOCK_SUFFIX))
+            finally:
+                lock_file.close()
+        if recovered:
+            logger.info('%d atualizações adiadas recuperadas de journals anteriores', recovered)
+        return recovered
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Falha ao gravar o buffer write-behind')
+
+    def close(self):
+        """Grava o que estiver pendente e encerra o journal do processo."""
+        with self._lock:
+            if self._closed or self._segment is None:
+                self._closed = True
+                return
+            self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=self.interval + 5)
+        self.flush()
+        with self._lock:
+            clean = not self._pending and not self._sealed
+        # Com falhas pendentes o journal fica para ser reaplicado na próxima inicialização
+        self._segment.close(remove=clean)
+        if clean:
+            _fsync_directory(self.directory)
+            self._forget(self.journal_id, self._touched_shards)
+            os.remove(self._path(self.journal_id, LOCK_SUFFIX))
+        self._lock_file.close()